@@ -24,6 +24,20 @@ class Action:
     def process(self, event):
         pass
 
+    def get_update_types(self):
+        """
+        Returns a set with the update types (ie. the update field with its content, eg. "message")
+        this action can do something with, or None if it can be any of them.
+        """
+        return None
+
+    def compile(self):
+        """
+        Called once the action has been set up, to prepare it to process events faster.
+        Actions are still added and processed as usual after it.
+        """
+        pass
+
     def pre_shutdown(self):
         pass
 
@@ -32,19 +46,84 @@ class Action:
 
 
 class ActionGroup(Action):
+    # Update types the group passes events of to its children, None if it does not filter them by type
+    UPDATE_TYPES = None
+    # Whether the group does nothing with events but passing them (or not) to its children,
+    # so that its update types are the ones of its children
+    ONLY_FORWARDS_EVENTS = True
+
     def __init__(self, *actions):
         super().__init__()
         self.actions = list(actions)
+        # update type -> children that can handle it, set when compiled
+        self.actions_by_update_type = None
+        # children run for update types not in the dict above
+        self.actions_for_any_update_type = None
 
     def add(self, *actions):
         self.actions.extend(actions)
+        # back to running all of them, until compiled again
+        self.actions_by_update_type = None
 
     def setup(self, *args):
         super().setup(*args)
         self.for_each(lambda action: action.setup(*args))
 
     def process(self, event):
-        self.for_each(lambda action: action.process(event._copy()))
+        for action in self.__get_actions_for(event):
+            action.process(event._copy())
+
+    def __get_actions_for(self, event):
+        actions_by_update_type = self.actions_by_update_type
+        if actions_by_update_type is not None:
+            update_type = event.update_type
+            if update_type is not None:
+                return actions_by_update_type.get(update_type, self.actions_for_any_update_type)
+        return self.actions
+
+    def get_update_types(self):
+        update_types = frozenset(self.UPDATE_TYPES) if self.UPDATE_TYPES is not None else None
+        if self.ONLY_FORWARDS_EVENTS:
+            children_update_types = self.__get_children_update_types()
+            if children_update_types is not None:
+                if update_types is None:
+                    update_types = children_update_types
+                else:
+                    update_types &= children_update_types
+        return update_types
+
+    def __get_children_update_types(self):
+        update_types = set()
+        for action in self.actions:
+            action_update_types = action.get_update_types()
+            if action_update_types is None:
+                return None
+            update_types.update(action_update_types)
+        return frozenset(update_types)
+
+    def compile(self):
+        """
+        Groups the children by the update types they can handle, so that events of an update type
+        are only passed to (and copied for) the children that can do something with it.
+        Children with unknown update types (eg. custom filters) are run for all of them.
+        """
+        self.for_each(lambda action: action.compile())
+        children_update_types = [action.get_update_types() for action in self.actions]
+        known_update_types = set()
+        for update_types in children_update_types:
+            if update_types is not None:
+                known_update_types.update(update_types)
+        actions_by_update_type = {}
+        for update_type in known_update_types:
+            actions_by_update_type[update_type] = [
+                action for action, update_types in zip(self.actions, children_update_types)
+                if update_types is None or update_type in update_types
+            ]
+        self.actions_for_any_update_type = [
+            action for action, update_types in zip(self.actions, children_update_types)
+            if update_types is None
+        ]
+        self.actions_by_update_type = actions_by_update_type
 
     def shutdown(self):
         self.for_each(lambda action: action.shutdown())
@@ -56,6 +135,9 @@ class ActionGroup(Action):
 
 
 class IntermediateAction(ActionGroup):
+    # subclasses do something with events before continuing, unless they declare otherwise
+    ONLY_FORWARDS_EVENTS = False
+
     def __init__(self):
         super().__init__()
 
@@ -42,15 +42,23 @@ class CommandAction(IntermediateAction):
                 parser = MessageEntityParser(event.message)
                 command_text = parser.get_entity_text(entity)
                 if self.parser.matches_command(command_text):
-                    event.command = self.parser.get_command_name(command_text)
                     additional_text = parser.get_text_after_entity(entity)
-                    event.command_args = self.parser.get_command_args(command_text, additional_text).lstrip(" ")
-                    if self.throttler.should_execute(event):
-                        start_time = time.time()
-                        try:
-                            self._continue(event)
-                        finally:
-                            self.__log_command_execution(event, time.time() - start_time)
+                    self.process_command(event, command_text, additional_text)
+
+    def process_command(self, event, command_text, additional_text):
+        """
+        Continues processing the event with an already parsed command.
+        Used by CommandRouterAction to avoid every CommandAction parsing the message again.
+        """
+        if self.parser.matches_command(command_text):
+            event.command = self.parser.get_command_name(command_text)
+            event.command_args = self.parser.get_command_args(command_text, additional_text).lstrip(" ")
+            if self.throttler.should_execute(event):
+                start_time = time.time()
+                try:
+                    self._continue(event)
+                finally:
+                    self.__log_command_execution(event, time.time() - start_time)
 
     @staticmethod
     def get_entities(event):
@@ -0,0 +1,84 @@
+import re
+
+from bot.action.core.action import IntermediateAction
+from bot.action.core.command import CommandAction
+from bot.action.core.command.parser import UnderscoredCommandParser
+from bot.api.domain import MessageEntityParser
+
+
+class CommandRouterAction(IntermediateAction):
+    """
+    Groups CommandActions, parsing the command of the message only once and
+    looking up the ones that can match it by name instead of trying all of them.
+
+    The matching CommandActions still check the command, so they keep their own
+    semantics (underscored args, bot username, throttling).
+    Children that are not CommandActions are always run.
+    Children are run in the same order they were added, as in any other group.
+    """
+
+    ONLY_FORWARDS_EVENTS = True
+
+    def __init__(self):
+        super().__init__()
+        # lower-cased command name -> indexes of the children that handle it
+        self.routes = {}
+        self.underscored_routes = {}
+        # indexes of children that must be run for all commands
+        self.always_run = []
+
+    def add(self, *actions):
+        super().add(*actions)
+        self.__build_routes()
+
+    def post_setup(self):
+        self.__build_routes()
+
+    def __build_routes(self):
+        self.routes = {}
+        self.underscored_routes = {}
+        self.always_run = []
+        for index, action in enumerate(self.actions):
+            if not isinstance(action, CommandAction) or not self.__is_plain_command(action.command):
+                self.always_run.append(index)
+            elif isinstance(action.parser, UnderscoredCommandParser):
+                self.underscored_routes.setdefault(action.command.lower(), []).append(index)
+            else:
+                self.routes.setdefault(action.command.lower(), []).append(index)
+
+    @staticmethod
+    def __is_plain_command(command):
+        # commands with regex special chars cannot be looked up by name
+        return re.escape(command) == command
+
+    def process(self, event):
+        command_text, additional_text = self.__parse_command(event)
+        if command_text is None:
+            indexes = self.always_run
+        else:
+            indexes = sorted(self.always_run + self.__get_command_indexes(command_text))
+        for index in indexes:
+            action = self.actions[index]
+            if isinstance(action, CommandAction) and command_text is not None:
+                action.process_command(event._copy(), command_text, additional_text)
+            else:
+                action.process(event._copy())
+
+    def __get_command_indexes(self, command_text):
+        name = command_text[1:].split("@", 1)[0].lower()
+        indexes = list(self.routes.get(name, []))
+        indexes.extend(self.underscored_routes.get(name, []))
+        # underscored commands can also be followed by args joined with underscores
+        underscore_position = name.find("_")
+        while underscore_position != -1:
+            indexes.extend(self.underscored_routes.get(name[:underscore_position], []))
+            underscore_position = name.find("_", underscore_position + 1)
+        return indexes
+
+    @staticmethod
+    def __parse_command(event):
+        for entity in CommandAction.get_entities(event):
+            if CommandAction.is_valid_command(entity):
+                parser = MessageEntityParser(event.message)
+                return parser.get_entity_text(entity), parser.get_text_after_entity(entity)
+        return None, None
@@ -1,3 +1,5 @@
+import threading
+
 from bot.action.core.command.throttler import Throttler
 from bot.action.core.command.throttler.shortlyrepeatedcommand.command_key import CommandKeyFactory
 from bot.action.standard import chatsettings
@@ -15,30 +17,41 @@ class ShortlyRepeatedCommandThrottler(Throttler):
         self.api = api
         self.command_key_factory = CommandKeyFactory()
         self.recent_commands = {}
+        # it is shared by all chats, whose updates may be processed concurrently
+        self.lock = threading.Lock()
 
     def add_personal_command(self, command: str):
         self.command_key_factory.add_personal_command(command)
 
     def should_execute(self, event):
         current_date = event.message.date
-        self.__cleanup_recent_commands(current_date)
         command_key = self.command_key_factory.get_command_key(event)
-        if command_key not in self.recent_commands:
-            throttling_state = CommandThrottlingState(event)
-            if not throttling_state.has_expired(current_date):
-                # it has not expired immediately, throttling is enabled
-                self.recent_commands[command_key] = throttling_state
-        else:
-            throttling_state = self.recent_commands[command_key]
-            throttling_state.add_invocation()
-        if throttling_state.should_warn():
+        # read on every command, so that changes to the setting are applied, and before taking the lock
+        throttling_seconds = chatsettings.repository.get_for_event(event).get(ChatSettings.THROTTLING_SECONDS)
+        with self.lock:
+            throttling_state = self.recent_commands.get(command_key)
+            if throttling_state is not None:
+                # before the cleanup, so that it expires with the current setting
+                throttling_state.throttling_seconds = throttling_seconds
+            self.__cleanup_recent_commands(current_date)
+            throttling_state = self.recent_commands.get(command_key)
+            if throttling_state is None:
+                throttling_state = CommandThrottlingState(event, throttling_seconds)
+                if not throttling_state.has_expired(current_date):
+                    # it has not expired immediately, throttling is enabled
+                    self.recent_commands[command_key] = throttling_state
+            else:
+                throttling_state.add_invocation()
+            should_warn = throttling_state.should_warn()
+            should_execute = throttling_state.should_execute()
+        if should_warn:
             self.__send_throttling_warning(event, throttling_state)
-        return throttling_state.should_execute()
+        return should_execute
 
     def __cleanup_recent_commands(self, current_date):
-        for key, state in self.recent_commands.copy().items():
+        for key, state in list(self.recent_commands.items()):
             if state.has_expired(current_date):
-                del self.recent_commands[key]
+                self.recent_commands.pop(key, None)
 
     def __send_throttling_warning(self, event, throttling_state):
         remaining_seconds = throttling_state.remaining_seconds(event.message.date)
@@ -65,8 +78,12 @@ class ShortlyRepeatedCommandThrottler(Throttler):
 
 
 class CommandThrottlingState:
-    def __init__(self, event):
-        self.chat_settings = chatsettings.repository.get_for_event(event)
+    def __init__(self, event, throttling_seconds: int):
+        """
+        :param throttling_seconds: Kept so that checking the expiration does not access the storage.
+            It must be updated when the chat setting changes.
+        """
+        self.throttling_seconds = throttling_seconds
         self.first_invocation = event.message.date
         self.number_of_invocations = 1
 
@@ -80,11 +97,9 @@ class CommandThrottlingState:
         return self.number_of_invocations == 3
 
     def has_expired(self, current_date):
-        throttling_seconds = self.chat_settings.get(ChatSettings.THROTTLING_SECONDS)
-        expiration_date = current_date - throttling_seconds
+        expiration_date = current_date - self.throttling_seconds
         return self.first_invocation <= expiration_date
 
     def remaining_seconds(self, current_date):
-        throttling_seconds = self.chat_settings.get(ChatSettings.THROTTLING_SECONDS)
-        expiration_date = current_date - throttling_seconds
+        expiration_date = current_date - self.throttling_seconds
         return self.first_invocation - expiration_date
@@ -2,6 +2,8 @@ from bot.action.core.action import IntermediateAction
 
 
 class TextMessageAction(IntermediateAction):
+    ONLY_FORWARDS_EVENTS = True
+
     def process(self, event):
         text = event.message.text
         if text is not None:
@@ -10,6 +12,8 @@ class TextMessageAction(IntermediateAction):
 
 
 class VoiceMessageAction(IntermediateAction):
+    ONLY_FORWARDS_EVENTS = True
+
     def process(self, event):
         voice = event.message.voice
         if voice is not None:
@@ -18,6 +22,8 @@ class VoiceMessageAction(IntermediateAction):
 
 
 class NoForwardedMessage(IntermediateAction):
+    ONLY_FORWARDS_EVENTS = True
+
     def process(self, event):
         forwarded = event.message.forward_date
         if forwarded is None:
@@ -25,6 +31,9 @@ class NoForwardedMessage(IntermediateAction):
 
 
 class EditedMessageAction(IntermediateAction):
+    UPDATE_TYPES = ("edited_message",)
+    ONLY_FORWARDS_EVENTS = True
+
     def process(self, event):
         edited_message = event.update.edited_message
         if edited_message is not None:
@@ -35,6 +44,9 @@ class EditedMessageAction(IntermediateAction):
 
 
 class MessageAction(IntermediateAction):
+    UPDATE_TYPES = ("message",)
+    ONLY_FORWARDS_EVENTS = True
+
     def process(self, event):
         message = event.update.message
         if message is not None:
@@ -44,6 +56,9 @@ class MessageAction(IntermediateAction):
 
 
 class ChosenInlineResultAction(IntermediateAction):
+    UPDATE_TYPES = ("chosen_inline_result",)
+    ONLY_FORWARDS_EVENTS = True
+
     def process(self, event):
         chosen_inline_result = event.update.chosen_inline_result
         if chosen_inline_result is not None:
@@ -52,6 +67,9 @@ class ChosenInlineResultAction(IntermediateAction):
 
 
 class InlineQueryAction(IntermediateAction):
+    UPDATE_TYPES = ("inline_query",)
+    ONLY_FORWARDS_EVENTS = True
+
     def process(self, event):
         inline_query = event.update.inline_query
         if inline_query is not None:
@@ -60,6 +78,9 @@ class InlineQueryAction(IntermediateAction):
 
 
 class CallbackQueryAction(IntermediateAction):
+    UPDATE_TYPES = ("callback_query",)
+    ONLY_FORWARDS_EVENTS = True
+
     def process(self, event):
         callback_query = event.update.callback_query
         if callback_query is not None:
@@ -68,12 +89,16 @@ class CallbackQueryAction(IntermediateAction):
 
 
 class NoPendingAction(IntermediateAction):
+    ONLY_FORWARDS_EVENTS = True
+
     def process(self, event):
         if not event.is_pending:
             self._continue(event)
 
 
 class PendingAction(IntermediateAction):
+    ONLY_FORWARDS_EVENTS = True
+
     def process(self, event):
         if event.is_pending:
             self._continue(event)
@@ -10,3 +10,13 @@ class Update(Event):
         super().__init__()
         self.update = update
         self.is_pending = is_pending
+        self.update_type = self.__get_update_type(update)
+
+    @staticmethod
+    def __get_update_type(update):
+        """Returns the name of the field with the content of the update (eg. "message")."""
+        if update is not None:
+            for field in update.data:
+                if field != "update_id":
+                    return field
+        return None
@@ -1,4 +1,6 @@
+import array
 import collections
+import heapq
 
 from bot.action import util
 from bot.action.core.action import Action
@@ -34,7 +36,7 @@ class ListVoiceAction(Action):
         function_name = "get_response_" + action
         func = getattr(self, function_name, None)
         if callable(func):
-            voices = VoiceStorageHandler(event).get_voices()
+            voices = VoiceStorageHandler(event).get_stats()
             if voices.is_empty():
                 response = self._get_response_empty()
             else:
@@ -112,7 +114,7 @@ class ListVoiceAction(Action):
     def get_response_longest(self, event, voices, number_of_voices_to_display):
         user_storage_handler = UserStorageHandler.get_instance(self.state)
         format_string = "{formatted_duration} → {formatted_user} → {formatted_command}"
-        printable_voices = voices.longest().limit(number_of_voices_to_display)\
+        printable_voices = voices.longest(number_of_voices_to_display)\
             .printable_version(event, user_storage_handler, format_string)
         suggested_command = UnderscoredCommandBuilder.build_command(event.command, "recent")
         footer_text = FormattedText().normal("Write ").normal(suggested_command).normal(" to see recent audios.")
@@ -121,7 +123,7 @@ class ListVoiceAction(Action):
     def get_response_shortest(self, event, voices, number_of_voices_to_display):
         user_storage_handler = UserStorageHandler.get_instance(self.state)
         format_string = "{formatted_duration} → {formatted_user} → {formatted_command}"
-        printable_voices = voices.shortest().limit(number_of_voices_to_display)\
+        printable_voices = voices.shortest(number_of_voices_to_display)\
             .printable_version(event, user_storage_handler, format_string)
         suggested_command = UnderscoredCommandBuilder.build_command(event.command, "longest")
         footer_text = FormattedText().normal("Write ").normal(suggested_command).normal(" to see longest audios.")
@@ -147,7 +149,7 @@ class ListVoiceAction(Action):
     def get_response_biggest(self, event, voices, number_of_voices_to_display):
         user_storage_handler = UserStorageHandler.get_instance(self.state)
         format_string = "{formatted_size} → {formatted_user} → {formatted_command}"
-        printable_voices = voices.biggest().limit(number_of_voices_to_display)\
+        printable_voices = voices.biggest(number_of_voices_to_display)\
             .printable_version(event, user_storage_handler, format_string)
         suggested_command = UnderscoredCommandBuilder.build_command(event.command, "smallest")
         footer_text = FormattedText().normal("Write ").normal(suggested_command).normal(" to see smallest audios.")
@@ -156,7 +158,7 @@ class ListVoiceAction(Action):
     def get_response_smallest(self, event, voices, number_of_voices_to_display):
         user_storage_handler = UserStorageHandler.get_instance(self.state)
         format_string = "{formatted_size} → {formatted_user} → {formatted_command}"
-        printable_voices = voices.smallest().limit(number_of_voices_to_display)\
+        printable_voices = voices.smallest(number_of_voices_to_display)\
             .printable_version(event, user_storage_handler, format_string)
         suggested_command = UnderscoredCommandBuilder.build_command(event.command, "shortest")
         footer_text = FormattedText().normal("Write ").normal(suggested_command).normal(" to see shortest audios.")
@@ -174,7 +176,7 @@ class ListVoiceAction(Action):
     def get_response_recent(self, event, voices, number_of_voices_to_display):
         user_storage_handler = UserStorageHandler.get_instance(self.state)
         format_string = "{formatted_date} → {formatted_user} → {formatted_command}"
-        printable_voices = voices.most_recent().limit(number_of_voices_to_display)\
+        printable_voices = voices.most_recent(number_of_voices_to_display)\
             .printable_version(event, user_storage_handler, format_string)
         return self.__build_success_response_message(event, "Most recent audios:", printable_voices)
 
@@ -204,9 +206,10 @@ class Voice:
         self.duration = int(duration)
         self.file_size = int(file_size)  # may be None
 
-    def printable_version(self, event, user_storage_handler, format_string):
+    def printable_version(self, event, formatted_users, format_string):
+        """:param formatted_users: As returned by UserFormatter.retrieve_and_format_many"""
         format_dict = {
-            "formatted_user": UserFormatter.retrieve_and_format(self.user_id, user_storage_handler),
+            "formatted_user": formatted_users[self.user_id],
             "formatted_date": DateFormatter.format(self.date),
             "formatted_duration": TimeFormatter.format(self.duration),
             "formatted_size": SizeFormatter.format(self.file_size),
@@ -323,7 +326,11 @@ class VoiceList:
         return sorted(self.voices, key=key)
 
     def printable_version(self, event, user_storage_handler, format_string):
-        return "\n".join((voice.printable_version(event, user_storage_handler, format_string) for voice in self.voices))
+        voices = list(self.voices)
+        formatted_users = UserFormatter.retrieve_and_format_many(
+            (voice.user_id for voice in voices), user_storage_handler
+        )
+        return "\n".join((voice.printable_version(event, formatted_users, format_string) for voice in voices))
 
     @staticmethod
     def deserialize(voices_data):
@@ -335,10 +342,133 @@ class VoiceGroup:
         self.grouped_voices = grouped_voices
 
     def printable_version(self, user_storage_handler, formatter=lambda x: x):
-        return "\n".join(("{} → {}".format(formatter(count), UserFormatter.retrieve_and_format(user_id, user_storage_handler))
+        formatted_users = UserFormatter.retrieve_and_format_many(
+            (user_id for user_id, _ in self.grouped_voices), user_storage_handler
+        )
+        return "\n".join(("{} → {}".format(formatter(count), formatted_users[user_id])
                           for user_id, count in self.grouped_voices))
 
 
+class VoiceStats:
+    """
+    Columnar representation of the voices of a chat, to answer queries without
+    iterating (or sorting) all of them.
+
+    Values are stored in arrays, one per field, indexed by the position of the voice in the chat history,
+    and sums per user are updated as voices are added.
+    Queries return the same voices, in the same order, that VoiceList does.
+    """
+
+    def __init__(self):
+        self.dates = array.array("q")
+        self.message_ids = array.array("q")
+        self.user_indexes = array.array("l")
+        self.durations = array.array("q")
+        self.file_sizes = array.array("q")
+        # user ids are strings (can be "-" if unknown), so each distinct one is stored only once
+        self.user_ids = []
+        self.user_indexes_by_id = {}
+        # index of the first voice with each message_id
+        self.indexes_by_message_id = {}
+        self.number_counter = collections.Counter()
+        self.length_counter = collections.Counter()
+        self.size_counter = collections.Counter()
+
+    def add_all(self, voices: VoiceList):
+        for voice in voices.voices:
+            self.add(voice)
+
+    def add(self, voice: Voice):
+        index = len(self.dates)
+        user_id = str(voice.user_id)
+        self.dates.append(int(voice.date))
+        self.message_ids.append(int(voice.message_id))
+        self.user_indexes.append(self.__get_user_index(user_id))
+        self.durations.append(voice.duration)
+        self.file_sizes.append(voice.file_size)
+        self.indexes_by_message_id.setdefault(str(voice.message_id), index)
+        self.number_counter[user_id] += 1
+        self.length_counter[user_id] += voice.duration
+        self.size_counter[user_id] += voice.file_size
+
+    def __get_user_index(self, user_id):
+        user_index = self.user_indexes_by_id.get(user_id)
+        if user_index is None:
+            user_index = self.user_indexes_by_id[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+        return user_index
+
+    def is_empty(self):
+        return len(self.dates) == 0
+
+    def get(self, message_id):
+        index = self.indexes_by_message_id.get(str(message_id))
+        if index is not None:
+            return self.__get_voice(index)
+
+    def grouped_by_user(self, max_to_return):
+        return self.__grouped_by(self.number_counter, max_to_return)
+
+    def grouped_by_length(self, max_to_return):
+        return self.__grouped_by(self.length_counter, max_to_return)
+
+    def grouped_by_size(self, max_to_return):
+        return self.__grouped_by(self.size_counter, max_to_return)
+
+    @staticmethod
+    def __grouped_by(counter, max_to_return):
+        users = counter.most_common(max_to_return)
+        users.append(("[TOTAL]", sum(counter.values())))
+        return VoiceGroup(users)
+
+    def grouped_by_mean(self, max_to_return):
+        means = ((user_id, self.length_counter[user_id] / number_of_voices)
+                 for user_id, number_of_voices in self.number_counter.items())
+        # same as a stable sort in descending order
+        users = heapq.nlargest(max_to_return, means, key=lambda x: x[1])
+        if len(self.number_counter) < max_to_return:
+            users.append(("[TOTAL]", sum(self.durations) / len(self.durations)))
+        return VoiceGroup(users)
+
+    def most_recent(self, limit):
+        if limit <= 0:
+            return VoiceList([])
+        number_of_voices = len(self.dates)
+        return self.__get_voices(range(number_of_voices - 1, max(number_of_voices - limit, 0) - 1, -1))
+
+    def longest(self, limit):
+        return self.__largest(self.durations, limit)
+
+    def shortest(self, limit):
+        return self.__smallest(self.durations, limit)
+
+    def biggest(self, limit):
+        return self.__largest(self.file_sizes, limit)
+
+    def smallest(self, limit):
+        return self.__smallest(self.file_sizes, limit)
+
+    def __largest(self, values, limit):
+        # on ties, most recent voices go first (as in a reversed stable sort)
+        return self.__get_voices(heapq.nlargest(limit, range(len(values)), key=lambda i: (values[i], i)))
+
+    def __smallest(self, values, limit):
+        return self.__get_voices(heapq.nsmallest(limit, range(len(values)), key=values.__getitem__))
+
+    def __get_voices(self, indexes):
+        return VoiceList([self.__get_voice(index) for index in indexes])
+
+    def __get_voice(self, index):
+        # same types Voice.deserialize would give
+        return Voice(
+            str(self.dates[index]),
+            str(self.message_ids[index]),
+            self.user_ids[self.user_indexes[index]],
+            self.durations[index],
+            self.file_sizes[index]
+        )
+
+
 class VoiceStorageHandler:
     def __init__(self, event):
         self.event = event
@@ -349,5 +479,16 @@ class VoiceStorageHandler:
             voices = ""
         return VoiceList.deserialize(voices)
 
+    def get_stats(self):
+        stats = self.event.cache.voices_stats
+        if stats is None:
+            stats = self.event.cache.voices_stats = VoiceStats()
+            stats.add_all(self.get_voices())
+        return stats
+
     def save_voice(self, voice):
         self.event.state.set_value("voices", voice.serialize(), append=True)
+        stats = self.event.cache.voices_stats
+        if stats is not None:
+            # only kept up to date once loaded, so that chats not querying them do not waste memory
+            stats.add(voice)
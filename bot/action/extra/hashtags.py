@@ -1,3 +1,4 @@
+import bisect
 import collections
 
 import pytimeparse
@@ -5,11 +6,13 @@ import pytimeparse
 from bot.action.core.action import Action
 from bot.action.core.command import UnderscoredCommandBuilder
 from bot.action.core.command.usagemessage import CommandUsageMessage
+from bot.action.standard.admin import is_admin, ADMINS_ONLY_ERROR_RESPONSE
 from bot.action.standard.userinfo import UserStorageHandler
 from bot.action.util.counter import case_insensitive_counter
 from bot.action.util.format import DateFormatter, UserFormatter
 from bot.action.util.textformat import FormattedText
 from bot.api.domain import Message, MessageEntityParser
+from bot.multithreading.worker.process_pool import ProcessWork
 
 
 class SaveHashtagsAction(Action):
@@ -46,17 +49,28 @@ class ListHashtagsAction(Action):
     def process(self, event):
         action, action_param, help_args = self.parse_args(event.command_args.split())
         if action in ("recent", "popular", "ranking"):
-            hashtags = HashtagStorageHandler(event).get_stored_hashtags()
+            hashtags = HashtagStorageHandler(event).get_stats()
             if hashtags.is_empty():
                 response = self.get_response_empty()
             elif action == "recent":
                 response = self.get_response_recent(event, hashtags, action_param)
             elif action == "popular":
-                response = self.get_response_popular(event, hashtags, *action_param)
+                # the response is sent once the hashtags are counted
+                self.schedule_response_popular(event, hashtags, *action_param)
+                return
             else:
                 response = self.get_response_ranking(event, hashtags, action_param)
+        elif action == "rebuild":
+            # it processes all the hashtags of the chat and rewrites its statistics
+            if is_admin(self.config, event.message.from_):
+                response = self.get_response_rebuild(event)
+            else:
+                response = Message.create(ADMINS_ONLY_ERROR_RESPONSE)
         else:
             response = self.get_response_help(event, help_args)
+        self.send_response(event, response)
+
+    def send_response(self, event, response):
         self.api.send_message(response.to_chat_replying(event.message))
 
     def parse_args(self, args):
@@ -67,7 +81,7 @@ class ListHashtagsAction(Action):
             action = "popular"
             action_param = (HASHTAGS_NO_FILTER_BY_TIME, 10, "")
         elif len(args) == 1:
-            if args[0] not in ("popular", "recent", "ranking"):
+            if args[0] not in ("popular", "recent", "ranking", "rebuild"):
                 interval = self.parse_interval(args[0])
                 if interval is not None:
                     action = "popular"
@@ -113,7 +127,8 @@ class ListHashtagsAction(Action):
 
     @staticmethod
     def get_response_help(event, help_args):
-        args = ["[popular] [time_interval] [number_of_hashtags]", "recent [number_of_hashtags]", "ranking [number_of_users]"]
+        args = ["[popular] [time_interval] [number_of_hashtags]", "recent [number_of_hashtags]", "ranking [number_of_users]",
+                "rebuild"]
         description = "By default, display most popular hashtags.\n\n" \
                       "Use *recent* to show recent ones.\n\n" \
                       "Use *ranking* to show the users who wrote most hashtags.\n\n" \
@@ -121,7 +136,9 @@ class ListHashtagsAction(Action):
                       " to display (default is 10).\n\n" \
                       "In the *popular* mode (the default one), you can add a time interval (eg. `week` or `10d`)" \
                       " to show most popular hashatgs between now and that interval.\n" \
-                      "Currently, only day intervals are supported (ie. `30d`, `90d`, `1d`)."
+                      "Currently, only day intervals are supported (ie. `30d`, `90d`, `1d`).\n\n" \
+                      "Use *rebuild* to compute again hashtags statistics from all the hashtags seen in this chat" \
+                      " (only needed if they are displayed wrong, and only available to the bot admin)."
         return CommandUsageMessage.get_usage_message(event.command, args, description)
 
     @staticmethod
@@ -137,14 +154,25 @@ class ListHashtagsAction(Action):
         ranking_hashtags_text = FormattedText().normal("Write ").normal(ranking_hashtags_command).normal(" to see which users write most hashtags.")
         return self.__build_success_response_message(event, "Most recent hashtags:", printable_hashtags, ranking_hashtags_text)
 
-    def get_response_popular(self, event, hashtags, time_interval_in_seconds, number_of_hashtags_to_display, raw_interval):
+    def schedule_response_popular(self, event, hashtags, time_interval_in_seconds, number_of_hashtags_to_display, raw_interval):
+        oldest_requested_hashtag = None
         if time_interval_in_seconds != HASHTAGS_NO_FILTER_BY_TIME:
             oldest_requested_hashtag = event.message.date - time_interval_in_seconds
-            hashtags = hashtags.filter_older_than(oldest_requested_hashtag)
+        # counters are read here, and added up on the cpu pool
+        self.scheduler.cpu(ProcessWork(
+            count_popular_hashtags, (hashtags.counters(oldest_requested_hashtag), number_of_hashtags_to_display),
+            "hashtags_popular",
+            lambda grouped_hashtags: self.send_response(
+                event, self.get_response_popular(event, HashtagGroup(grouped_hashtags), raw_interval)
+            )
+        ))
+
+    def get_response_popular(self, event, grouped_hashtags, raw_interval):
+        if raw_interval:
             title = FormattedText().normal("Most popular hashtags during the last {interval}:").start_format().bold(interval=raw_interval).end_format()
         else:
             title = "Most popular hashtags:"
-        printable_hashtags = hashtags.grouped_by_popularity(number_of_hashtags_to_display).printable_version()
+        printable_hashtags = grouped_hashtags.printable_version()
         recent_hashtags_command = UnderscoredCommandBuilder.build_command(event.command, "recent")
         recent_hashtags_text = FormattedText().normal("Write ").normal(recent_hashtags_command).normal(" to see recent hashtags.")
         return self.__build_success_response_message(event, title, printable_hashtags, recent_hashtags_text)
@@ -154,6 +182,13 @@ class ListHashtagsAction(Action):
         printable_hashtags = hashtags.grouped_by_user(number_of_users_to_display).printable_version(user_storage_handler)
         return self.__build_success_response_message(event, "Users who write most hashtags:", printable_hashtags)
 
+    @staticmethod
+    def get_response_rebuild(event):
+        stats = HashtagStorageHandler(event).rebuild_stats()
+        return FormattedText().bold("✅ Hashtags statistics rebuilt.").newline()\
+            .normal("{number} hashtags processed.").start_format().bold(number=stats.total()).end_format()\
+            .build_message()
+
     @staticmethod
     def __build_success_response_message(event, title, printable_hashtags, footer_text=None):
         if not isinstance(title, FormattedText):
@@ -172,9 +207,10 @@ class Hashtag:
         self.date = int(date) if date is not None else -1
         self.user_id = user_id
 
-    def printable_version(self, user_storage_handler):
+    def printable_version(self, formatted_users):
+        """:param formatted_users: As returned by UserFormatter.retrieve_and_format_many"""
         formatted_date = DateFormatter.format(self.date) if self.date != -1 else "???"
-        formatted_user = UserFormatter.retrieve_and_format(self.user_id, user_storage_handler) if self.user_id is not None else "???"
+        formatted_user = formatted_users[self.user_id] if self.user_id is not None else "???"
         return "%s  (%s by %s)" % (self.hashtag, formatted_date, formatted_user)
 
     def serialize(self):
@@ -213,7 +249,10 @@ class HashtagList:
         return HashtagList(filter(lambda hashtag: hashtag.date > timestamp, self.hashtags))
 
     def printable_version(self, user_storage_handler):
-        return "\n".join((hashtag.printable_version(user_storage_handler) for hashtag in self.hashtags))
+        hashtags = list(self.hashtags)
+        user_ids = (hashtag.user_id for hashtag in hashtags if hashtag.user_id is not None)
+        formatted_users = UserFormatter.retrieve_and_format_many(user_ids, user_storage_handler)
+        return "\n".join((hashtag.printable_version(formatted_users) for hashtag in hashtags))
 
     def serialize(self):
         return "".join((hashtag.serialize() for hashtag in self.hashtags))
@@ -236,8 +275,211 @@ class UserGroup:
         self.grouped_users = grouped_users
 
     def printable_version(self, user_storage_handler):
-        return "\n".join(("%s → %s" % (count, UserFormatter.retrieve_and_format(user_id, user_storage_handler))
-                          for user_id, count in self.grouped_users if user_id is not None))
+        grouped_users = [(user_id, count) for user_id, count in self.grouped_users if user_id is not None]
+        formatted_users = UserFormatter.retrieve_and_format_many(
+            (user_id for user_id, _ in grouped_users), user_storage_handler
+        )
+        return "\n".join(("%s → %s" % (count, formatted_users[user_id]) for user_id, count in grouped_users))
+
+
+def count_popular_hashtags(counters, max_to_return):
+    """
+    :param counters: As returned by HashtagStats.counters
+    :return: A list of tuples with the hashtag and its uses of the most used ones, ignoring case
+    """
+    # it is cpu-bound on chats with lots of hashtags, so it is run as a ProcessWork
+    counter = collections.Counter()
+    for day_counter in counters:
+        counter.update(day_counter)
+    return case_insensitive_counter(counter).most_common(max_to_return)
+
+
+class HashtagStats:
+    """
+    Hashtags aggregates, updated incrementally as new hashtags are saved,
+    to avoid processing all the hashtags of a chat on every query.
+
+    Counts by hashtag and by user are persisted as :class:`PersistedCounter`,
+    so that saving a message only appends the counts it changed, and hashtags are also stored grouped by the (UTC) day they were written,
+    so that time-filtered queries only need to process the days they cover.
+    """
+
+    SECONDS_IN_A_DAY = 24 * 3600
+
+    def __init__(self, state):
+        self.state = state
+        self.days_state = state.get_for("days")
+        self.hashtags_counter = PersistedCounter(state, "counts")
+        self.users_counter = PersistedCounter(state, "users")
+        self.hashtags = self.hashtags_counter.counter
+        self.users = self.users_counter.counter
+        # sorted list of days with hashtags, and loaded hashtags of each one, both loaded lazily
+        self.days = None
+        self.hashtags_by_day = {}
+
+    def exists(self):
+        return self.state.counts is not None
+
+    def is_empty(self):
+        return len(self.hashtags) == 0
+
+    def total(self):
+        return sum(self.hashtags.values())
+
+    def add(self, hashtags: HashtagList):
+        days = self.__get_days()
+        hashtags_by_day = self.__group_by_day(hashtags)
+        for day, day_hashtags in hashtags_by_day.items():
+            if day not in self.hashtags_by_day and day not in days:
+                # new day, no need to load it
+                self.hashtags_by_day[day] = HashtagDay([])
+                bisect.insort(days, day)
+            self.__get_day(day).add(day_hashtags)
+            self.days_state.set_value(str(day), day_hashtags.serialize(), append=True)
+        self.hashtags_counter.add(hashtag.hashtag for hashtag in hashtags.hashtags)
+        self.users_counter.add(str(hashtag.user_id) for hashtag in hashtags.hashtags if hashtag.user_id is not None)
+
+    def rebuild(self, hashtags: HashtagList):
+        self.state.set_value("days", None)
+        self.hashtags_counter.clear()
+        self.users_counter.clear()
+        self.hashtags_counter.update(hashtag.hashtag for hashtag in hashtags.hashtags)
+        self.users_counter.update(str(hashtag.user_id) for hashtag in hashtags.hashtags if hashtag.user_id is not None)
+        hashtags_by_day = self.__group_by_day(hashtags)
+        for day, day_hashtags in hashtags_by_day.items():
+            self.days_state.set_value(str(day), day_hashtags.serialize())
+        self.days = sorted(hashtags_by_day)
+        self.hashtags_by_day = {day: HashtagDay(day_hashtags.hashtags) for day, day_hashtags in hashtags_by_day.items()}
+        self.hashtags_counter.save()
+        self.users_counter.save()
+
+    def grouped_by_popularity(self, max_to_return, newer_than=None):
+        """:param newer_than: If set, only hashtags written after that timestamp are counted"""
+        return HashtagGroup(count_popular_hashtags(self.counters(newer_than), max_to_return))
+
+    def counters(self, newer_than=None):
+        """
+        Returns a list of counters that add up the uses of each hashtag.
+        :param newer_than: If set, only hashtags written after that timestamp are counted
+        """
+        if newer_than is None:
+            # a copy, as it is updated with new hashtags while the returned counters may still be in use
+            return [self.hashtags.copy()]
+        counters = []
+        days = self.__get_days()
+        first_day = self.__day(newer_than)
+        for day in days[bisect.bisect_left(days, first_day):]:
+            if day == first_day:
+                counters.append(self.__get_day(day).counter_newer_than(newer_than))
+            else:
+                counters.append(self.__get_day(day).counter())
+        return counters
+
+    def grouped_by_user(self, max_to_return):
+        return UserGroup(self.users.most_common(max_to_return))
+
+    def sorted_by_recent_use(self, limit):
+        recent_hashtags = []
+        for day in reversed(self.__get_days()):
+            if len(recent_hashtags) >= limit:
+                break
+            recent_hashtags.extend(reversed(self.__get_day(day).hashtags))
+        return HashtagList(recent_hashtags[:max(limit, 0)])
+
+    def __get_days(self):
+        if self.days is None:
+            self.days = sorted(int(day) for day in self.days_state.list_keys())
+        return self.days
+
+    def __get_day(self, day):
+        hashtag_day = self.hashtags_by_day.get(day)
+        if hashtag_day is None:
+            hashtags = HashtagList.deserialize(self.days_state.get_value(str(day), ""))
+            hashtag_day = self.hashtags_by_day[day] = HashtagDay(hashtags.hashtags)
+        return hashtag_day
+
+    def __group_by_day(self, hashtags: HashtagList):
+        hashtags_by_day = collections.OrderedDict()
+        for hashtag in hashtags.hashtags:
+            hashtags_by_day.setdefault(self.__day(hashtag.date), HashtagList([])).add(hashtag)
+        return hashtags_by_day
+
+    @classmethod
+    def __day(cls, timestamp):
+        return timestamp // cls.SECONDS_IN_A_DAY
+
+
+class PersistedCounter:
+    """
+    Counter persisted on a state value as "key count" lines.
+
+    Changes are appended as new lines with the count increments, instead of rewriting the whole counter,
+    and all the lines of a key are added up when it is read.
+    Once the appended lines outnumber the keys, they are folded into one line per key,
+    so that writes are kept proportional to the changes and the value does not grow with every change.
+    """
+
+    # lines that can be appended over the number of keys before folding them, so that small counters are not
+    # rewritten too often
+    MIN_LINES_TO_FOLD = 100
+
+    def __init__(self, state, key: str):
+        self.state = state
+        self.key = key
+        self.counter = collections.Counter()
+        self.lines = 0
+        data = state.get_value(key)
+        if data is not None:
+            for line in data.splitlines():
+                counter_key, count = line.split(" ")
+                self.counter[counter_key] += int(count)
+                self.lines += 1
+
+    def add(self, keys):
+        """Counts the keys and persists the increments"""
+        increments = collections.Counter(keys)
+        if not increments:
+            return
+        self.counter.update(increments)
+        if self.lines + len(increments) > 2 * len(self.counter) + self.MIN_LINES_TO_FOLD:
+            self.save()
+        else:
+            self.state.set_value(self.key, self.__serialize(increments), append=True)
+            self.lines += len(increments)
+
+    def update(self, keys):
+        """Counts the keys without persisting them, :func:`save` must be called afterwards"""
+        self.counter.update(keys)
+
+    def clear(self):
+        self.counter.clear()
+
+    def save(self):
+        """Rewrites the persisted counter with one line per key"""
+        self.state.set_value(self.key, self.__serialize(self.counter))
+        self.lines = len(self.counter)
+
+    @staticmethod
+    def __serialize(counter):
+        return "".join(("%s %s\n" % (key, count) for key, count in counter.items()))
+
+
+class HashtagDay:
+    def __init__(self, hashtags):
+        self.hashtags = hashtags
+        self.cached_counter = None
+
+    def add(self, hashtags: HashtagList):
+        self.hashtags.extend(hashtags.hashtags)
+        self.cached_counter = None
+
+    def counter(self):
+        if self.cached_counter is None:
+            self.cached_counter = collections.Counter(hashtag.hashtag for hashtag in self.hashtags)
+        return self.cached_counter
+
+    def counter_newer_than(self, timestamp):
+        return collections.Counter(hashtag.hashtag for hashtag in self.hashtags if hashtag.date > timestamp)
 
 
 class HashtagStorageHandler:
@@ -251,4 +493,26 @@ class HashtagStorageHandler:
         return HashtagList.deserialize(hashtags)
 
     def save_new_hashtags(self, hashtags: HashtagList):
+        # get stats before saving the new hashtags, as they may be built from the stored ones now
+        stats = self.get_stats()
         self.event.state.set_value("hashtags", hashtags.serialize(), append=True)
+        stats.add(hashtags)
+
+    def get_stats(self):
+        stats = self.event.cache.hashtags_stats
+        if stats is None:
+            stats = HashtagStats(self.__get_stats_state())
+            if not stats.exists():
+                # first time on this chat, build them from the hashtags saved before stats were introduced
+                stats.rebuild(self.get_stored_hashtags())
+            self.event.cache.hashtags_stats = stats
+        return stats
+
+    def rebuild_stats(self):
+        stats = HashtagStats(self.__get_stats_state())
+        stats.rebuild(self.get_stored_hashtags())
+        self.event.cache.hashtags_stats = stats
+        return stats
+
+    def __get_stats_state(self):
+        return self.event.state.get_for("hashtags_stats")
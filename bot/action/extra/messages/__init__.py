@@ -2,7 +2,7 @@ from bot.action.core.action import Action
 from bot.action.core.command.usagemessage import CommandUsageMessage
 from bot.action.extra.messages import analyzer
 from bot.action.extra.messages.mapper import StoredMessageMapper
-from bot.action.extra.messages.operations import MessageGroup, MessageList, MessageIdOperations
+from bot.action.extra.messages.operations import MessageGroup, MessageList, count_messages_by_user
 from bot.action.extra.messages.opt_out import OptOutManager
 from bot.action.extra.messages.storage import MessageStorageHandler
 from bot.action.extra.messages.stored_message import StoredMessage
@@ -10,7 +10,9 @@ from bot.action.standard.chatsettings import ChatSettings
 from bot.action.standard.userinfo import UserStorageHandler
 from bot.action.util.format import UserFormatter
 from bot.action.util.textformat import FormattedText
+from bot.api.call.future import ApiCallFuture
 from bot.api.domain import Message
+from bot.multithreading.worker.process_pool import ProcessWork
 
 
 def is_store_messages_enabled(event):
@@ -42,21 +44,34 @@ class ListMessageAction(Action):
                 elif action == "show":
                     response = self.get_response_show(event, messages, action_param)
                 else:
-                    response = self.get_response_ranking(event, messages, action_param)
+                    # the response is sent once the messages are counted
+                    self.schedule_response_ranking(event, messages, action_param)
+                    return
         elif action == "whereis":
             response = self.get_response_whereis(event, action_param)
         elif action == "opt-out":
             response = self.get_response_opt_out(event, action_param)
         else:
             response = self.get_response_help(event, help_args)
+        self.send_response(event, response)
+
+    def send_response(self, event, response):
         if type(response) is not list:
             response = [response]
-        last_message = event.message
-        for message in response:
-            message.to_chat(message=last_message)
-            if message.reply_to_message_id is None:
-                message.reply_to_message(last_message)
-            last_message = self.api.send_message(message)
+        self.__send_replying(event.message, response)
+
+    def __send_replying(self, last_message, messages):
+        # each message replies to the previous one, so it is sent once the previous one has been sent,
+        # chaining them on the network workers instead of waiting here for each one of them
+        if last_message is None or len(messages) == 0:
+            # a message was not sent (eg. chat is silenced)
+            return
+        message = messages[0]
+        message.to_chat(message=last_message)
+        if message.reply_to_message_id is None:
+            message.reply_to_message(last_message)
+        ApiCallFuture.completed_with(self.api.async.send_message(message))\
+            .then(lambda sent_message: self.__send_replying(sent_message, messages[1:]))
 
     @staticmethod
     def parse_args(args, reply_to_message):
@@ -164,9 +179,16 @@ class ListMessageAction(Action):
             return FormattedText().normal("🙁 Sorry, ").bold(user).normal(" has opted-out from this feature.").build_message()
         return message.printable_full_message(user_storage_handler)
 
-    def get_response_ranking(self, event, messages, number_of_users_to_display):
+    def schedule_response_ranking(self, event, messages, number_of_users_to_display):
+        # deserializing all the messages is cpu-bound, so it is done on the cpu pool
+        self.scheduler.cpu(ProcessWork(
+            count_messages_by_user, (messages.serialized(), number_of_users_to_display), "messages_ranking",
+            lambda grouped_messages: self.send_response(event, self.get_response_ranking(event, grouped_messages))
+        ))
+
+    def get_response_ranking(self, event, grouped_messages):
         user_storage_handler = UserStorageHandler.get_instance(self.state)
-        printable_messages = messages.grouped_by_user(number_of_users_to_display).printable_info(user_storage_handler)
+        printable_messages = MessageGroup(grouped_messages).printable_info(user_storage_handler)
         return self.__build_success_response_message(event, "Ranking of users:", printable_messages)
 
     @staticmethod
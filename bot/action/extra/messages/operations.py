@@ -1,3 +1,4 @@
+import bisect
 import collections
 
 from bot.action.extra.messages.stored_message import StoredMessage
@@ -7,6 +8,11 @@ from bot.action.util.textformat import FormattedText
 
 class MessageList:
     def __init__(self, ids, storage):
+        """
+        :param ids: A MessageIdIndex, or an iterable with the message ids (as int or str) in any order.
+        """
+        if not isinstance(ids, MessageIdIndex):
+            ids = MessageIdIndex.from_keys(ids)
         self.ids = ids
         self.storage = storage
         self.cached_messages = None
@@ -15,32 +21,26 @@ class MessageList:
         return len(self.ids) == 0
 
     def get(self, id_):
-        str_id = str(id_)
-        if str_id not in self.ids:
+        if int(id_) not in self.ids:
             return None
-        return self.__get_message(str_id)
+        return self.__get_message(id_)
 
-    def grouped_by_user(self, max_to_return):
-        message_users = (message.user_id for message in self.__get_messages())
-        return MessageGroup(collections.Counter(message_users).most_common(max_to_return))
+    def serialized(self):
+        """:return: A list of tuples with the id and the stored data of each message"""
+        return [(str(id_), self.storage.get_value(str(id_))) for id_ in self.ids]
 
     def most_recent(self, limit):
-        if limit <= 0:
-            ids = []
-        else:
-            ids = reversed(MessageIdOperations.sorted(self.ids, reverse=True, keep_only_first=limit))
-        return MessageList(ids, self.storage)
+        return MessageList(self.ids.last(limit), self.storage)
 
     def slice_from(self, from_id, limit):
-        if limit <= 0:
-            ids = []
-        else:
-            ids = MessageIdOperations.sliced(self.ids, from_id=from_id, keep_only_first=limit)
-        return MessageList(ids, self.storage)
+        return MessageList(self.ids.sliced(from_id, limit), self.storage)
 
     def printable_info(self, event, user_storage_handler):
+        messages = self.__get_messages()
+        # retrieved at once, so that the message analyzers find them already in memory
+        user_storage_handler.get_many({message.user_id for message in messages if message.user_id is not None})
         return FormattedText().normal("\n")\
-            .join((message.printable_info(event, user_storage_handler) for message in self.__get_messages()))
+            .join((message.printable_info(event, user_storage_handler) for message in messages))
 
     def __get_messages(self):
         if self.cached_messages is None:
@@ -48,7 +48,66 @@ class MessageList:
         return self.cached_messages
 
     def __get_message(self, id_):
-        return StoredMessage.deserialize(id_, self.storage.get_value(id_))
+        str_id = str(id_)
+        return StoredMessage.deserialize(str_id, self.storage.get_value(str_id))
+
+
+def count_messages_by_user(serialized_messages, max_to_return):
+    """
+    :param serialized_messages: As returned by MessageList.serialized
+    :return: A list of tuples with the user id and the number of messages of the users who wrote most of them
+    """
+    # it is cpu-bound as messages need to be deserialized, so it is run as a ProcessWork
+    message_users = (StoredMessage.deserialize(id_, data).user_id for id_, data in serialized_messages)
+    return collections.Counter(message_users).most_common(max_to_return)
+
+
+class MessageIdIndex:
+    """
+    Message ids kept sorted, so that they can be located by binary search.
+
+    As message ids are sequential on each chat, new ids are usually added at the end.
+    """
+
+    def __init__(self, sorted_ids=()):
+        self.ids = list(sorted_ids)
+
+    @staticmethod
+    def from_keys(keys):
+        return MessageIdIndex(sorted(int(key) for key in keys))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __contains__(self, id_):
+        index = bisect.bisect_left(self.ids, id_)
+        return index < len(self.ids) and self.ids[index] == id_
+
+    def add(self, id_):
+        if len(self.ids) == 0 or id_ > self.ids[-1]:
+            self.ids.append(id_)
+        elif id_ not in self:
+            bisect.insort(self.ids, id_)
+
+    def remove_first(self, number_of_ids):
+        """:return: A list with the removed ids"""
+        removed_ids = self.ids[:number_of_ids]
+        del self.ids[:number_of_ids]
+        return removed_ids
+
+    def last(self, number_of_ids):
+        if number_of_ids <= 0:
+            return MessageIdIndex()
+        return MessageIdIndex(self.ids[-number_of_ids:])
+
+    def sliced(self, from_id, number_of_ids):
+        if number_of_ids <= 0:
+            return MessageIdIndex()
+        index = bisect.bisect_left(self.ids, from_id)
+        return MessageIdIndex(self.ids[index:index+number_of_ids])
 
 
 class MessageGroup:
@@ -56,48 +115,9 @@ class MessageGroup:
         self.grouped_messages = grouped_messages
 
     def printable_info(self, user_storage_handler):
+        formatted_users = UserFormatter.retrieve_and_format_many(
+            (user_id for user_id, _ in self.grouped_messages), user_storage_handler
+        )
         return FormattedText().normal("\n".join(
-            ("%s → %s" % (count, UserFormatter.retrieve_and_format(user_id, user_storage_handler))
-             for user_id, count in self.grouped_messages)))
-
-
-class MessageIdOperations:
-    @classmethod
-    def sorted(cls, ids, reverse=False, keep_only_first=None):
-        int_ids = cls.__to_int(ids)
-        int_ids.sort(reverse=reverse)
-        int_ids = cls.keep_only_first(int_ids, keep_only_first)
-        return cls.__to_str(int_ids)
-
-    @classmethod
-    def sliced(cls, ids, from_id, keep_only_first=None):
-        int_ids = cls.__to_int(ids)
-        int_ids.sort()
-        if len(int_ids) == 0 or from_id > int_ids[-1]:
-            return []
-        min_id = int_ids[0]
-        from_id = from_id if from_id > min_id else min_id
-        while from_id not in int_ids:
-            from_id += 1
-        index = int_ids.index(from_id)
-        int_ids = int_ids[index:]
-        int_ids = cls.keep_only_first(int_ids, keep_only_first)
-        return cls.__to_str(int_ids)
-
-    @classmethod
-    def __to_int(cls, ids):
-        return cls.__to(int, ids)
-
-    @classmethod
-    def __to_str(cls, ids):
-        return cls.__to(str, ids)
+            ("%s → %s" % (count, formatted_users[user_id]) for user_id, count in self.grouped_messages)))
 
-    @staticmethod
-    def __to(func, ids):
-        return [func(id_) for id_ in ids]
-
-    @staticmethod
-    def keep_only_first(ids, number_of_elements_to_keep):
-        if number_of_elements_to_keep is not None:
-            ids = ids[:number_of_elements_to_keep]
-        return ids
@@ -1,7 +1,7 @@
 import json
 
 from bot.action.extra.messages.mapper import StoredMessageMapper
-from bot.action.extra.messages.operations import MessageList, MessageIdOperations
+from bot.action.extra.messages.operations import MessageList, MessageIdIndex
 
 MIN_MESSAGES_TO_KEEP = 1000
 MAX_MESSAGES_TO_KEEP = 5000
@@ -10,22 +10,32 @@ MAX_MESSAGES_TO_KEEP = 5000
 class MessageStorageHandler:
     def __init__(self, event):
         self.state = event.state.get_for("messages")
+        self.cache = event.cache
 
     def get_stored_messages(self):
-        return MessageList(self.state.list_keys(), self.state)
+        return MessageList(self.__get_index(), self.state)
 
     def save_message(self, message):
         data = StoredMessageMapper.from_api(message).map().to_data()
         dump = json.dumps(data)
         self.state.set_value(str(message.message_id), dump + "\n", append=True)
+        self.__get_index().add(message.message_id)
 
     def delete_old_messages(self):
-        stored_ids = self.state.list_keys()
-        if len(stored_ids) > MAX_MESSAGES_TO_KEEP:
-            number_of_messages_to_delete = len(stored_ids) - MIN_MESSAGES_TO_KEEP
-            ids_to_delete = MessageIdOperations.sorted(stored_ids, keep_only_first=number_of_messages_to_delete)
+        index = self.__get_index()
+        if len(index) > MAX_MESSAGES_TO_KEEP:
+            number_of_messages_to_delete = len(index) - MIN_MESSAGES_TO_KEEP
+            ids_to_delete = index.remove_first(number_of_messages_to_delete)
             self.__delete_messages(ids_to_delete)
 
     def __delete_messages(self, message_ids_to_delete):
         for message_id in message_ids_to_delete:
-            self.state.set_value(message_id, None)
+            self.state.set_value(str(message_id), None)
+
+    def __get_index(self):
+        # the index is built from storage once per chat, and kept up to date in cache afterwards,
+        # to avoid listing and sorting all stored messages on every operation
+        index = self.cache.messages_index
+        if index is None:
+            index = self.cache.messages_index = MessageIdIndex.from_keys(self.state.list_keys())
+        return index
@@ -269,15 +269,15 @@ class ListPoleAction(Action):
             event.command = UnderscoredCommandBuilder.build_command(original_command, "tz", timezone)
         if action in ("recent", "ranking", "last"):
             state = TimezoneStorageHandler(event.state.get_for("pole")).get_timezone_state(timezone)
-            poles = PoleStorageHandler(state).get_stored_poles(self.kind)
-            if poles.is_empty():
+            handler = PoleStorageHandler(state)
+            if not handler.has_poles(self.kind):
                 response = self.get_response_empty()
             elif action == "recent":
-                response = self.get_response_recent(event, poles, action_param)
+                response = self.get_response_recent(event, handler, action_param)
             elif action == "ranking":
-                response = self.get_response_ranking(event, poles, action_param)
+                response = self.get_response_ranking(event, handler, action_param)
             else:
-                response = self.get_response_last(event, poles, action_param)
+                response = self.get_response_last(event, handler, action_param)
         else:
             response = self.get_response_help(event, help_args)
         if response.reply_to_message_id is None:
@@ -327,22 +327,23 @@ class ListPoleAction(Action):
         return Message.create(self.__formatted(_("I have not seen any {poles} here.\n"
                                                  "Wait until next day start, make a {pole} and try again.")))
 
-    def get_response_recent(self, event, poles, number_of_poles_to_display):
+    def get_response_recent(self, event, handler, number_of_poles_to_display):
         user_storage_handler = UserStorageHandler.get_instance(self.state)
-        sorted_poles = poles.most_recent(number_of_poles_to_display)
+        sorted_poles = handler.get_most_recent_poles(self.kind, number_of_poles_to_display)
         printable_poles = sorted_poles.printable_version(event, user_storage_handler)
         return self.__build_success_response_message(event, self.__formatted(_("Most recent {poles}:")), printable_poles)
 
-    def get_response_ranking(self, event, poles, number_of_users_to_display):
+    def get_response_ranking(self, event, handler, number_of_users_to_display):
         user_storage_handler = UserStorageHandler.get_instance(self.state)
-        printable_poles = poles.grouped_by_user(number_of_users_to_display).printable_version(user_storage_handler)
+        grouped_poles = handler.get_users_with_most_poles(self.kind, number_of_users_to_display)
+        printable_poles = grouped_poles.printable_version(user_storage_handler)
         recent_poles_command = UnderscoredCommandBuilder.build_command(event.command, "recent")
         recent_poles_text = FormattedText().normal(_("Write {0} to see recent {poles}."))\
             .start_format().normal(recent_poles_command).normal(**self.pole_format_dict).end_format()
         return self.__build_success_response_message(event, self.__formatted(_("Ranking of {poles}:")), printable_poles, recent_poles_text)
 
-    def get_response_last(self, event, poles, number_of_pole_to_display):
-        pole = poles.get(-number_of_pole_to_display)
+    def get_response_last(self, event, handler, number_of_pole_to_display):
+        pole = handler.get_pole(self.kind, -number_of_pole_to_display)
         if pole is None:
             return Message.create(self.__formatted(_("Invalid {pole} number. Range [1,total_{poles}]")))
         text = _("This is the {0} last {pole}").format(number_of_pole_to_display, **self.pole_format_dict)
@@ -404,8 +405,9 @@ class Pole:
         self.date = date
         self.message_id = message_id
 
-    def printable_version(self, event, user_storage_handler, index):
-        formatted_user = UserFormatter.retrieve_and_format(self.user_id, user_storage_handler)
+    def printable_version(self, event, formatted_users, index):
+        """:param formatted_users: As returned by UserFormatter.retrieve_and_format_many"""
+        formatted_user = formatted_users[self.user_id]
         formatted_date = DateFormatter.format(self.date)
         view_pole_command = UnderscoredCommandBuilder.build_command(event.command, str(index+1))
         return _("{date} → {user} → {view_pole_command}")\
@@ -443,8 +445,10 @@ class PoleList:
         return PoleList(reversed(self.poles[-limit:]))
 
     def printable_version(self, event, user_storage_handler):
-        return "\n".join((pole.printable_version(event, user_storage_handler, index)
-                          for index, pole in enumerate(self.poles)))
+        poles = list(self.poles)
+        formatted_users = UserFormatter.retrieve_and_format_many((pole.user_id for pole in poles), user_storage_handler)
+        return "\n".join((pole.printable_version(event, formatted_users, index)
+                          for index, pole in enumerate(poles)))
 
     @staticmethod
     def deserialize(poles_data):
@@ -462,7 +466,9 @@ class PoleGroup:
 class PoleGroupPrintableVersionHelper:
     def __init__(self, grouped_poles, user_storage_handler):
         self.grouped_poles = grouped_poles
-        self.user_storage_handler = user_storage_handler
+        self.formatted_users = UserFormatter.retrieve_and_format_many(
+            (user_id for user_id, _ in grouped_poles), user_storage_handler
+        )
         self.printable_poles = []
 
     def printable_version(self):
@@ -480,13 +486,21 @@ class PoleGroupPrintableVersionHelper:
 
     def __add_grouped_pole(self, text, grouped_pole):
         user_id, count = grouped_pole
-        formatted_user = UserFormatter.retrieve_and_format(user_id, self.user_storage_handler)
+        formatted_user = self.formatted_users[user_id]
         formatted_grouped_pole = FormattedText().normal(text).start_format()\
             .bold(user=formatted_user).normal(pole_count=count).end_format()
         self.printable_poles.append(formatted_grouped_pole)
 
 
 class PoleStorageHandler:
+    """
+    Poles are stored as an append-only log with a line per pole, from the oldest to the most recent one.
+
+    Along with it, the number of poles of each user is stored in an index, so that rankings do not need
+    to parse the whole log, which grows every day. Users are kept in the index in the order they made
+    their first pole, so that ties are ranked as they would be by counting the log.
+    """
+
     def __init__(self, state):
         self.state = state
 
@@ -496,8 +510,60 @@ class PoleStorageHandler:
             poles = ""
         return PoleList.deserialize(poles)
 
+    def has_poles(self, storage_name):
+        return self.state.exists_value(storage_name)
+
+    def get_most_recent_poles(self, storage_name, limit):
+        """:return: A PoleList with the last `limit` poles, the most recent first, parsing only them."""
+        if limit <= 0:
+            return PoleList([])
+        poles = self.state.get_value(storage_name, "").rstrip("\n")
+        if not poles:
+            return PoleList([])
+        return PoleList([Pole.deserialize(pole) for pole in reversed(poles.rsplit("\n", limit)[-limit:])])
+
+    def get_pole(self, storage_name, index):
+        """:param index: As in PoleList.get"""
+        if index < 0:
+            poles = self.get_most_recent_poles(storage_name, -index)
+            return poles.get(-index - 1) if len(poles.poles) == -index else None
+        return self.get_stored_poles(storage_name).get(index)
+
+    def get_users_with_most_poles(self, storage_name, max_to_return):
+        """:return: A PoleGroup, as PoleList.grouped_by_user, but read from the index"""
+        counts = self.__get_pole_counts(storage_name)
+        return PoleGroup(collections.Counter(counts).most_common(max_to_return))
+
     def save_pole_to(self, storage_name, pole: Pole):
+        counts = self.__get_pole_counts(storage_name)
         self.state.set_value(storage_name, pole.serialize(), append=True)
+        user_id = str(pole.user_id)
+        counts[user_id] = counts.get(user_id, 0) + 1
+        self.__save_pole_counts(storage_name, counts)
+
+    def __get_pole_counts(self, storage_name):
+        """:return: An OrderedDict with the number of poles of each user id, built from the log if not indexed"""
+        counts_data = self.state.get_value(self.__get_counts_key(storage_name))
+        if counts_data is None:
+            counts = collections.OrderedDict()
+            for pole in self.get_stored_poles(storage_name).poles:
+                counts[pole.user_id] = counts.get(pole.user_id, 0) + 1
+            if counts:
+                self.__save_pole_counts(storage_name, counts)
+            return counts
+        counts = collections.OrderedDict()
+        for line in counts_data.splitlines():
+            user_id, count = line.split(" ")
+            counts[user_id] = int(count)
+        return counts
+
+    def __save_pole_counts(self, storage_name, counts):
+        counts_data = "".join("%s %s\n" % (user_id, count) for user_id, count in counts.items())
+        self.state.set_value(self.__get_counts_key(storage_name), counts_data)
+
+    @staticmethod
+    def __get_counts_key(storage_name):
+        return storage_name + "_count_by_user"
 
 
 class TimezoneStorageHandler:
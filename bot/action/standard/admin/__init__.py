@@ -35,18 +35,22 @@ class HaltAction(Action):
         sys.exit(EXIT_STATUS_TO_HALT_BOT)
 
 
+ADMINS_ONLY_ERROR_RESPONSE = "You are not allowed to perform this action (admins only)."
+
+
+def is_admin(config, user):
+    return user is not None and str(user.id) == config.admin_user_id
+
+
 class AdminAction(IntermediateAction):
     def process(self, event):
-        from_ = event.message.from_
-        if from_ is not None and str(from_.id) == self.config.admin_user_id:
+        if is_admin(self.config, event.message.from_):
             self._continue(event)
 
 
 class AdminActionWithErrorMessage(IntermediateAction):
     def process(self, event):
-        from_ = event.message.from_
-        if from_ is not None and str(from_.id) == self.config.admin_user_id:
+        if is_admin(self.config, event.message.from_):
             self._continue(event)
         else:
-            error_response = "You are not allowed to perform this action (admins only)."
-            self.api.send_message(Message.create_reply(event.message, error_response))
+            self.api.send_message(Message.create_reply(event.message, ADMINS_ONLY_ERROR_RESPONSE))
@@ -31,13 +31,34 @@ class ConfigStatus:
             self._item("Traceback chat", self.__formatted_chat(self.config.traceback_chat_id())),
             self._item("Async enabled", self.config.async()),
             self._item("Reuse connections", self.config.reuse_connections()),
+            self._item("Max network connections", self.config.max_network_connections),
+            self._item("Rate limit", self.config.rate_limit()),
+            self._item("Asyncio api", self.config.asyncio_api()),
+            self._item("Asyncio api max connections", self.config.asyncio_api_max_connections),
             self._item("Debug on stdout", self.config.debug()),
             self._item("Send traceback on error (deprecated)", self.config.send_error_tracebacks()),
             self._item("Scheduler events on log chat", self.config.scheduler_events_on_log_chat()),
             self._item("Sleep on get_updates error", self.config.sleep_seconds_on_get_updates_error, "seconds"),
             self._item("Max error time in normal mode", self.config.max_error_seconds_allowed_in_normal_mode, "seconds"),
             self._item("Max network workers", self.config.max_network_workers),
-            self._item("Instance name", self.config.instance_name)
+            self._item("Max cpu workers", self.config.max_cpu_workers, "processes"),
+            self._item("Instance name", self.config.instance_name),
+            self._item("Updates mode", self.config.updates_mode),
+            self._item("Webhook URL", self.config.webhook_url),
+            self._item("Webhook listen address", self.__formatted_address()),
+            self._item("Webhook secret token", bool(self.config.webhook_secret_token)),
+            self._item("Webhook queue size", self.config.webhook_queue_size),
+            self._item("Prefetch updates", self.config.prefetch_updates, "batches"),
+            self._item("Chat workers", self.config.chat_workers),
+            self._item("Max updates in flight", self.config.max_updates_in_flight),
+            self._item("Compile actions", self.config.compile_actions()),
+            self._item("Config reload interval", self.config.config_reload_seconds, "seconds"),
+            self._item("Max cached nodes", self.config.max_cached_nodes),
+            self._item("State storage", self.config.state_storage),
+            self._item("State write-back", self.config.state_write_back()),
+            self._item("State flush interval", self.config.state_flush_seconds, "seconds"),
+            self._item("State durability", self.config.state_durability),
+            self._item("State max cached values", self.config.state_max_cached_values)
         )
 
     @staticmethod
@@ -52,6 +73,9 @@ class ConfigStatus:
             text.normal(" ").normal(additional_text)
         return text
 
+    def __formatted_address(self):
+        return "{host}:{port}".format(host=self.config.webhook_listen_host, port=self.config.webhook_listen_port)
+
     def __formatted_chat(self, chat_id):
         if chat_id:
             chat = self.user_storage_handler.get(chat_id)
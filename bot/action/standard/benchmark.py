@@ -4,13 +4,70 @@ import time
 import psutil
 
 from bot.action.core.action import Action
+from bot.action.core.update import Update
 from bot.action.util.format import TimeFormatter, SizeFormatter
 from bot.action.util.textformat import FormattedText
-from bot.api.domain import Message
+from bot.api import json_backend
+from bot.api.domain import Message, ApiObject
+from bot.multithreading.work import WORK_PRIORITY_NAMES
 
 
 CPU_USAGE_SAMPLE_SECONDS = 5
 
+JSON_BENCHMARK_ITERATIONS = 1000
+
+# sample of a big sendMessage request and its response
+JSON_BENCHMARK_REQUEST = {
+    "chat_id": -1001234567890,
+    "text": "benchmark \u00f1 " * 256,
+    "parse_mode": "HTML",
+    "reply_to_message_id": 1234,
+    "reply_markup": {
+        "inline_keyboard": [[{"text": "button " + str(i), "callback_data": "data " + str(i)}] for i in range(8)]
+    }
+}
+JSON_BENCHMARK_RESPONSE = json_backend.stdlib.dumps({
+    "ok": True,
+    "result": {
+        "message_id": 5678,
+        "from": {"id": 123456789, "is_bot": True, "first_name": "Bot", "username": "bot"},
+        "chat": {"id": -1001234567890, "title": "Group", "type": "supergroup"},
+        "date": 1500000000,
+        "text": JSON_BENCHMARK_REQUEST["text"],
+        "reply_markup": JSON_BENCHMARK_REQUEST["reply_markup"]
+    }
+})
+
+API_OBJECT_BENCHMARK_ITERATIONS = 1000
+
+# sample of an update, whose fields are accessed as filters, actions and loggers usually do
+API_OBJECT_BENCHMARK_UPDATE = {
+    "update_id": 1000,
+    "message": {
+        "message_id": 1234,
+        "from": {"id": 123456789, "is_bot": False, "first_name": "User", "username": "user"},
+        "chat": {"id": -1001234567890, "title": "Group", "type": "supergroup"},
+        "date": 1500000000,
+        "text": "/command@bot arguments",
+        "entities": [{"type": "bot_command", "offset": 0, "length": 12}],
+        "reply_to_message": {
+            "message_id": 1233,
+            "from": {"id": 987654321, "is_bot": False, "first_name": "Other"},
+            "chat": {"id": -1001234567890, "title": "Group", "type": "supergroup"},
+            "date": 1499999999,
+            "text": "text"
+        }
+    }
+}
+
+EVENT_BENCHMARK_ITERATIONS = 1000
+
+# attributes set on the event by each level of a typical action tree (logger, filters, per chat, i18n, command)
+EVENT_BENCHMARK_LEVELS = (("log", "logger"), ("message", "chat"), ("config", "state", "cache", "settings"), ("_",),
+                          ("command", "command_args"))
+# children of each level that get a copy of the event and discard it (eg. filters not matching it)
+EVENT_BENCHMARK_DISCARDED_COPIES = 4
+
 
 class BenchmarkAction(Action):
     def __init__(self, cpu_usage_sample_seconds: float = CPU_USAGE_SAMPLE_SECONDS):
@@ -60,7 +117,10 @@ class BenchmarkAction(Action):
             FormattedText().bold("Benchmark result"),
             api_time,
             code_time,
-            storage_time
+            storage_time,
+            self.__get_json_benchmark_result(),
+            self.__get_api_object_benchmark_result(),
+            self.__get_event_benchmark_result()
         ))
 
     def __benchmark_send_message(self, message: Message):
@@ -72,6 +132,70 @@ class BenchmarkAction(Action):
     def __benchmark_storage_access(self):
         return self.__benchmark(lambda: self.state.get_for_chat_id("0").get_for("any_feature").any_value)
 
+    def __get_json_benchmark_result(self):
+        backends = [json_backend.backend]
+        if json_backend.backend.name != json_backend.stdlib.name:
+            # to compare with
+            backends.append(json_backend.stdlib)
+        results = FormattedText().normal(", ").join([self.__get_json_backend_result(backend) for backend in backends])
+        return FormattedText().normal("API call JSON encoding: ").concat(results)
+
+    def __get_json_backend_result(self, backend: json_backend.JsonBackend):
+        json_time_value = TimeFormatter.format(self.__benchmark_json_backend(backend))
+        return FormattedText()\
+            .normal("{json_time} ({backend})").start_format()\
+            .bold(json_time=json_time_value).normal(backend=backend.name).end_format()
+
+    @staticmethod
+    def __benchmark_json_backend(backend: json_backend.JsonBackend):
+        """Returns the CPU time spent encoding a request and decoding its response."""
+        start_time = time.process_time()
+        for _ in range(JSON_BENCHMARK_ITERATIONS):
+            backend.dumps(JSON_BENCHMARK_REQUEST)
+            backend.loads(JSON_BENCHMARK_RESPONSE)
+        return (time.process_time() - start_time) / JSON_BENCHMARK_ITERATIONS
+
+    def __get_api_object_benchmark_result(self):
+        api_object_time_value = TimeFormatter.format(self.__benchmark_api_object_access())
+        return FormattedText()\
+            .normal("Update fields access: {api_object_time}").start_format()\
+            .bold(api_object_time=api_object_time_value).end_format()
+
+    @staticmethod
+    def __benchmark_api_object_access():
+        """Returns the CPU time spent wrapping an update and accessing its fields repeatedly."""
+        start_time = time.process_time()
+        for _ in range(API_OBJECT_BENCHMARK_ITERATIONS):
+            update = ApiObject.wrap_api_object(API_OBJECT_BENCHMARK_UPDATE)
+            for _ in range(10):
+                message = update.message
+                message.from_.id, message.chat.id, message.chat.type, message.text
+                message.reply_to_message.from_.id
+                for entity in message.entities:
+                    entity.type
+        return (time.process_time() - start_time) / API_OBJECT_BENCHMARK_ITERATIONS
+
+    def __get_event_benchmark_result(self):
+        event_time_value = TimeFormatter.format(self.__benchmark_event_copies())
+        return FormattedText()\
+            .normal("Event copies: {event_time}").start_format()\
+            .bold(event_time=event_time_value).end_format()
+
+    @staticmethod
+    def __benchmark_event_copies():
+        """Returns the CPU time spent copying an event down an action tree, as action groups do."""
+        start_time = time.process_time()
+        for _ in range(EVENT_BENCHMARK_ITERATIONS):
+            event = Update(None)
+            for attributes in EVENT_BENCHMARK_LEVELS:
+                for _ in range(EVENT_BENCHMARK_DISCARDED_COPIES):
+                    event._copy().message
+                event = event._copy()
+                for attribute in attributes:
+                    setattr(event, attribute, attribute)
+                event.message, event.chat, event.update
+        return (time.process_time() - start_time) / EVENT_BENCHMARK_ITERATIONS
+
     def _get_bot_status(self):
         process_uptime_value = TimeFormatter.format(self.__get_process_uptime())
         process_uptime = FormattedText()\
@@ -92,14 +216,62 @@ class BenchmarkAction(Action):
         worker_pools_value = self.scheduler.get_worker_pools()
         worker_pools_number = WorkersAction.get_worker_pools_number(worker_pools_value)
 
-        return FormattedText().newline().join((
+        status = [
             FormattedText().bold("Bot status"),
             process_uptime,
             process_memory_usage,
             thread_number,
             workers_number,
-            worker_pools_number
-        ))
+            worker_pools_number,
+            self.__get_node_cache_status("State nodes", self.state.get_cached_children_stats()),
+            self.__get_node_cache_status("Cache nodes", self.cache.get_cached_children_stats())
+        ]
+        connection_pool = self.api.no_async.telegram_api.connection_pool
+        if connection_pool is not None:
+            status.append(self.__get_connection_pool_status(connection_pool.stats))
+        rate_limiter = self.api.no_async.rate_limiter
+        if rate_limiter is not None:
+            status.append(self.__get_rate_limiter_status(rate_limiter.rate_limit_stats))
+        prefetcher = self.api.no_async.updates_prefetcher
+        if prefetcher is not None:
+            status.append(self.__get_prefetch_status(prefetcher.stats))
+
+        return FormattedText().newline().join(status)
+
+    @staticmethod
+    def __get_node_cache_status(label: str, stats):
+        return FormattedText()\
+            .normal("{label}: {hits} hits, {misses} misses, {evictions} evicted").start_format()\
+            .normal(label=label).bold(hits=stats.hits, misses=stats.misses, evictions=stats.evictions)\
+            .end_format()
+
+    @staticmethod
+    def __get_connection_pool_status(stats):
+        return FormattedText()\
+            .normal("Connection pool: {hits} reused, {misses} new ({handshakes} handshakes), {expired} expired, "
+                    "{pings} pings ({failed_pings} failed)").start_format()\
+            .bold(hits=stats.hits, misses=stats.misses, handshakes=stats.handshakes, expired=stats.expired,
+                  pings=stats.pings, failed_pings=stats.failed_pings)\
+            .end_format()
+
+    @staticmethod
+    def __get_rate_limiter_status(stats):
+        return FormattedText()\
+            .normal("Rate limiter: {queue_size} queued (max {max_queue_size}), {delayed}/{dispatched} calls delayed "
+                    "({average_delay} avg, {max_delay} max), {retried} retried").start_format()\
+            .bold(queue_size=stats.queue_size, max_queue_size=stats.max_queue_size, delayed=stats.delayed_calls,
+                  dispatched=stats.dispatched_calls, average_delay=TimeFormatter.format(stats.average_delay_seconds),
+                  max_delay=TimeFormatter.format(stats.max_delay_seconds), retried=stats.retried_calls)\
+            .end_format()
+
+    @staticmethod
+    def __get_prefetch_status(stats):
+        return FormattedText()\
+            .normal("Updates prefetching: {prefetched}/{total} batches prefetched ({resumed} resumed), "
+                    "{saved} saved").start_format()\
+            .bold(prefetched=stats.prefetched_batches, total=stats.prefetched_batches + stats.fetched_batches,
+                  resumed=stats.resumed_batches, saved=TimeFormatter.format(stats.saved_seconds))\
+            .end_format()
 
     def __get_process_uptime(self):
         create_time = psutil.Process().create_time()
@@ -142,13 +314,60 @@ class BenchmarkAction(Action):
 
 class WorkersAction(Action):
     def process(self, event):
-        response = FormattedText().newline().newline().join((
-            self.get_active_threads(),
-            self.get_running_workers(),
-            self.get_worker_pools()
-        ))
+        if event.command_args.strip() == "stats":
+            response = self.get_workers_stats()
+        else:
+            response = FormattedText().newline().newline().join((
+                self.get_active_threads(),
+                self.get_running_workers(),
+                self.get_worker_pools()
+            ))
         self.api.send_message(response.build_message().to_chat_replying(event.message))
 
+    def get_workers_stats(self):
+        """May contain sensitive info (like user ids). Use with care."""
+        workers = []
+        seen_stats = set()
+        # pool workers share the stats with their pool, so pools go first to display them with its name
+        for worker in self.scheduler.get_worker_pools() + self.scheduler.get_running_workers():
+            stats = getattr(worker, "stats", None)
+            if stats is not None and id(stats) not in seen_stats and stats.works > 0:
+                seen_stats.add(id(stats))
+                workers.append(worker)
+        if not workers:
+            return FormattedText().normal("No works run yet.")
+        return FormattedText().newline().newline().join(
+            [FormattedText().bold("Workers stats of recent works (p50 / p95 / p99)")] +
+            [self._get_worker_stats(worker) for worker in workers]
+        )
+
+    def _get_worker_stats(self, worker):
+        stats = worker.stats
+        work_queue = getattr(worker, "queue", None)
+        queue_size = work_queue.qsize() if work_queue is not None else "-"
+        header = FormattedText()\
+            .normal("{name}: {queue_size} queued, {works} works, {throughput} works/s").start_format()\
+            .bold(name=worker.name, queue_size=queue_size, works=stats.works,
+                  throughput="{:.2f}".format(stats.get_throughput()))\
+            .end_format()
+        total, by_name = stats.get_work_stats()
+        lines = [header, self._get_work_stats("all", total)]
+        for name, work_stats in sorted(by_name.items(), key=lambda item: -item[1].works):
+            lines.append(self._get_work_stats(name, work_stats))
+        return FormattedText().newline().join(lines)
+
+    def _get_work_stats(self, name: str, work_stats):
+        return FormattedText()\
+            .normal(" - {name} ({works}): wait {wait}, run {run}").start_format()\
+            .bold(name=name).normal(works=work_stats.works)\
+            .normal(wait=self._format_percentiles(work_stats.wait), run=self._format_percentiles(work_stats.run))\
+            .end_format()
+
+    @staticmethod
+    def _format_percentiles(histogram):
+        values = [histogram.percentile(percentile) for percentile in (50, 95, 99)]
+        return " / ".join("-" if value is None else "{:.3g} ms".format(value * 1000) for value in values)
+
     def get_active_threads(self):
         return FormattedText()\
             .concat(self.get_active_threads_number())\
@@ -205,12 +424,30 @@ class WorkersAction(Action):
         return FormattedText().normal("Worker pools: {number}")\
             .start_format().bold(number=worker_pools_number).end_format()
 
-    @staticmethod
-    def _get_worker_pools_names(worker_pools: list):
+    def _get_worker_pools_names(self, worker_pools: list):
         """May contain sensitive info (like user ids). Use with care."""
         return FormattedText().join(
             [
                 FormattedText().newline().normal(" - {name}").start_format().bold(name=worker.name).end_format()
+                .concat(self._get_worker_pool_wait_times(worker))
                 for worker in worker_pools
             ]
         )
+
+    @staticmethod
+    def _get_worker_pool_wait_times(worker_pool):
+        """Time works wait on the pool queue before starting to run, by priority."""
+        stats = getattr(worker_pool.queue, "stats", None)
+        if stats is None:
+            return FormattedText()
+        return FormattedText().join(
+            [
+                FormattedText().newline()
+                .normal("    {priority}: {works} works, {average} avg, {max} max wait").start_format()
+                .normal(priority=WORK_PRIORITY_NAMES.get(priority, priority))
+                .bold(works=wait_stats.works, average=TimeFormatter.format(wait_stats.average_seconds),
+                      max=TimeFormatter.format(wait_stats.max_seconds))
+                .end_format()
+                for priority, wait_stats in stats.get()
+            ]
+        )
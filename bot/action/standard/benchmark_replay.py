@@ -0,0 +1,168 @@
+"""
+Replays a stream of updates through the real BotManager action tree, reporting the processing time per update.
+
+The Telegram api is replaced by a fake one that answers every call without any network access,
+and the state is kept in memory, so that the time measured is the one spent on the actions.
+
+Run it from the project directory, with a JSON file of updates (one per line) captured from the bot,
+or with the number of updates of a synthetic stream to generate (1000 by default):
+
+    python -m bot.action.standard.benchmark_replay [updates.jsonl | number_of_updates]
+"""
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from bot.action.core.action import Action
+from bot.action.core.update import Update
+from bot.api.api import Api
+from bot.api.domain import ApiObject
+from bot.manager import BotManager
+from bot.multithreading.scheduler import SchedulerApi
+from bot.storage import Config, Cache
+from bot.storage.writeback import WriteBackState, WriteBackBuffer
+
+
+DEFAULT_NUMBER_OF_UPDATES = 1000
+
+NUMBER_OF_RUNS = 3
+
+# seconds before the modified state values would be written to disk, long enough for them to never be
+STATE_FLUSH_SECONDS = 24 * 3600
+
+CONFIG_VALUES = {
+    "auth_token": "0:replay",
+    "admin_chat_id": "1",
+    "admin_user_id": "1",
+    "debug": "false",
+    "async": "false"
+}
+
+BOT_INFO = {"id": 1000, "is_bot": True, "first_name": "Bot", "username": "bot"}
+
+
+class FakeTelegramBotApi:
+    """Answers every api call with a message, as most calls send one, without any network access."""
+
+    connection_pool = None
+
+    def __init__(self):
+        self.calls = 0
+
+    def __getattr__(self, item):
+        return lambda **params: self.__answer(params)
+
+    def __answer(self, params: dict):
+        self.calls += 1
+        return {
+            "message_id": self.calls,
+            "chat": {"id": params.get("chat_id"), "type": "supergroup"},
+            "date": int(time.time()),
+            "text": params.get("text", "")
+        }
+
+
+class ReplayBot:
+    """Sets up the action tree as Bot does, but with the fake api and in-memory state."""
+
+    def __init__(self, config_dir: str, state_dir: str):
+        self.telegram_api = FakeTelegramBotApi()
+        self.config = Config(config_dir)
+        self.state = WriteBackState(state_dir, WriteBackBuffer(STATE_FLUSH_SECONDS, "none", 0))
+        self.cache = Cache()
+        self.cache.bot_info = ApiObject.wrap_api_object(BOT_INFO)
+        self.api = Api(self.telegram_api, self.state)
+        self.scheduler = SchedulerApi(1, self.__error, lambda worker: None, lambda worker: None)
+        self.action = None
+
+    def set_action(self, action: Action):
+        action.setup(self.api, self.config, self.state, self.cache, self.scheduler)
+        self.action = action
+
+    @staticmethod
+    def __error(error, *args):
+        raise error
+
+
+def synthetic_updates(number_of_updates: int, seed: int = 1):
+    """
+    Returns a stream of updates resembling the traffic of a bot on a few groups and private chats:
+    mostly texts, some of them with hashtags, and some commands, voices and edited messages.
+    """
+    rnd = random.Random(seed)
+    updates = []
+    for update_id in range(number_of_updates):
+        chat_id = rnd.choice((-1001, -1002, -1003, 5, 6))
+        message = {
+            "message_id": update_id + 1,
+            "from": {"id": rnd.randint(2, 50), "is_bot": False, "first_name": "User"},
+            "chat": {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private"},
+            "date": 1500000000 + update_id
+        }
+        kind = rnd.random()
+        if kind < 0.06:
+            command = rnd.choice(("/ping", "/version", "/start"))
+            message["text"] = command
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        elif kind < 0.14:
+            message["voice"] = {"file_id": "voice%s" % update_id, "duration": 3, "file_size": 1000}
+        elif kind < 0.3:
+            message["text"] = "hello #tag%s world" % rnd.randint(1, 5)
+            message["entities"] = [{"type": "hashtag", "offset": 6, "length": 5}]
+        else:
+            message["text"] = "hello world %s" % update_id
+        message_type = "edited_message" if rnd.random() < 0.1 else "message"
+        updates.append({"update_id": update_id, message_type: message})
+    return updates
+
+
+def load_updates(path: str):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay(action: Action, updates: list, update_ids):
+    """:return: Process time spent per update, in seconds"""
+    start = time.process_time()
+    for update_data in updates:
+        # update ids must keep increasing between runs, or they would be seen as a gap
+        update_data["update_id"] = next(update_ids)
+        action.process(Update(ApiObject.wrap_api_object(update_data)))
+    return (time.process_time() - start) / len(updates)
+
+
+def main(args):
+    if args and not args[0].isdigit():
+        updates = load_updates(args[0])
+    else:
+        updates = synthetic_updates(int(args[0]) if args else DEFAULT_NUMBER_OF_UPDATES)
+    work_dir = tempfile.mkdtemp(prefix="benchmark_replay")
+    try:
+        config_dir = os.path.join(work_dir, "config")
+        os.mkdir(config_dir)
+        for key, value in CONFIG_VALUES.items():
+            with open(os.path.join(config_dir, key), "w") as f:
+                f.write(value)
+        bot = ReplayBot(config_dir, os.path.join(work_dir, "state"))
+        manager = BotManager.__new__(BotManager)
+        manager.bot = bot
+        manager.setup_actions()
+        update_ids = itertools.count(1)
+        # warm up, so that caches are filled as they would be on a running bot
+        replay(bot.action, updates, update_ids)
+        seconds_per_update = min(replay(bot.action, updates, update_ids) for _ in range(NUMBER_OF_RUNS))
+        print("{updates} updates, {time:.0f} us per update (best of {runs} runs), {calls} api calls".format(
+            updates=len(updates), time=seconds_per_update * 1000000, runs=NUMBER_OF_RUNS,
+            calls=bot.telegram_api.calls
+        ))
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
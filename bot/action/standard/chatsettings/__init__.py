@@ -96,12 +96,12 @@ class ChatSettingsRepository:
     def __get_new_and_add_to_cache(self, chat_state, chat_id):
         settings_state = chat_state.get_for("settings")
         chat_settings = ChatSettings(settings_state)
-        self.__add_to_cache(chat_id, chat_settings)
-        return chat_settings
+        return self.__add_to_cache(chat_id, chat_settings)
 
     def __add_to_cache(self, chat_id, value):
-        assert chat_id not in self.cache
-        self.cache[chat_id] = value
+        # updates of different chats may be processed concurrently, and settings of any chat can be
+        # retrieved by id, so another thread may have just added it, keep that one
+        return self.cache.setdefault(chat_id, value)
 
 
 repository = ChatSettingsRepository()
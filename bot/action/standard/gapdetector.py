@@ -1,19 +1,56 @@
+import threading
+
 from bot.action.core.action import IntermediateAction
 
 
 class GlobalGapDetectorAction(IntermediateAction):
     def post_setup(self):
-        self.gap_state = self.state.get_for("gap")
+        self.gap_state = self.state.get_for("gap", pin=True)
+        # when updates are processed concurrently, they can arrive here out of order
+        self.out_of_order_tolerance = int(self.config.max_updates_in_flight) if int(self.config.chat_workers) > 0 else 0
+        # ids already seen that are after some other not seen yet
+        self.seen_ahead = set()
+        self.lock = threading.Lock()
 
     def process(self, event):
-        expected_update_id = self.get_expected_update_id()
         current_update_id = event.update.update_id
-        self.gap_state.last_update_id = str(current_update_id)
-        if self.there_is_gap(current_update_id, expected_update_id):
+        with self.lock:
+            if self.out_of_order_tolerance > 0:
+                is_gap = self.__check_tolerating_out_of_order(current_update_id)
+            else:
+                is_gap = self.__check(current_update_id)
+        if is_gap:
             print("Global Gap detected!")
             event.global_gap_detected = True
         self._continue(event)
 
+    def __check(self, current_update_id):
+        expected_update_id = self.get_expected_update_id()
+        self.gap_state.last_update_id = str(current_update_id)
+        return self.there_is_gap(current_update_id, expected_update_id)
+
+    def __check_tolerating_out_of_order(self, current_update_id):
+        """
+        Updates before the expected one are considered already processed (they were seen ahead),
+        and updates after it are not considered a gap as long as the missing ones are inside the tolerance window,
+        as they may still be being processed.
+        In that case, last_update_id is kept on the last contiguous update processed.
+        """
+        expected_update_id = self.get_expected_update_id()
+        if expected_update_id is None or current_update_id - expected_update_id > self.out_of_order_tolerance:
+            self.seen_ahead.clear()
+            self.gap_state.last_update_id = str(current_update_id)
+            return True
+        if current_update_id == expected_update_id:
+            last_update_id = current_update_id
+            while last_update_id + 1 in self.seen_ahead:
+                last_update_id += 1
+                self.seen_ahead.remove(last_update_id)
+            self.gap_state.last_update_id = str(last_update_id)
+        elif current_update_id > expected_update_id:
+            self.seen_ahead.add(current_update_id)
+        return False
+
     def get_expected_update_id(self):
         last_update_id = self.gap_state.last_update_id
         if last_update_id is not None:
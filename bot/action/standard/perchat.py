@@ -3,6 +3,8 @@ from bot.action.standard import chatsettings
 
 
 class PerChatAction(IntermediateAction):
+    ONLY_FORWARDS_EVENTS = True
+
     def process(self, event):
         chat_id = event.chat.id
         event.config = self.config.get_for_chat_id(chat_id)
@@ -1,7 +1,18 @@
+import collections
+import json
+import threading
+
 from bot.action.core.action import Action
 from bot.utils.attributeobject import DictionaryObject
 
 
+# stored fields of users, "title" is for chats, as they use the user storage too
+FIELDS = ("first_name", "last_name", "username", "title")
+
+# records of the most recently used users kept in memory
+MAX_CACHED_RECORDS = 100000
+
+
 class SaveUserAction(Action):
     def post_setup(self):
         self.handler = UserStorageHandler.get_instance(self.state)
@@ -20,6 +31,15 @@ class SaveUserAction(Action):
 
 
 class UserStorageHandler:
+    """
+    Stores the names of users (and chats, that use the user storage too) as a single JSON record per user,
+    in `user/<id>/record`, instead of one value per field.
+
+    Records are kept in memory once read, so saving an unchanged user, as it is done on every message,
+    does not access the storage. Users stored with the previous format (a value per field) are migrated
+    to a record the first time they are read.
+    """
+
     instance = None
 
     @classmethod
@@ -30,25 +50,101 @@ class UserStorageHandler:
         return cls.instance
 
     def __init__(self, state):
-        self.state = state.get_for("user")
+        self.state = state.get_for("user", pin=True)
+        # user id -> record
+        self.records = RecordCache(MAX_CACHED_RECORDS)
 
     def get(self, user_id):
-        user = self.state.get_for(str(user_id))
-        return DictionaryObject({
-            "id": user_id,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "username": user.username,
-            "title": user.title  # for chats, they use the user storage too
-        })
+        return self.__to_user(user_id, self.__get_record(user_id))
+
+    def get_many(self, user_ids):
+        """Returns a dict with the users of the given ids, reading from storage only the ones not in memory."""
+        return {user_id: self.get(user_id) for user_id in user_ids}
 
     def save(self, user):
-        user_store = self.state.get_for(str(user.id))
-        if user.first_name != user_store.first_name:
-            user_store.first_name = user.first_name
-        if user.last_name != user_store.last_name:
-            user_store.last_name = user.last_name
-        if user.username != user_store.username:
-            user_store.username = user.username
-        if user.title != user_store.title:
-            user_store.title = user.title
+        record = {}
+        for field in FIELDS:
+            value = getattr(user, field)
+            if value is not None:
+                record[field] = value
+        if record != self.__get_record(user.id):
+            self.state.get_for(str(user.id)).record = json.dumps(record)
+            self.records.set(str(user.id), record)
+
+    @staticmethod
+    def __to_user(user_id, record: dict):
+        user = {field: record.get(field) for field in FIELDS}
+        user["id"] = user_id
+        return DictionaryObject(user)
+
+    def __get_record(self, user_id):
+        user_id = str(user_id)
+        record = self.records.get(user_id)
+        if record is None:
+            # read outside the cache lock, to not block other users while accessing the storage
+            record = self.records.add(user_id, self.__read_record(user_id))
+        return record
+
+    def __read_record(self, user_id: str):
+        user_store = self.state.get_for(user_id)
+        record = user_store.record
+        if record is not None:
+            return json.loads(record)
+        return self.__migrate_fields_to_record(user_store)
+
+    @staticmethod
+    def __migrate_fields_to_record(user_store):
+        record = {}
+        for field in FIELDS:
+            value = user_store.get_value(field)
+            if value is not None:
+                record[field] = value
+        if record:
+            # write the record before removing the fields, to not lose them if interrupted
+            user_store.record = json.dumps(record)
+            for field in record:
+                user_store.set_value(field, None)
+        return record
+
+
+class RecordCache:
+    """
+    Records kept in memory by key, evicting the least recently used one when there are more than capacity.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        # from the least to the most recently used
+        self.records = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """:return: The cached record, or None if it is not cached"""
+        with self.lock:
+            record = self.records.get(key)
+            if record is not None:
+                self.records.move_to_end(key)
+            return record
+
+    def add(self, key, record):
+        """
+        Caches the record if there is not one cached already with that key (eg. saved while it was being read).
+        :return: The cached record
+        """
+        with self.lock:
+            cached_record = self.records.get(key)
+            if cached_record is not None:
+                return cached_record
+            self.__set(key, record)
+            return record
+
+    def set(self, key, record):
+        """Replaces the cached record with the given key, or caches it if it was not"""
+        with self.lock:
+            self.__set(key, record)
+
+    def __set(self, key, record):
+        self.records[key] = record
+        self.records.move_to_end(key)
+        if len(self.records) > self.capacity:
+            self.records.popitem(last=False)
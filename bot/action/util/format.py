@@ -115,6 +115,15 @@ class UserFormatter:
     def retrieve_and_format(cls, user_id, user_storage_handler: UserStorageHandler):
         return cls.retrieve(user_id, user_storage_handler).default_format
 
+    @classmethod
+    def retrieve_and_format_many(cls, user_ids, user_storage_handler: UserStorageHandler):
+        """
+        Retrieves all the users at once, to be used when formatting a list of them.
+        :return: A dict with the default format of each user id.
+        """
+        users = user_storage_handler.get_many(set(user_ids))
+        return {user_id: cls(user).default_format for user_id, user in users.items()}
+
 
 class ChatFormatter:
     def __init__(self, chat):
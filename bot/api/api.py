@@ -2,7 +2,12 @@ from bot.action.core.update import Update
 from bot.api.call.call import ApiCall
 from bot.api.call.params import ApiCallParams
 from bot.api.domain import Message, Photo, Sticker, Document, Voice, VideoNote, Audio, Video, Location, Contact
+from bot.api.offset import UpdatesOffsetTracker
+from bot.api.prefetch import UpdatesPrefetcher
+from bot.api.ratelimit import RateLimiter
 from bot.api.telegram import TelegramBotApi
+from bot.multithreading.work import Work
+from bot.multithreading.worker import Worker
 from bot.storage import State
 
 
@@ -12,10 +17,49 @@ class Api:
         self.state = state
         self.async = self
         self.no_async = self
+        self.async_telegram_api = None
+        self.updates_offset_tracker = None
+        self.updates_prefetcher = None
+        self.connection_keep_alive_worker = None
+        self.rate_limiter = None
 
     def enable_async(self, async_api):
         self.async = async_api
 
+    def enable_asyncio(self, async_telegram_api: "AsyncTelegramBotApi"):
+        """
+        Api calls with an event loop local param will be performed with async_telegram_api on that loop.
+        """
+        self.async_telegram_api = async_telegram_api
+
+    def track_updates_offset(self, max_updates_in_flight: int):
+        """
+        To be used when updates are not processed in the order they are returned.
+        The updates offset will only be advanced (and persisted) once all previous updates have been processed,
+        which must be notified by calling `done` on the returned tracker.
+        """
+        self.updates_offset_tracker = UpdatesOffsetTracker(max_updates_in_flight, self.__set_next_update_id)
+        return self.updates_offset_tracker
+
+    def enable_updates_prefetching(self, worker: Worker, lookahead: int):
+        """
+        Fetch the next batches of updates on the worker while the current one is being processed.
+        It is not used when updates offset is being tracked.
+        """
+        self.updates_prefetcher = UpdatesPrefetcher(self.__fetch_updates, worker, lookahead)
+
+    def enable_connection_keep_alive(self, worker: Worker):
+        """
+        Periodically ping idle connections of the telegram api connection pool on the worker,
+        so that they are not closed by the server and can be reused.
+        """
+        if self.telegram_api.connection_pool is not None:
+            self.connection_keep_alive_worker = worker
+
+    def enable_rate_limiting(self, rate_limiter: RateLimiter):
+        """Api calls sending messages will be paced by the rate limiter, that must be running."""
+        self.rate_limiter = rate_limiter
+
     def send_message(self, message: Message, **params):
         message_params = message.data.copy()
         message_params.update(params)
@@ -65,23 +109,68 @@ class Api:
                 yield update
 
     def get_updates(self, timeout=45):
-        updates = self.getUpdates(offset=self.__get_updates_offset(), timeout=timeout)
-        for update in updates:
-            self.__set_updates_offset(update.update_id)
-            yield Update(update)
+        # getUpdates acknowledges all updates before offset, give state a chance to persist them
+        self.state.checkpoint()
+        # called at least once per long polling timeout, which is frequent enough to check idle connections
+        self.__keep_connections_alive()
+        updates = self.__get_raw_updates(timeout)
+        tracker = self.updates_offset_tracker
+        if tracker is None:
+            for update in updates:
+                self.__set_updates_offset(update.update_id)
+                yield Update(update)
+        else:
+            new_updates = False
+            for update in updates:
+                if tracker.start(update.update_id):
+                    new_updates = True
+                    yield Update(update)
+            if not new_updates:
+                # getUpdates returns immediately while there are updates in flight,
+                # avoid calling it again in a busy loop
+                tracker.wait_for_progress()
+
+    def __keep_connections_alive(self):
+        worker = self.connection_keep_alive_worker
+        if worker is not None:
+            connection_pool = self.telegram_api.connection_pool
+            if connection_pool.should_ping():
+                worker.post(Work(connection_pool.ping_idle_connections, "ping_idle_connections"))
+
+    def __get_raw_updates(self, timeout):
+        offset = self.__get_updates_offset()
+        if self.updates_prefetcher is not None and self.updates_offset_tracker is None:
+            return self.updates_prefetcher.get_updates(offset, timeout)
+        return self.getUpdates(offset=offset, timeout=timeout)
+
+    def __fetch_updates(self, offset, timeout):
+        return list(self.getUpdates(offset=offset, timeout=timeout))
 
     def __get_updates_offset(self):
+        if self.updates_offset_tracker is not None:
+            offset = self.updates_offset_tracker.get_offset()
+            if offset is not None:
+                return offset
         return self.state.next_update_id
 
     def __set_updates_offset(self, last_update_id):
-        self.state.next_update_id = str(last_update_id + 1)
+        self.__set_next_update_id(last_update_id + 1)
+
+    def __set_next_update_id(self, next_update_id):
+        self.state.next_update_id = str(next_update_id)
 
     def __getattr__(self, item):
         return self.__get_api_call_hook_for(item)
 
     def __get_api_call_hook_for(self, api_call):
         api_func = self.telegram_api.__getattr__(api_call)
-        call = ApiCall(api_func, api_call)
+        async_api_func = None
+        if self.async_telegram_api is not None:
+            async_api_func = self.async_telegram_api.__getattr__(api_call)
+        rate_limiter = None
+        if self.rate_limiter is not None and RateLimiter.is_rate_limited(api_call):
+            rate_limiter = self.rate_limiter
+        call = ApiCall(api_func, api_call, async_api_func, rate_limiter)
         return lambda **params: self.__api_call_hook(call, params)
 
     @staticmethod
@@ -1,12 +1,18 @@
 from bot.api.api import Api
 from bot.api.domain import OutApiObject
 from bot.multithreading.scheduler import SchedulerApi
+from bot.multithreading.work import Work, WORK_PRIORITY_HIGH
+from bot.multithreading.worker.event_loop import EventLoopWorker
 
 
 class AsyncApi:
-    def __init__(self, api: Api, scheduler: SchedulerApi):
+    def __init__(self, api: Api, scheduler: SchedulerApi, event_loop: EventLoopWorker = None):
+        """
+        :param event_loop: If present, api calls supporting it are run as coroutines on it instead of on the scheduler.
+        """
         self.api = api
         self.scheduler = scheduler
+        self.event_loop = event_loop
         self.async = self
         self.no_async = api
 
@@ -22,4 +28,11 @@ class AsyncApi:
         return func(*args, **kwargs)
 
     def __add_scheduler(self, args: dict):
-        args[OutApiObject.LOCAL_PARAM_SCHEDULER] = self.scheduler.network
+        args[OutApiObject.LOCAL_PARAM_SCHEDULER] = self.__schedule
+        if self.event_loop is not None:
+            args[OutApiObject.LOCAL_PARAM_EVENT_LOOP] = self.event_loop
+
+    def __schedule(self, work: Work):
+        # api calls are usually answers to users, run them before other works on the pool
+        work.priority = WORK_PRIORITY_HIGH
+        self.scheduler.network(work)
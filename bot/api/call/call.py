@@ -1,35 +1,129 @@
+from bot.api.call.future import ApiCallFuture
 from bot.api.call.params import ApiCallParams
 from bot.api.domain import ApiObject
-from bot.api.exception import ApiExceptionFactory
+from bot.api.exception import ApiExceptionFactory, TooManyRequestsApiException
+from bot.api.ratelimit import RateLimiter
 from bot.api.telegram import TelegramBotApiException
 from bot.multithreading.work import Work
+from bot.multithreading.worker.event_loop import EventLoopWorker
+
+
+# Number of times a call is sent again after the server answers that we are sending too fast
+MAX_RATE_LIMITED_RETRIES = 3
 
 
 class ApiCall:
-    def __init__(self, api_func: callable, name: str):
+    def __init__(self, api_func: callable, name: str, async_api_func: callable = None,
+                 rate_limiter: RateLimiter = None):
+        """
+        :param async_api_func: Optional coroutine function performing the same api call,
+            used instead of api_func when an event loop is present on params.
+        :param rate_limiter: If present, the call waits on it before being performed,
+            and it is retried if the server answers that we are sending too fast.
+        """
         self.api_func = api_func
         self.name = name
+        self.async_api_func = async_api_func
+        self.rate_limiter = rate_limiter
 
     def call(self, params: ApiCallParams):
-        api_call = lambda: self.__do_api_call_and_handle_error(params)
+        """Returns the result of the call, or an ApiCallFuture with it if the call is asynchronous."""
+        if params.scheduler:
+            params.future = ApiCallFuture()
+        if self.rate_limiter is not None:
+            result = self.__call_rate_limited(params, 0)
+        else:
+            result = self.__call(params, 0)
+        if params.future is not None:
+            return params.future
+        return result
+
+    def __call_rate_limited(self, params: ApiCallParams, retries: int):
+        chat_id = params.send.get("chat_id")
+        if params.scheduler:
+            self.rate_limiter.schedule(
+                chat_id, params.priority, Work(lambda: self.__call(params, retries), "rate_limited:" + self.name)
+            )
+        else:
+            self.rate_limiter.wait(chat_id, params.priority)
+            return self.__call(params, retries)
+
+    def __call(self, params: ApiCallParams, retries: int):
         scheduler = params.scheduler
+        event_loop = params.event_loop
+        if scheduler and event_loop and self.async_api_func is not None:
+            # future callbacks may perform blocking operations, so they cannot be run on the loop
+            params.future.schedule_callbacks_on(event_loop.run_off_loop)
+            event_loop.run_coroutine(
+                lambda: self.async_api_func(**params.send), "async_api_call:" + self.name,
+                lambda task: self.__handle_async_api_call_done(task, params, retries, event_loop)
+            )
+            return
+        api_call = lambda: self.__do_api_call_and_handle_error(params, retries)
         if scheduler:
             scheduler(Work(api_call, "async_api_call:" + self.name))
         else:
             return api_call()
 
-    def __do_api_call_and_handle_error(self, params: ApiCallParams):
+    def __do_api_call_and_handle_error(self, params: ApiCallParams, retries: int):
         try:
-            return self.__do_api_call(params)
+            result = self.__do_api_call(params)
         except TelegramBotApiException as e:
             exception = ApiExceptionFactory.from_telegram_bot_api_exception(e)
+            if self.__should_retry(exception, retries):
+                return self.__retry(exception, params, retries)
             return self.__handle_api_error(exception, params)
+        except BaseException as e:
+            # eg. a network error
+            self.__set_error(params, e)
+            raise
+        self.__set_result(params, result)
+        return result
 
     def __do_api_call(self, params: ApiCallParams):
         return ApiObject.wrap_api_object(self.api_func(**params.send))
 
+    def __handle_async_api_call_done(self, task, params: ApiCallParams, retries: int, event_loop: EventLoopWorker):
+        # run on the loop once the coroutine of the call finishes
+        # it is not a coroutine itself so that this module can be imported on python versions without async syntax
+        try:
+            result = ApiObject.wrap_api_object(task.result())
+        except TelegramBotApiException as e:
+            exception = ApiExceptionFactory.from_telegram_bot_api_exception(e)
+            if self.__should_retry(exception, retries):
+                # it is asynchronous, so it is scheduled again on the rate limiter without blocking the loop
+                self.__retry(exception, params, retries)
+                return
+            # error callbacks may perform blocking operations, so they cannot be run on the loop
+            event_loop.run_off_loop(Work(
+                lambda: self.__handle_api_error(exception, params), "async_api_call_error:" + self.name
+            ))
+        except BaseException as e:
+            self.__set_error(params, e)
+            raise
+        else:
+            self.__set_result(params, result)
+
+    def __should_retry(self, exception, retries: int):
+        return self.rate_limiter is not None and isinstance(exception, TooManyRequestsApiException) and \
+            retries < MAX_RATE_LIMITED_RETRIES
+
+    def __retry(self, exception: TooManyRequestsApiException, params: ApiCallParams, retries: int):
+        self.rate_limiter.retry_after(params.send.get("chat_id"), exception.retry_after)
+        return self.__call_rate_limited(params, retries + 1)
+
+    @staticmethod
+    def __set_result(params: ApiCallParams, result):
+        if params.future is not None:
+            params.future.set_result(result)
+
     @staticmethod
-    def __handle_api_error(e, params: ApiCallParams):
+    def __set_error(params: ApiCallParams, exception: BaseException):
+        if params.future is not None:
+            params.future.set_error(exception)
+
+    def __handle_api_error(self, e, params: ApiCallParams):
+        self.__set_error(params, e)
         error_callback = params.error_callback
         if callable(error_callback):
             return error_callback(e)
@@ -0,0 +1,126 @@
+import threading
+
+from bot.multithreading.work import Work
+
+
+class ApiCallFuture:
+    """
+    Result of an asynchronous api call, that will be available once the call is performed.
+
+    Callbacks registered with `then` and `error` are run on the thread that completes the call
+    (or on the calling thread, if it has already completed), so they should be quick or perform
+    their api calls asynchronously too. Each of them returns a new future, to chain them:
+
+        (api.async.send_message(first_message)
+            .then(lambda sent_message: api.async.send_message(second_message.reply_to_message(sent_message)))
+            .error(lambda error: ...))
+
+    If a callback returns another future, the one returned by `then` or `error` completes when that one does.
+    Errors are propagated through `then` chains until an `error` callback handles them.
+    If a callback raises an exception, it is raised again on the thread running it after
+    being set on the future, so that it is handled by the worker error handler.
+
+    Errors of the api call are still handled as they were before futures existed (ie. by the error callback
+    of the message, or by the worker error handler), `error` callbacks are run in addition to that.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.completed = False
+        self.value = None
+        self.exception = None
+        # list of (callback, future, is_error_callback), set to None once completed
+        self.callbacks = []
+        self.callbacks_scheduler = None
+
+    @staticmethod
+    def completed_with(value):
+        """Returns the value if it is already a future, or a completed future with it otherwise."""
+        if isinstance(value, ApiCallFuture):
+            return value
+        future = ApiCallFuture()
+        future.set_result(value)
+        return future
+
+    def then(self, callback: callable):
+        """:param callback: Called with the result of the call if it succeeds."""
+        return self.__add_callback(callback, False)
+
+    def error(self, callback: callable):
+        """:param callback: Called with the exception if the call fails. What it returns becomes the result."""
+        return self.__add_callback(callback, True)
+
+    def __add_callback(self, callback: callable, is_error_callback: bool):
+        future = ApiCallFuture()
+        with self.condition:
+            if not self.completed:
+                self.callbacks.append((callback, future, is_error_callback))
+                return future
+        self.__run_callbacks([(callback, future, is_error_callback)])
+        return future
+
+    def result(self, timeout: float = None):
+        """Blocks until the call is completed, returning its result or raising its exception."""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.completed, timeout):
+                raise TimeoutError()
+        if self.exception is not None:
+            raise self.exception
+        return self.value
+
+    def schedule_callbacks_on(self, scheduler: callable):
+        """
+        :param scheduler: A callable accepting a Work. Callbacks pending when the future is completed
+            will be posted to it instead of being run on the thread completing the future.
+        """
+        self.callbacks_scheduler = scheduler
+
+    def set_result(self, value):
+        self.__complete(value, None)
+
+    def set_error(self, exception: BaseException):
+        self.__complete(None, exception)
+
+    def __complete(self, value, exception):
+        with self.condition:
+            if self.completed:
+                return
+            self.value = value
+            self.exception = exception
+            self.completed = True
+            callbacks = self.callbacks
+            self.callbacks = None
+            self.condition.notify_all()
+        if callbacks:
+            if self.callbacks_scheduler is not None:
+                self.callbacks_scheduler(Work(lambda: self.__run_callbacks(callbacks), "api_call_future_callbacks"))
+            else:
+                self.__run_callbacks(callbacks)
+
+    def __run_callbacks(self, callbacks: list):
+        raised = None
+        for callback, future, is_error_callback in callbacks:
+            try:
+                self.__run_callback(callback, future, is_error_callback)
+            except BaseException as e:
+                future.set_error(e)
+                if raised is None:
+                    raised = e
+        if raised is not None:
+            raise raised
+
+    def __run_callback(self, callback: callable, future: "ApiCallFuture", is_error_callback: bool):
+        if self.exception is None:
+            if is_error_callback:
+                future.set_result(self.value)
+                return
+            value = callback(self.value)
+        else:
+            if not is_error_callback:
+                future.set_error(self.exception)
+                return
+            value = callback(self.exception)
+        if isinstance(value, ApiCallFuture):
+            value.then(future.set_result).error(future.set_error)
+        else:
+            future.set_result(value)
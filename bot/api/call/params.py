@@ -1,13 +1,14 @@
-import json
-
 from bot.api.domain import OutApiObject, ApiObjectList, ApiObject
+from bot.api.ratelimit import PRIORITY_HIGH
 
 
 class ApiCallParams:
     def __init__(self, params: dict):
         self.send_params = params
         self.local_params = self.__pop_local_params(self.send_params)
-        self.__flat_params(self.send_params)
+        self.__unwrap_params(self.send_params)
+        # set by ApiCall for asynchronous calls, to be completed once the call is performed
+        self.future = None
 
     @staticmethod
     def __pop_local_params(params):
@@ -18,13 +19,14 @@ class ApiCallParams:
         return local_params
 
     @staticmethod
-    def __flat_params(params):
-        for param, value in params.copy().items():
-            if isinstance(value, (ApiObjectList, ApiObject)):
-                value = value.unwrap_api_object()
-                # not saving now as we assume it will also enter the next if
-            if type(value) in (list, dict, tuple):
-                params[param] = json.dumps(value, separators=(',', ':'))
+    def __unwrap_params(params):
+        # params are sent as a json body, so nested values must not be encoded here
+        for param, value in list(params.items()):
+            if value is None:
+                # not set, it must not be sent as null (as it was not sent when they were query params)
+                del params[param]
+            elif isinstance(value, (ApiObjectList, ApiObject)):
+                params[param] = value.unwrap_api_object()
 
     @property
     def send(self):
@@ -34,6 +36,14 @@ class ApiCallParams:
     def scheduler(self):
         return self.local_params.get(OutApiObject.LOCAL_PARAM_SCHEDULER)
 
+    @property
+    def event_loop(self):
+        return self.local_params.get(OutApiObject.LOCAL_PARAM_EVENT_LOOP)
+
+    @property
+    def priority(self):
+        return self.local_params.get(OutApiObject.LOCAL_PARAM_PRIORITY, PRIORITY_HIGH)
+
     @property
     def error_callback(self):
         return self.local_params.get(OutApiObject.LOCAL_PARAM_ERROR_CALLBACK)
@@ -0,0 +1,209 @@
+import queue
+import threading
+import time
+import urllib.parse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import PoolManager, HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection, HTTPSConnection
+
+
+# Telegram bot API servers close connections idle for 900 seconds.
+# Connections idle for longer than this are not reused, to avoid sending a request
+# over a connection that could be closed while it is being sent.
+MAX_SECONDS_IDLE = 850
+
+# Idle connections are pinged after this time, so that they do not reach MAX_SECONDS_IDLE
+# and the next burst of requests can reuse them instead of paying a new handshake.
+PING_AFTER_SECONDS_IDLE = 600
+
+# Minimum seconds between checks for connections to ping.
+PING_CHECK_INTERVAL_SECONDS = 60
+
+PING_TIMEOUT_SECONDS = 10
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of keep-alive connections to the Telegram bot API, shared by all threads.
+    Connections outlive the threads that used them, so workers spawned later reuse them.
+    """
+
+    def __init__(self, max_connections: int, ping_url: str):
+        """
+        :param max_connections: Maximum number of connections to keep. Once all of them are in use,
+            threads wait for one to be released instead of opening more.
+        :param ping_url: Url of a lightweight api call used to keep idle connections alive.
+        """
+        self.ping_path = urllib.parse.urlsplit(ping_url).path
+        self.stats = ConnectionPoolStats()
+        self.pools = []
+        self.last_ping_check = time.monotonic()
+        self.session = requests.session()
+        adapter = TrackedHTTPAdapter(self, pool_maxsize=max_connections, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get_session(self):
+        """requests sessions are safe to be shared by threads as long as their state is not modified."""
+        return self.session
+
+    def _pool_created(self, pool: "TrackedConnectionPoolMixin"):
+        self.pools.append(pool)
+
+    def should_ping(self):
+        now = time.monotonic()
+        if now - self.last_ping_check < PING_CHECK_INTERVAL_SECONDS:
+            return False
+        self.last_ping_check = now
+        return True
+
+    def ping_idle_connections(self):
+        for pool in self.pools[:]:
+            pool.ping_idle_connections(self.ping_path)
+
+
+class ConnectionPoolStats:
+    def __init__(self):
+        # connections reused
+        self.hits = 0
+        # requests that needed a new connection
+        self.misses = 0
+        # new connections established (including TLS handshake)
+        self.handshakes = 0
+        # connections closed because they were idle for too long
+        self.expired = 0
+        self.pings = 0
+        self.failed_pings = 0
+        self.lock = threading.Lock()
+
+    def increment(self, stat: str):
+        with self.lock:
+            setattr(self, stat, getattr(self, stat) + 1)
+
+
+class TrackedHTTPAdapter(HTTPAdapter):
+    def __init__(self, connection_pool: ConnectionPool, **kwargs):
+        # needed by init_poolmanager, that is called from super constructor
+        self.connection_pool = connection_pool
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = TrackedPoolManager(
+            self.connection_pool, num_pools=connections, maxsize=maxsize, block=block, **pool_kwargs
+        )
+
+
+class TrackedPoolManager(PoolManager):
+    def __init__(self, connection_pool: ConnectionPool, **kwargs):
+        super().__init__(**kwargs)
+        self.connection_pool = connection_pool
+        self.pool_classes_by_scheme = {
+            "http": TrackedHTTPConnectionPool,
+            "https": TrackedHTTPSConnectionPool
+        }
+
+    def _new_pool(self, *args, **kwargs):
+        pool = super()._new_pool(*args, **kwargs)
+        pool.stats = self.connection_pool.stats
+        self.connection_pool._pool_created(pool)
+        return pool
+
+
+class TrackedConnectionPoolMixin:
+    stats = None  # set by TrackedPoolManager
+
+    def _new_conn(self):
+        connection = super()._new_conn()
+        connection.stats = self.stats
+        connection.last_used = None
+        return connection
+
+    def _get_conn(self, timeout=None):
+        connection = super()._get_conn(timeout)
+        if self.__is_connected(connection):
+            if time.monotonic() - connection.last_used > MAX_SECONDS_IDLE:
+                connection.close()
+                self.stats.increment("expired")
+                self.stats.increment("misses")
+            else:
+                self.stats.increment("hits")
+        else:
+            self.stats.increment("misses")
+        return connection
+
+    def _put_conn(self, connection):
+        if connection is not None:
+            connection.last_used = time.monotonic()
+        super()._put_conn(connection)
+
+    def ping_idle_connections(self, path: str):
+        """
+        Pings the connections in the pool that have been idle for long.
+        The other ones are returned to the pool right away, so that they remain available while pinging.
+        """
+        connections = []
+        while True:
+            try:
+                connections.append(self.pool.get(block=False))
+            except queue.Empty:
+                break
+        now = time.monotonic()
+        to_ping = [
+            connection for connection in connections
+            if self.__is_connected(connection) and now - connection.last_used > PING_AFTER_SECONDS_IDLE
+        ]
+        # pool is a LIFO queue, put them back in reverse order to keep the most recently used ones on top
+        # they are put back without going through _put_conn, that would mark them as used
+        for connection in reversed(connections):
+            if connection not in to_ping:
+                self.pool.put(connection, block=False)
+        for connection in to_ping:
+            try:
+                self.__ping(connection, path)
+            finally:
+                self.pool.put(connection, block=False)
+
+    def __ping(self, connection, path):
+        try:
+            connection.sock.settimeout(PING_TIMEOUT_SECONDS)
+            connection.request("GET", path)
+            connection.getresponse().read()
+        except Exception:
+            connection.close()
+            self.stats.increment("failed_pings")
+        else:
+            connection.last_used = time.monotonic()
+            self.stats.increment("pings")
+
+    @staticmethod
+    def __is_connected(connection):
+        return connection is not None and getattr(connection, "sock", None) is not None
+
+
+class TrackedConnectionMixin:
+    stats = None  # set by TrackedConnectionPoolMixin
+
+    def connect(self):
+        self.stats.increment("handshakes")
+        super().connect()
+
+
+class TrackedHTTPConnection(TrackedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TrackedHTTPSConnection(TrackedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TrackedHTTPConnectionPool(TrackedConnectionPoolMixin, HTTPConnectionPool):
+    ConnectionCls = TrackedHTTPConnection
+
+
+class TrackedHTTPSConnectionPool(TrackedConnectionPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = TrackedHTTPSConnection
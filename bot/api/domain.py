@@ -1,29 +1,75 @@
 class ApiObject:
+    """
+    Wrapper of the data of an api object, whose fields can be accessed as attributes.
+    Fields with dicts or lists are wrapped too when accessed, and the wrappers are kept,
+    so that accessing the same field again (eg. `message.from_.id`) does not create a new one.
+    """
+
+    __slots__ = ("_type", "data", "_wrapped_fields")
+
     def __init__(self, _type=None, **data):
         self._type = _type
         self.data = data
+        # field name -> (data value, wrapper), created lazily
+        self._wrapped_fields = None
+
+    @classmethod
+    def from_data(cls, data: dict, _type=None):
+        """Wraps the data dict without copying it, so changes on any of them are visible on the other."""
+        api_object = cls.__new__(cls)
+        api_object._type = _type
+        api_object.data = data
+        api_object._wrapped_fields = None
+        return api_object
 
     def get_type(self):
         return self._type
 
     def get_or_fail(self, key):
         value = self.data[key]
-        return self.wrap_api_object(value)
+        return self.__wrap_field(key, value)
 
     def get_or_default(self, key, default=None):
         value = self.data.get(key, default)
-        return self.wrap_api_object(value)
+        return self.__wrap_field(key, value)
+
+    def __wrap_field(self, key, value):
+        value_type = type(value)
+        if value_type is not dict and value_type is not list:
+            return value
+        wrapped_fields = self._wrapped_fields
+        if wrapped_fields is None:
+            wrapped_fields = self._wrapped_fields = {}
+        else:
+            wrapped_field = wrapped_fields.get(key)
+            # the value could have been replaced since it was wrapped
+            if wrapped_field is not None and wrapped_field[0] is value:
+                return wrapped_field[1]
+        wrapper = self.wrap_api_object(value)
+        wrapped_fields[key] = (value, wrapper)
+        return wrapper
 
     def __getattr__(self, item):
-        if len(item) > 1 and item[-1] == "_":
+        if item[-1] == "_" and len(item) > 1:
             item = item[:-1]
-        return self.get_or_default(item)
+        value = self.data.get(item)
+        # it is called a lot, so the common cases of plain values and already wrapped fields are inlined here
+        value_type = type(value)
+        if value_type is not dict and value_type is not list:
+            return value
+        wrapped_fields = self._wrapped_fields
+        if wrapped_fields is not None:
+            wrapped_field = wrapped_fields.get(item)
+            if wrapped_field is not None and wrapped_field[0] is value:
+                return wrapped_field[1]
+        return self.__wrap_field(item, value)
 
     @staticmethod
     def wrap_api_object(data):
-        if type(data) is dict:
-            return ApiObject(**data)
-        elif type(data) is list:
+        data_type = type(data)
+        if data_type is dict:
+            return ApiObject.from_data(data)
+        elif data_type is list:
             return ApiObjectList(data)
         else:
             return data
@@ -33,21 +79,43 @@ class ApiObject:
 
 
 class ApiObjectList:
+    """Wrapper of a list of api objects, that keeps the wrappers of its items once they are iterated."""
+
+    __slots__ = ("data_list", "_wrapped_items")
+
     def __init__(self, data_list: list):
         self.data_list = data_list
+        # list of (data item, wrapper), created lazily
+        self._wrapped_items = None
 
     def __iter__(self):
         return self.__wrapped_api_objects()
 
     def __wrapped_api_objects(self):
-        for data in self.data_list:
-            yield ApiObject.wrap_api_object(data)
+        wrapped_items = self._wrapped_items
+        if wrapped_items is None:
+            wrapped_items = self._wrapped_items = []
+        for index, data in enumerate(self.data_list):
+            if index < len(wrapped_items):
+                wrapped_item = wrapped_items[index]
+                # the list could have been modified since it was wrapped
+                if wrapped_item[0] is data:
+                    yield wrapped_item[1]
+                    continue
+                wrapper = ApiObject.wrap_api_object(data)
+                wrapped_items[index] = (data, wrapper)
+            else:
+                wrapper = ApiObject.wrap_api_object(data)
+                wrapped_items.append((data, wrapper))
+            yield wrapper
 
     def unwrap_api_object(self):
         return self.data_list
 
 
 class OutApiObject(ApiObject):
+    __slots__ = ()
+
     LOCAL_PARAM_ERROR_CALLBACK = "__error_callback"
     """
     It must be assigned to a callable object that will be called with a single param of type ApiException
@@ -60,18 +128,40 @@ class OutApiObject(ApiObject):
     It must be assigned to a callable object that accepts a single parameter of type Work.
     When present, the api call will be posted to the scheduler, so that it will be performed on that
     scheduler asynchronously.
-    Thus, the api call will return immediately on the current thread and it will return no result.
+    Thus, the api call will return immediately on the current thread, returning an ApiCallFuture
+    that will be completed with the result once the call is performed.
     If an error callback is present, it will also be executed on the scheduler if the call fails.
     """
 
-    LOCAL_PARAMS = [LOCAL_PARAM_ERROR_CALLBACK, LOCAL_PARAM_SCHEDULER]
+    LOCAL_PARAM_EVENT_LOOP = "__event_loop"
+    """
+    It must be assigned to an EventLoopWorker.
+    When present along with the scheduler, and the api supports it, the api call will be run as a coroutine
+    on that event loop instead of being posted to the scheduler.
+    If an error callback is present, it will be executed off the loop if the call fails.
+    """
+
+    LOCAL_PARAM_PRIORITY = "__priority"
+    """
+    One of the priorities defined in the ratelimit module.
+    When api calls are being rate limited, pending ones are performed in priority order.
+    If not present, the call has high priority.
+    """
+
+    LOCAL_PARAMS = [LOCAL_PARAM_ERROR_CALLBACK, LOCAL_PARAM_SCHEDULER, LOCAL_PARAM_EVENT_LOOP, LOCAL_PARAM_PRIORITY]
 
     def with_error_callback(self, func):
         self.data[self.LOCAL_PARAM_ERROR_CALLBACK] = func
         return self
 
+    def with_priority(self, priority: int):
+        self.data[self.LOCAL_PARAM_PRIORITY] = priority
+        return self
+
 
 class Message(OutApiObject):
+    __slots__ = ()
+
     def to_chat(self, chat=None, message=None, chat_id=None):
         if message is not None:
             chat = message.chat
@@ -108,7 +198,7 @@ class Message(OutApiObject):
 
     @staticmethod
     def create(text, chat_id=None, **kwargs):
-        return Message(_type=Message, text=text, chat_id=chat_id, disable_web_page_preview="true", **kwargs)
+        return Message(_type=Message, text=text, chat_id=chat_id, disable_web_page_preview=True, **kwargs)
 
     @staticmethod
     def create_reply(message, reply_text):
@@ -116,36 +206,48 @@ class Message(OutApiObject):
 
 
 class CaptionableMessage(Message):
+    __slots__ = ()
+
     def with_caption(self, caption_text):
         self.data["caption"] = caption_text
         return self
 
 
 class Photo(CaptionableMessage):
+    __slots__ = ()
+
     @staticmethod
     def create_photo(file_id):
         return Photo(_type=Photo, photo=file_id)
 
 
 class Sticker(Message):
+    __slots__ = ()
+
     @staticmethod
     def create_sticker(file_id):
         return Sticker(_type=Sticker, sticker=file_id)
 
 
 class Document(CaptionableMessage):
+    __slots__ = ()
+
     @staticmethod
     def create_document(file_id):
         return Document(_type=Document, document=file_id)
 
 
 class Voice(CaptionableMessage):
+    __slots__ = ()
+
     @staticmethod
     def create_voice(file_id):
         return Voice(_type=Voice, voice=file_id)
 
 
 class VideoNote(Message):
+    __slots__ = ()
+
     @staticmethod
     def create_video_note(file_id, length):
         # for some reason, api fails if length is not provided, although it is an optional field
@@ -153,24 +255,32 @@ class VideoNote(Message):
 
 
 class Audio(CaptionableMessage):
+    __slots__ = ()
+
     @staticmethod
     def create_audio(file_id):
         return Audio(_type=Audio, audio=file_id)
 
 
 class Video(CaptionableMessage):
+    __slots__ = ()
+
     @staticmethod
     def create_video(file_id):
         return Video(_type=Video, video=file_id)
 
 
 class Location(Message):
+    __slots__ = ()
+
     @staticmethod
     def create_location(latitude, longitude):
         return Location(_type=Location, latitude=latitude, longitude=longitude)
 
 
 class Contact(Message):
+    __slots__ = ()
+
     @staticmethod
     def create_contact(phone_number, first_name, last_name=None):
         return Contact(_type=Contact, phone_number=phone_number, first_name=first_name, last_name=last_name)
@@ -0,0 +1,57 @@
+"""
+JSON encoding and decoding of api requests and responses.
+
+The fastest available backend is used: orjson or ujson if installed, or the standard json module otherwise.
+All of them encode to and decode from utf-8 bytes, so that bodies are not decoded to text first.
+"""
+import json
+
+
+class JsonBackend:
+    def __init__(self, name: str, dumps: callable, loads: callable):
+        """
+        :param dumps: Function that encodes an object to utf-8 json bytes.
+        :param loads: Function that decodes utf-8 json bytes.
+        """
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+
+def _stdlib_backend():
+    return JsonBackend(
+        "json",
+        lambda obj: json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        # json.loads only accepts bytes since python 3.6
+        lambda data: json.loads(data.decode("utf-8"))
+    )
+
+
+def _orjson_backend():
+    import orjson
+    return JsonBackend("orjson", orjson.dumps, orjson.loads)
+
+
+def _ujson_backend():
+    import ujson
+    return JsonBackend(
+        "ujson",
+        lambda obj: ujson.dumps(obj, ensure_ascii=False).encode("utf-8"),
+        ujson.loads
+    )
+
+
+def _get_fastest_backend():
+    for create_backend in (_orjson_backend, _ujson_backend):
+        try:
+            return create_backend()
+        except ImportError:
+            pass
+    return _stdlib_backend()
+
+
+stdlib = _stdlib_backend()
+backend = _get_fastest_backend()
+
+dumps = backend.dumps
+loads = backend.loads
@@ -0,0 +1,70 @@
+import threading
+
+
+# seconds to wait for some update to be processed when getUpdates only returned already dispatched ones
+WAIT_FOR_PROGRESS_SECONDS = 1
+
+
+class UpdatesOffsetTracker:
+    """
+    Keeps track of the updates being processed when they are not processed in order,
+    to only advance the offset of the updates once all the previous ones have been processed.
+
+    getUpdates is called with that offset, so that updates still being processed are not acknowledged
+    to Telegram, and those updates are returned again. They are then discarded by :func:`start`.
+
+    It is thread-safe, :func:`done` is expected to be called from the threads processing the updates.
+    """
+
+    def __init__(self, max_updates_in_flight: int, offset_callback: callable):
+        """
+        :param max_updates_in_flight: Maximum number of updates being processed at the same time.
+            When reached, no more updates are started until some of them are done.
+        :param offset_callback: Called with the new offset (the id of the next update not processed yet)
+            every time it advances. It is called while holding the tracker lock, so that calls do not overlap.
+        """
+        self.max_updates_in_flight = max_updates_in_flight
+        self.offset_callback = offset_callback
+        self.in_flight = set()
+        self.last_started = None
+        self.progress = threading.Condition()
+
+    def get_offset(self):
+        """:return: The id of the oldest update still not processed, or None if nothing has been processed yet"""
+        with self.progress:
+            return self.__get_offset()
+
+    def __get_offset(self):
+        if self.in_flight:
+            return min(self.in_flight)
+        if self.last_started is not None:
+            return self.last_started + 1
+
+    def start(self, update_id: int):
+        """
+        Blocks while the max number of updates in flight is reached.
+        :return: False if the update has already been started, and so it must not be processed again.
+        """
+        with self.progress:
+            if self.last_started is not None and update_id <= self.last_started:
+                return False
+            while len(self.in_flight) >= self.max_updates_in_flight:
+                self.progress.wait()
+            self.in_flight.add(update_id)
+            self.last_started = update_id
+            return True
+
+    def done(self, update_id: int):
+        with self.progress:
+            previous_offset = self.__get_offset()
+            self.in_flight.discard(update_id)
+            offset = self.__get_offset()
+            if offset != previous_offset:
+                self.offset_callback(offset)
+            self.progress.notify_all()
+
+    def wait_for_progress(self):
+        """Waits a little for some update to be done, if there is any in flight"""
+        with self.progress:
+            if self.in_flight:
+                self.progress.wait(WAIT_FOR_PROGRESS_SECONDS)
@@ -0,0 +1,145 @@
+import collections
+import threading
+import time
+
+from bot.multithreading.work import Work
+from bot.multithreading.worker import Worker
+
+
+class UpdatesPrefetcher:
+    """
+    Fetches the next batches of updates on a worker while the current one is being processed.
+
+    Only one getUpdates request is in flight at any time (Telegram terminates concurrent ones),
+    so the lookahead batches are fetched one after the other.
+    Fetching a batch acknowledges the previous ones to Telegram, so they cannot be fetched again.
+    For that reason, if the caller requests an offset that is not the next one (eg. because the processing
+    of the current batch stopped by an error), the not processed updates of the current and prefetched
+    batches are returned again, instead of fetching them from Telegram.
+    Up to lookahead batches received but not yet processed can still be lost if the bot crashes.
+    """
+
+    def __init__(self, fetch_func: callable, worker: Worker, lookahead: int):
+        """
+        :param fetch_func: Called with offset and timeout, must return a list with the raw updates.
+        :param lookahead: Maximum number of batches to prefetch.
+        """
+        self.fetch_func = fetch_func
+        self.worker = worker
+        self.lookahead = lookahead
+        # (offset, updates, fetch_seconds) tuples, in order
+        self.prefetched = collections.deque()
+        # last batch returned, that may not have been fully processed
+        self.current = []
+        self.fetching = False
+        self.cancelled = False
+        self.condition = threading.Condition()
+        self.stats = PrefetchStats()
+
+    def get_updates(self, offset, timeout):
+        offset = int(offset) if offset is not None else None
+        start_time = time.time()
+        with self.condition:
+            while self.fetching and not self.__is_next_prefetched(offset):
+                # it may be the one being fetched, or the lookahead chain must be stopped to fetch another one
+                # (the batch being fetched is still kept, as its request acknowledges the previous ones)
+                if self.prefetched:
+                    self.cancelled = True
+                self.condition.wait()
+            prefetched = self.__pop_prefetched(offset)
+        if prefetched is not None:
+            updates, fetch_seconds = prefetched
+            if fetch_seconds is not None:
+                self.stats.prefetched(fetch_seconds, time.time() - start_time)
+        else:
+            updates = self.fetch_func(offset, timeout)
+            self.stats.fetched(time.time() - start_time)
+        with self.condition:
+            self.current = updates
+        self.__prefetch_after(updates, timeout)
+        return updates
+
+    def __is_next_prefetched(self, offset):
+        return len(self.prefetched) > 0 and self.prefetched[0][0] == offset
+
+    def __pop_prefetched(self, offset):
+        if self.__is_next_prefetched(offset):
+            _, updates, fetch_seconds = self.prefetched.popleft()
+            return updates, fetch_seconds
+        # the requested offset is not the next one, but the updates received have already been acknowledged,
+        # so the ones from the offset are returned again
+        batches = [self.current] + [updates for _, updates, _ in self.prefetched]
+        self.prefetched.clear()
+        updates = [update for batch in batches for update in batch if offset is None or update.update_id >= offset]
+        if updates:
+            self.stats.resumed()
+            return updates, None
+        return None
+
+    def __prefetch_after(self, updates: list, timeout):
+        with self.condition:
+            if self.fetching or self.cancelled or len(self.prefetched) >= self.lookahead:
+                return
+            if self.prefetched:
+                updates = self.prefetched[-1][1]
+            if len(updates) == 0:
+                # there is nothing to gain by issuing the next long polling request in advance
+                return
+            offset = updates[-1].update_id + 1
+            self.fetching = True
+        self.worker.post(Work(lambda: self.__prefetch(offset, timeout), "prefetch_updates"))
+
+    def __prefetch(self, offset, timeout):
+        try:
+            while True:
+                start_time = time.time()
+                # on error, stop prefetching and let it be raised again when fetched synchronously
+                updates = self.fetch_func(offset, timeout)
+                fetch_seconds = time.time() - start_time
+                with self.condition:
+                    self.prefetched.append((offset, updates, fetch_seconds))
+                    self.condition.notify_all()
+                    if self.cancelled or len(updates) == 0 or len(self.prefetched) >= self.lookahead:
+                        return
+                offset = updates[-1].update_id + 1
+        finally:
+            with self.condition:
+                self.fetching = False
+                self.cancelled = False
+                self.condition.notify_all()
+
+
+class PrefetchStats:
+    def __init__(self):
+        self.prefetched_batches = 0
+        self.fetched_batches = 0
+        # batches returned again because the caller requested a previous offset
+        self.resumed_batches = 0
+        # time spent on getUpdates requests of the used prefetched batches,
+        # and time the caller still had to wait for them
+        self.prefetched_fetch_seconds = 0
+        self.prefetched_wait_seconds = 0
+        # time the caller waited for batches not prefetched
+        self.fetched_wait_seconds = 0
+        self.lock = threading.Lock()
+
+    def prefetched(self, fetch_seconds: float, wait_seconds: float):
+        with self.lock:
+            self.prefetched_batches += 1
+            self.prefetched_fetch_seconds += fetch_seconds
+            self.prefetched_wait_seconds += wait_seconds
+
+    def fetched(self, wait_seconds: float):
+        with self.lock:
+            self.fetched_batches += 1
+            self.fetched_wait_seconds += wait_seconds
+
+    def resumed(self):
+        with self.lock:
+            self.resumed_batches += 1
+
+    @property
+    def saved_seconds(self):
+        """Time of the getUpdates requests that overlapped with the processing of updates"""
+        with self.lock:
+            return max(self.prefetched_fetch_seconds - self.prefetched_wait_seconds, 0)
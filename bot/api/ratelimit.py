@@ -0,0 +1,219 @@
+import bisect
+import itertools
+import threading
+import time
+
+from bot.multithreading.work import Work
+from bot.multithreading.worker.abstract import AbstractWorker
+
+
+# Limits of messages sent by bots, as documented by Telegram
+GLOBAL_MESSAGES_PER_SECOND = 30
+PRIVATE_CHAT_MESSAGES_PER_SECOND = 1
+GROUP_MESSAGES_PER_SECOND = 20 / 60
+
+# Number of messages that can be sent in a burst before being limited to the rates above
+GLOBAL_BURST = 30
+CHAT_BURST = 3
+
+# Api calls counted by the limits
+RATE_LIMITED_API_CALL_PREFIXES = ("send", "edit", "forward", "copy")
+NOT_RATE_LIMITED_API_CALLS = ("sendChatAction",)
+
+# Pending calls are sent in priority order, lower values first
+PRIORITY_HIGH = 0
+PRIORITY_LOW = 1
+
+# Chat buckets are forgotten once they are full, when there are more than this number of them
+MAX_IDLE_CHAT_BUCKETS = 1000
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_update = time.monotonic()
+        self.blocked_until = 0
+
+    def get_wait_seconds(self, now: float):
+        """Returns the seconds until a token will be available, or 0 if there is one now."""
+        self.__refill(now)
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+    def block_until(self, until: float):
+        """Used when the server answers that we are sending too fast, no more tokens are given until then."""
+        self.blocked_until = max(self.blocked_until, until)
+        self.tokens = 0
+
+    def is_full(self, now: float):
+        self.__refill(now)
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+    def __refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_update) * self.rate)
+        self.last_update = now
+
+
+class RateLimiter(AbstractWorker):
+    """
+    Paces the api calls that send messages to honor Telegram limits, both per chat and global.
+
+    Calls wait on a queue until their chat and the global buckets have a token,
+    and are dispatched in priority order, so that a flood of low priority calls to a chat
+    does not delay the high priority ones, nor the ones for other chats.
+
+    It runs on its own thread, which only dispatches calls, they are performed elsewhere:
+    asynchronous calls are posted to their scheduler, and synchronous ones are run on the calling thread.
+    For that reason, its error handler must not perform rate limited api calls synchronously.
+    """
+
+    def __init__(self, name: str, error_handler: callable):
+        super().__init__(name, error_handler)
+        self.global_bucket = TokenBucket(GLOBAL_MESSAGES_PER_SECOND, GLOBAL_BURST)
+        self.chat_buckets = {}
+        # sorted by priority and arrival order
+        self.pending = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.rate_limit_stats = RateLimiterStats()
+
+    @staticmethod
+    def is_rate_limited(api_call: str):
+        return api_call.startswith(RATE_LIMITED_API_CALL_PREFIXES) and api_call not in NOT_RATE_LIMITED_API_CALLS
+
+    def schedule(self, chat_id, priority: int, work: Work):
+        """
+        Runs the work on the limiter thread once the call can be performed.
+        The work must be quick, usually it just posts the call to another worker.
+        """
+        work.post_time = time.perf_counter()
+        with self.condition:
+            request = PendingRequest(chat_id, work)
+            bisect.insort(self.pending, (priority, next(self.sequence), request))
+            self.rate_limit_stats.queued(len(self.pending))
+            self.condition.notify()
+
+    def wait(self, chat_id, priority: int):
+        """Blocks the calling thread until the call can be performed."""
+        ready = threading.Event()
+        self.schedule(chat_id, priority, Work(ready.set, "rate_limiter:wait"))
+        ready.wait()
+
+    def retry_after(self, chat_id, seconds: int):
+        """To be called when the server answers a call with a too many requests error."""
+        with self.condition:
+            self.__get_bucket(chat_id).block_until(time.monotonic() + seconds)
+            self.rate_limit_stats.retried()
+
+    def run(self):
+        while True:
+            with self.condition:
+                ready_requests, wait_seconds = self.__pop_ready_requests()
+                if not ready_requests:
+                    self.condition.wait(wait_seconds)
+                    continue
+            for request in ready_requests:
+                self._work(request.work)
+
+    def __pop_ready_requests(self):
+        """
+        Returns the requests that can be dispatched now, and the seconds until the next pending one could be
+        (or None if there is none).
+        """
+        now = time.monotonic()
+        ready_requests = []
+        min_wait_seconds = None
+        for entry in self.pending[:]:
+            request = entry[2]
+            chat_bucket = self.__get_bucket(request.chat_id)
+            wait_seconds = max(self.global_bucket.get_wait_seconds(now), chat_bucket.get_wait_seconds(now))
+            if wait_seconds > 0:
+                if min_wait_seconds is None or wait_seconds < min_wait_seconds:
+                    min_wait_seconds = wait_seconds
+                continue
+            self.global_bucket.consume()
+            if chat_bucket is not self.global_bucket:
+                chat_bucket.consume()
+            self.pending.remove(entry)
+            self.rate_limit_stats.dispatched(now - request.creation_time)
+            ready_requests.append(request)
+        if not self.pending:
+            self.condition.notify_all()
+            self.__forget_idle_chat_buckets(now)
+        return ready_requests, min_wait_seconds
+
+    def __get_bucket(self, chat_id):
+        if chat_id is None:
+            # not a message to a chat (eg. an inline message edition), only the global limit applies
+            return self.global_bucket
+        chat_id = str(chat_id)
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            is_group = chat_id.startswith("-")
+            rate = GROUP_MESSAGES_PER_SECOND if is_group else PRIVATE_CHAT_MESSAGES_PER_SECOND
+            bucket = TokenBucket(rate, CHAT_BURST)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def __forget_idle_chat_buckets(self, now: float):
+        if len(self.chat_buckets) > MAX_IDLE_CHAT_BUCKETS:
+            for chat_id, bucket in list(self.chat_buckets.items()):
+                if bucket.is_full(now):
+                    del self.chat_buckets[chat_id]
+
+    def post(self, work: Work):
+        # works not associated with any chat, only the global limit applies
+        self.schedule(None, PRIORITY_HIGH, work)
+
+    def shutdown(self):
+        with self.condition:
+            while self.pending:
+                self.condition.wait()
+
+
+class PendingRequest:
+    def __init__(self, chat_id, work: Work):
+        self.chat_id = chat_id
+        self.work = work
+        self.creation_time = time.monotonic()
+
+
+class RateLimiterStats:
+    def __init__(self):
+        self.queue_size = 0
+        self.max_queue_size = 0
+        self.dispatched_calls = 0
+        self.delayed_calls = 0
+        self.total_delay_seconds = 0
+        self.max_delay_seconds = 0
+        self.retried_calls = 0
+
+    def queued(self, queue_size: int):
+        self.queue_size = queue_size
+        self.max_queue_size = max(self.max_queue_size, queue_size)
+
+    def dispatched(self, delay_seconds: float):
+        self.queue_size -= 1
+        self.dispatched_calls += 1
+        # calls dispatched right away take some microseconds
+        if delay_seconds >= 0.001:
+            self.delayed_calls += 1
+            self.total_delay_seconds += delay_seconds
+            self.max_delay_seconds = max(self.max_delay_seconds, delay_seconds)
+
+    def retried(self):
+        self.retried_calls += 1
+
+    @property
+    def average_delay_seconds(self):
+        if self.delayed_calls == 0:
+            return 0
+        return self.total_delay_seconds / self.delayed_calls
@@ -1,19 +1,32 @@
-import threading
 from typing import Union
 
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3 import Retry
 
+from bot.api import json_backend
+from bot.api.connection_pool import ConnectionPool
+
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+DEFAULT_MAX_CONNECTIONS = 10
+
 
 class TelegramBotApi:
     """This is a threading-safe API. Avoid breaking it by adding state."""
 
-    def __init__(self, auth_token, reuse_connections: bool, debug: bool):
+    def __init__(self, auth_token, reuse_connections: bool, debug: bool,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS):
+        """
+        :param max_connections: Maximum number of connections shared by all threads when reusing connections.
+        """
         self.base_url = "https://api.telegram.org/bot" + auth_token + "/"
         self.reuse_connections = reuse_connections
         self.debug = debug
-        self.local = threading.local()
+        self.connection_pool = None
+        if reuse_connections:
+            self.connection_pool = self.__create_connection_pool(max_connections, self.base_url + "getMe")
 
     def __getattr__(self, item):
         return self.__get_request_from_function_name(item)
@@ -22,11 +35,15 @@ class TelegramBotApi:
         return lambda **params: self.__send_request(function_name, params)
 
     def __send_request(self, command, params):
-        request = requests.Request("GET", self.base_url + command, params=params).prepare()
+        # params are sent as a json body, so that big or nested values are encoded only once
+        request = requests.Request(
+            "POST", self.base_url + command, data=json_backend.dumps(params), headers=JSON_HEADERS
+        ).prepare()
         self.__log_request(request)
         response = self.__get_session().send(request, timeout=60)
         self.__log_response(response)
-        json_response = response.json()
+        # decode the raw body, avoiding the charset detection and text decoding of response.json()
+        json_response = json_backend.loads(response.content)
         return self.__get_result(json_response)
 
     @staticmethod
@@ -39,17 +56,11 @@ class TelegramBotApi:
         if not self.reuse_connections:
             # Returning a new session every time, as requests does when calling
             # directly its request() function.
-            # Not calling self.__create_session() to avoid setting a retry policy
-            # that we do not need for one-time sessions.
             return requests.session()
-        session = self.local.__dict__.get("session")
-        if not session:
-            session = self.__create_session()
-            self.local.session = session
-        return session
-
-    def __create_session(self):
-        session = requests.session()
+        return self.connection_pool.get_session()
+
+    @staticmethod
+    def __create_connection_pool(max_connections: int, ping_url: str):
         # Retry one time on read errors, as the connection could have been closed
         # by the remote side and its close notification might have been lost,
         # blocked by firewall or dropped by NAT.
@@ -73,15 +84,17 @@ class TelegramBotApi:
         # sent silently on poor network conditions.
         # So, it is preferable a message lost with the error being logged than a
         # duplicate message without noticing it.
+        # The connection pool does not reuse connections close to the server idle timeout,
+        # making that edge less likely.
 
         # retry = Retry(total=1, connect=0, read=1, status=0, respect_retry_after_header=False)
         # passing prefix lowered to work-around https://github.com/requests/requests/pull/4349
         # session.mount(self.base_url.lower(), HTTPAdapter(max_retries=retry))
-        return session
+        return ConnectionPool(max_connections, ping_url)
 
     def __log_request(self, request: requests.PreparedRequest):
         if self.debug:
-            print(">> " + request.url)
+            print(">> " + request.url + " " + request.body.decode("utf-8"))
 
     def __log_response(self, response: requests.Response):
         if self.debug:
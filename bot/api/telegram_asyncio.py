@@ -0,0 +1,183 @@
+import asyncio
+import ssl
+import time
+import urllib.parse
+
+from bot.api import json_backend
+from bot.api.telegram import TelegramBotApiException
+
+
+TELEGRAM_API_URL = "https://api.telegram.org/"
+
+REQUEST_TIMEOUT_SECONDS = 60
+
+# Idle connections are not reused after this time, as the server may have closed them
+# (see DEFAULT_WORKER_POOL_MAX_SECONDS_IDLE on scheduler for the reasoning of the value)
+MAX_SECONDS_IDLE = 850
+
+
+class AsyncTelegramBotApi:
+    """
+    Asyncio version of TelegramBotApi, whose api calls return coroutines instead of blocking.
+
+    It keeps a pool of keep-alive connections on the event loop it is used from,
+    so it must always be used from the same loop.
+    Each in-flight call only costs a coroutine instead of a thread.
+    """
+
+    def __init__(self, auth_token, max_connections: int, debug: bool, api_url: str = TELEGRAM_API_URL):
+        url = urllib.parse.urlsplit(api_url)
+        self.host = url.hostname
+        self.use_ssl = url.scheme == "https"
+        self.port = url.port or (443 if self.use_ssl else 80)
+        self.base_path = url.path.rstrip("/") + "/bot" + auth_token + "/"
+        self.max_connections = max_connections
+        self.debug = debug
+        # created lazily, as they must be bound to the loop the api is used from
+        self.semaphore = None
+        self.ssl_context = None
+        self.idle_connections = []
+
+    def __getattr__(self, item):
+        return self.__get_request_from_function_name(item)
+
+    def __get_request_from_function_name(self, function_name):
+        return lambda **params: self.__send_request(function_name, params)
+
+    async def __send_request(self, command, params):
+        path = self.base_path + command
+        body = json_backend.dumps(params)
+        self.__log_request(path, body)
+        async with self.__get_semaphore():
+            response = await asyncio.wait_for(self.__request(path, body), REQUEST_TIMEOUT_SECONDS)
+        self.__log_response(response)
+        json_response = json_backend.loads(response)
+        return self.__get_result(json_response)
+
+    @staticmethod
+    def __get_result(response: dict):
+        if not response["ok"]:
+            raise TelegramBotApiException(response["error_code"], response["description"], response.get("parameters"))
+        return response["result"]
+
+    def __get_semaphore(self):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_connections)
+        return self.semaphore
+
+    async def __request(self, path, body):
+        connection = self.__get_idle_connection()
+        if connection is None:
+            connection = await self.__connect()
+        try:
+            # As TelegramBotApi does, failed requests are not retried, even if the connection was being reused,
+            # as it is preferable a lost message with the error being logged than a duplicate one.
+            response, keep_alive = await connection.request(self.host, path, body)
+        except BaseException:
+            connection.close()
+            raise
+        if keep_alive:
+            connection.last_used = time.monotonic()
+            self.idle_connections.append(connection)
+        else:
+            connection.close()
+        return response
+
+    def __get_idle_connection(self):
+        while self.idle_connections:
+            # most recently used first, so that the other ones expire if not needed
+            connection = self.idle_connections.pop()
+            if time.monotonic() - connection.last_used < MAX_SECONDS_IDLE and not connection.is_closing():
+                return connection
+            connection.close()
+        return None
+
+    async def __connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.__get_ssl_context())
+        return HttpConnection(reader, writer)
+
+    def __get_ssl_context(self):
+        if not self.use_ssl:
+            return None
+        if self.ssl_context is None:
+            self.ssl_context = ssl.create_default_context()
+        return self.ssl_context
+
+    def close(self):
+        while self.idle_connections:
+            self.idle_connections.pop().close()
+
+    def __log_request(self, path, body):
+        if self.debug:
+            print(">> " + path + " " + body.decode("utf-8"))
+
+    def __log_response(self, response: bytes):
+        if self.debug:
+            print("<< " + response.decode())
+
+
+class HttpConnection:
+    """Minimal HTTP/1.1 client connection, only supporting what the Telegram bot API needs."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.last_used = None
+
+    async def request(self, host, path, body: bytes):
+        """Returns a tuple with the response body and whether the connection can be reused."""
+        headers = (
+            "POST {path} HTTP/1.1\r\n"
+            "Host: {host}\r\n"
+            "Content-Type: application/json\r\n"
+            "Content-Length: {length}\r\n"
+            "Connection: keep-alive\r\n"
+            "\r\n"
+        ).format(path=path, host=host, length=len(body))
+        self.writer.write(headers.encode("latin-1") + body)
+        await self.writer.drain()
+        return await self.__read_response()
+
+    async def __read_response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by server")
+        version = status_line.decode("latin-1").split(" ", 1)[0]
+        headers = await self.__read_headers()
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = await self.__read_chunked_body()
+        elif "content-length" in headers:
+            body = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            # body is delimited by the connection close
+            body = await self.reader.read()
+            keep_alive = False
+        # error responses (eg. 400 or 429) also have a json body, it is up to the caller to handle it
+        return body, keep_alive
+
+    async def __read_headers(self):
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            name, value = line.decode("latin-1").split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    async def __read_chunked_body(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b";", 1)[0], 16)
+            if size == 0:
+                # skip trailers
+                await self.__read_headers()
+                return b"".join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+    def is_closing(self):
+        return self.writer.transport.is_closing() or self.reader.at_eof()
+
+    def close(self):
+        self.writer.close()
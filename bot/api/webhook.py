@@ -0,0 +1,184 @@
+import hmac
+import ipaddress
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from bot.action.core.update import Update
+from bot.api import json_backend
+from bot.api.domain import ApiObject
+
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Seconds a request waits for room in a full ingress queue before answering with an error.
+# Telegram will retry the delivery of the update later.
+ENQUEUE_TIMEOUT_SECONDS = 10
+
+# Maximum size of the body of a request, bigger ones are rejected without reading them.
+# Updates are way smaller, so it only protects from requests that would exhaust the memory.
+MAX_BODY_BYTES = 1024 * 1024
+
+# Seconds get_updates waits for an update to arrive.
+# Kept low so that the processing loop is not blocked for too long when there are no updates.
+GET_UPDATES_TIMEOUT_SECONDS = 1
+
+
+class WebhookServer:
+    """
+    HTTP server receiving the updates that Telegram posts to the bot webhook.
+
+    Updates are put on a bounded queue by the request threads, and consumed with :func:`get_updates`.
+    Requests are answered once the update is on the queue, so updates still on it when the bot
+    is stopped must be drained with :func:`get_queued_updates` after calling :func:`shutdown`.
+    Once :func:`shutdown` is called no more updates are enqueued, requests still in progress are
+    answered with an error so that Telegram delivers them again later.
+    """
+
+    def __init__(self, host: str, port: int, secret_token: str, queue_size: int, debug: bool):
+        """
+        :param secret_token: If not empty, requests without it on the SECRET_TOKEN_HEADER are rejected.
+            It can only be empty when listening on a loopback host, as anyone able to reach the server
+            could post forged updates otherwise (eg. from an admin).
+        """
+        if not secret_token and not self.is_loopback(host):
+            raise Exception("webhook secret token is required when listening on a not loopback host: " + host)
+        self.secret_token = secret_token
+        self.debug = debug
+        self.updates = queue.Queue(queue_size)
+        # guards closing and the puts on updates, and is notified when updates are taken from it
+        self.condition = threading.Condition()
+        self.closing = False
+        self.server = WebhookHTTPServer((host, port), WebhookRequestHandler, self)
+        self.thread = None
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def start(self):
+        self.thread = threading.Thread(name="webhook", target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def get_updates(self, timeout=GET_UPDATES_TIMEOUT_SECONDS):
+        """Waits up to timeout seconds for an update, and returns it along with any other already queued"""
+        try:
+            update = self.updates.get(timeout=timeout)
+        except queue.Empty:
+            return
+        self.__notify_dequeued()
+        yield update
+        yield from self.get_queued_updates()
+
+    def get_queued_updates(self):
+        while True:
+            try:
+                update = self.updates.get_nowait()
+            except queue.Empty:
+                return
+            self.__notify_dequeued()
+            yield update
+
+    def __notify_dequeued(self):
+        with self.condition:
+            self.condition.notify_all()
+
+    def shutdown(self):
+        """Stops accepting requests and updates, so that no more are queued once it returns"""
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.server.shutdown()
+        self.server.server_close()
+
+    @staticmethod
+    def is_loopback(host: str):
+        if host == "localhost":
+            return True
+        try:
+            return ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            # a hostname that could resolve to any address
+            return False
+
+    def is_authorized(self, secret_token: str):
+        if not self.secret_token:
+            return True
+        return secret_token is not None and hmac.compare_digest(secret_token, self.secret_token)
+
+    def enqueue(self, update_data: dict):
+        """:return: False if the queue was full or the server is shutting down, and the update was not enqueued"""
+        update = Update(ApiObject.wrap_api_object(update_data))
+        deadline = time.monotonic() + ENQUEUE_TIMEOUT_SECONDS
+        with self.condition:
+            # closing is checked along with the put under the lock,
+            # so that no update is enqueued after shutdown and then never drained
+            while not self.closing:
+                try:
+                    self.updates.put_nowait(update)
+                except queue.Full:
+                    remaining_seconds = deadline - time.monotonic()
+                    if remaining_seconds <= 0:
+                        return False
+                    self.condition.wait(remaining_seconds)
+                else:
+                    return True
+            return False
+
+
+class WebhookHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_address, request_handler_class, webhook: WebhookServer):
+        super().__init__(server_address, request_handler_class)
+        self.webhook = webhook
+
+
+class WebhookRequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        webhook = self.server.webhook
+        if not webhook.is_authorized(self.headers.get(SECRET_TOKEN_HEADER)):
+            self.__respond(403)
+            return
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self.__respond(411)
+            return
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.__respond(400)
+            return
+        if length > MAX_BODY_BYTES:
+            self.__respond(413)
+            return
+        update_data = self.__read_json_body(length)
+        if type(update_data) is not dict or "update_id" not in update_data:
+            self.__respond(400)
+        elif not webhook.enqueue(update_data):
+            # ingress queue is full or the bot is stopping, Telegram will retry later
+            self.__respond(503)
+        else:
+            self.__respond(200)
+
+    def __read_json_body(self, length: int):
+        body = self.rfile.read(length)
+        try:
+            return json_backend.loads(body)
+        except ValueError:
+            return None
+
+    def __respond(self, status: int):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        if self.server.webhook.debug:
+            super().log_message(format, *args)
@@ -1,4 +1,7 @@
+import os
 import time
+import traceback
+from typing import Union
 
 from bot import project_info
 from bot.action.core.action import Action
@@ -8,16 +11,28 @@ from bot.action.standard.admin.config_status import ConfigStatus
 from bot.action.util.textformat import FormattedText
 from bot.api.api import Api
 from bot.api.async import AsyncApi
+from bot.api.offset import UpdatesOffsetTracker
+from bot.api.ratelimit import RateLimiter
 from bot.api.telegram import TelegramBotApi
+from bot.api.webhook import WebhookServer
 from bot.logger.admin_logger import AdminLogger
 from bot.logger.worker_logger import WorkerStartStopLogger
 from bot.multithreading.scheduler import SchedulerApi
+from bot.multithreading.work import Work
+from bot.multithreading.worker import Worker
+from bot.multithreading.worker.immediate import ImmediateWorker
 from bot.storage import Config, Cache
 from bot.storage import State
+from bot.storage.reloader import ConfigReloader
+from bot.storage.sqlite_state.api import SqliteStateApiFactory
+from bot.storage.sqlite_state.migrator import DirectoryStateMigrator
+from bot.storage.sqlite_state.state import SqliteState
+from bot.storage.writeback import WriteBackState, WriteBackBuffer
 
 
 CONFIG_DIR = "config"
 STATE_DIR = "state"
+STATE_DATABASE = "state.db"
 
 
 class Bot:
@@ -26,10 +41,16 @@ class Bot:
         :param project_name: Optional name to be displayed on starting message on admin chat.
         """
         self.config = Config(CONFIG_DIR)
-        self.state = State(STATE_DIR)
+        self.state = self._create_state()
         self.cache = Cache()
+        max_cached_nodes = int(self.config.max_cached_nodes)
+        self.state.set_max_cached_children(max_cached_nodes)
+        self.cache.set_max_cached_children(max_cached_nodes)
+        self.config.set_max_cached_children(max_cached_nodes)
         debug = self.config.debug()
-        telegram_api = TelegramBotApi(self.config.auth_token, self.config.reuse_connections(), debug)
+        telegram_api = TelegramBotApi(
+            self.config.auth_token, self.config.reuse_connections(), debug, int(self.config.max_network_connections)
+        )
         self.api = Api(telegram_api, self.state)
         self.cache.bot_info = self.api.getMe()
         self.logger = AdminLogger(self.api, self.config.admin_chat_id, debug, self.config.traceback_chat_id())
@@ -37,21 +58,137 @@ class Bot:
         self.starting(project_name)
         if self.config.async():
             self.scheduler.setup()
-            self.api.enable_async(AsyncApi(self.api, self.scheduler))
+            self.api.enable_async(AsyncApi(self.api, self.scheduler, self._create_event_loop()))
+            self.api.enable_connection_keep_alive(self.scheduler.background_worker)
+            self._enable_rate_limiting()
+            self._enable_config_reloading()
+            if isinstance(self.state, SqliteState):
+                # a dedicated worker, to serialize database access without the risk of deadlocking
+                # if other works running on a shared worker access the state
+                self.state.set_worker(self.scheduler.new_worker("state"))
+        self.webhook = self._create_webhook()
+        self.chat_workers = self._create_chat_workers()
+        self._enable_updates_prefetching()
         self.action = Action()
-        self.update_processor = UpdateProcessor(self.action, self.logger)
+        self.update_processor = self._create_update_processor()
+
+    def _create_state(self):
+        state_storage = self.config.state_storage
+        if state_storage == "sqlite":
+            return self._create_sqlite_state()
+        elif state_storage != "files":
+            raise Exception("unknown state storage: " + state_storage)
+        if self.config.state_write_back():
+            buffer = WriteBackBuffer(
+                int(self.config.state_flush_seconds),
+                self.config.state_durability,
+                int(self.config.state_max_cached_values)
+            )
+            return WriteBackState(STATE_DIR, buffer)
+        return State(STATE_DIR)
+
+    def _create_sqlite_state(self):
+        # scheduler is not available yet, so run database operations on the calling thread until it is set-up
+        worker = ImmediateWorker(self.__print_work_error)
+        if not os.path.exists(STATE_DATABASE) and os.path.isdir(STATE_DIR):
+            self.__migrate_state_to_sqlite(worker)
+        return SqliteState("", SqliteStateApiFactory.get(STATE_DATABASE, worker))
+
+    @staticmethod
+    def __migrate_state_to_sqlite(worker: Worker):
+        # migrate to a temporal database to not leave a partially migrated one if the process is interrupted
+        migration_database = STATE_DATABASE + ".migrating"
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(migration_database + suffix):
+                os.remove(migration_database + suffix)
+        print("Migrating state from '{dir}' to '{database}'...".format(dir=STATE_DIR, database=STATE_DATABASE))
+        api = SqliteStateApiFactory.get(migration_database, worker)
+        migrated_values = DirectoryStateMigrator(STATE_DIR, api).migrate()
+        api.close()
+        os.rename(migration_database, STATE_DATABASE)
+        print("State migrated ({number} values).".format(number=migrated_values))
+
+    @staticmethod
+    def __print_work_error(error: BaseException, work: Work, worker: Worker):
+        print("Error on work {work} (worker {worker}):".format(work=work.name, worker=worker.name))
+        traceback.print_exception(type(error), error, error.__traceback__)
 
     def _create_scheduler(self):
         max_network_workers = int(self.config.max_network_workers)
         worker_logger = WorkerStartStopLogger(self.logger.logger)
         return SchedulerApi(
-            max_network_workers, self.logger.work_error, worker_logger.worker_start, worker_logger.worker_stop
+            max_network_workers, self.logger.work_error, worker_logger.worker_start, worker_logger.worker_stop,
+            int(self.config.max_cpu_workers)
         )
 
+    def _create_event_loop(self):
+        if not self.config.asyncio_api():
+            return None
+        # imported only when enabled, as it needs python 3.5 async syntax
+        from bot.api.telegram_asyncio import AsyncTelegramBotApi
+        async_telegram_api = AsyncTelegramBotApi(
+            self.config.auth_token, int(self.config.asyncio_api_max_connections), self.config.debug()
+        )
+        self.api.enable_asyncio(async_telegram_api)
+        return self.scheduler.new_event_loop_worker("asyncio_api")
+
+    def _enable_rate_limiting(self):
+        if self.config.rate_limit():
+            # errors are not logged to chats, as it could deadlock the rate limiter waiting for itself
+            rate_limiter = RateLimiter("rate_limiter", self.__print_work_error)
+            self.scheduler.start_worker(rate_limiter)
+            self.api.enable_rate_limiting(rate_limiter)
+
+    def _enable_config_reloading(self):
+        reload_seconds = int(self.config.config_reload_seconds)
+        if reload_seconds > 0:
+            self.scheduler.start_worker(
+                ConfigReloader("config_reloader", self.logger.work_error, self.config, reload_seconds)
+            )
+
+    def _create_webhook(self):
+        updates_mode = self.config.updates_mode
+        if updates_mode == "polling":
+            return None
+        elif updates_mode != "webhook":
+            raise Exception("unknown updates mode: " + updates_mode)
+        return WebhookServer(
+            self.config.webhook_listen_host,
+            int(self.config.webhook_listen_port),
+            self.config.webhook_secret_token,
+            int(self.config.webhook_queue_size),
+            self.config.debug()
+        )
+
+    def _create_chat_workers(self):
+        number_of_chat_workers = int(self.config.chat_workers)
+        if number_of_chat_workers <= 0 or not self.scheduler.running:
+            # updates are processed sequentially on the main thread
+            return []
+        if self.webhook is None:
+            # with webhook, updates are acknowledged once received, so there is no offset to track
+            self.api.track_updates_offset(int(self.config.max_updates_in_flight))
+        return [self.scheduler.new_worker("chat" + str(index)) for index in range(number_of_chat_workers)]
+
+    def _enable_updates_prefetching(self):
+        lookahead = int(self.config.prefetch_updates)
+        # with webhook there is nothing to fetch, and with chat workers fetching does not wait for processing
+        if lookahead > 0 and self.scheduler.running and self.webhook is None and not self.chat_workers:
+            self.api.enable_updates_prefetching(self.scheduler.new_worker("prefetch_updates"), lookahead)
+
+    def _create_update_processor(self):
+        if self.chat_workers:
+            return ChatShardedUpdateProcessor(
+                self.action, self.logger, self.chat_workers, self.api.updates_offset_tracker
+            )
+        return UpdateProcessor(self.action, self.logger)
+
     def set_action(self, action: Action):
         action.setup(self.api, self.config, self.state, self.cache, self.scheduler)
+        if self.config.compile_actions():
+            action.compile()
         self.action = action
-        self.update_processor = UpdateProcessor(self.action, self.logger)
+        self.update_processor = self._create_update_processor()
 
     def run(self):
         try:
@@ -94,9 +231,23 @@ class Bot:
         )
 
     def main_loop(self):
-        while True:
-            self.process_pending_updates()
-            self.process_normal_updates()
+        if self.webhook is not None:
+            self.process_webhook_updates()
+        else:
+            while True:
+                self.process_pending_updates()
+                self.process_normal_updates()
+
+    def process_webhook_updates(self):
+        webhook_url = self.config.webhook_url
+        if webhook_url:
+            params = {"url": webhook_url}
+            secret_token = self.config.webhook_secret_token
+            if secret_token:
+                params["secret_token"] = secret_token
+            self.api.setWebhook(**params)
+        self.webhook.start()
+        WebhookUpdatesProcessor(self.webhook.get_updates, self.logger, self.config, self.update_processor).run()
 
     def process_pending_updates(self):
         PendingUpdatesProcessor(self.api.get_pending_updates, self.logger, self.config, self.update_processor).run()
@@ -105,10 +256,20 @@ class Bot:
         NormalUpdatesProcessor(self.api.get_updates, self.logger, self.config, self.update_processor).run()
 
     def shutdown(self):
+        if self.webhook is not None:
+            self.__drain_webhook()
+        self.update_processor.shutdown()
         self.action.shutdown()
         self.scheduler.shutdown()
+        self.state.flush()
         self.logger.info("Finished")
 
+    def __drain_webhook(self):
+        # updates already received have been acknowledged to Telegram, process them before exiting
+        self.webhook.shutdown()
+        for update in self.webhook.get_queued_updates():
+            self.update_processor.process_update(update)
+
 
 class UpdateProcessor:
     def __init__(self, action: Action, logger: AdminLogger):
@@ -123,6 +284,54 @@ class UpdateProcessor:
             # let them to be propagated so that no more updates are processed before waiting some time
             self.logger.error(e, "process_update")
 
+    def shutdown(self):
+        """Waits for any update being processed"""
+        pass
+
+
+class ChatShardedUpdateProcessor(UpdateProcessor):
+    """
+    Processes updates in parallel on several workers, assigning them by chat,
+    so that updates of the same chat are always processed in order on the same worker,
+    and a slow update only delays the ones of the chats sharing its worker.
+    """
+
+    def __init__(self, action: Action, logger: AdminLogger, workers: list,
+                 offset_tracker: Union[UpdatesOffsetTracker, None]):
+        super().__init__(action, logger)
+        self.workers = workers
+        self.offset_tracker = offset_tracker
+
+    def process_update(self, update: Update):
+        worker = self.workers[self.__get_shard_key(update) % len(self.workers)]
+        worker.post(Work(lambda: self.__process_update(update), "process_update:" + str(update.update.update_id)))
+
+    def __process_update(self, update: Update):
+        try:
+            super().process_update(update)
+        finally:
+            if self.offset_tracker is not None:
+                self.offset_tracker.done(update.update.update_id)
+
+    @staticmethod
+    def __get_shard_key(update: Update):
+        raw_update = update.update
+        for message in (raw_update.message, raw_update.edited_message, raw_update.channel_post,
+                        raw_update.edited_channel_post):
+            if message is not None:
+                return message.chat.id
+        callback_query = raw_update.callback_query
+        if callback_query is not None and callback_query.message is not None:
+            return callback_query.message.chat.id
+        for user_update in (callback_query, raw_update.inline_query, raw_update.chosen_inline_result):
+            if user_update is not None and user_update.from_ is not None:
+                return user_update.from_.id
+        return 0
+
+    def shutdown(self):
+        for worker in self.workers:
+            worker.shutdown()
+
 
 class UpdatesProcessor:
     def __init__(self, get_updates_func: callable, logger: AdminLogger, config: Config,
@@ -277,3 +486,12 @@ class NormalUpdatesProcessor(UpdatesProcessor):
 
     def processing_starting(self):
         self.safe_log_info("Started", "Switched to normal updates mode.")
+
+
+class WebhookUpdatesProcessor(UpdatesProcessor):
+    def should_keep_processing_updates(self):
+        # unlike with polling, there is no other mode to switch to on errors
+        return True
+
+    def processing_starting(self):
+        self.safe_log_info("Started", "Receiving updates from webhook.")
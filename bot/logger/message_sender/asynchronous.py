@@ -1,5 +1,5 @@
 from bot.logger.message_sender import IntermediateMessageSender, MessageSender
-from bot.multithreading.work import Work
+from bot.multithreading.work import Work, WORK_PRIORITY_LOW
 from bot.multithreading.worker import Worker
 
 
@@ -9,4 +9,4 @@ class AsynchronousMessageSender(IntermediateMessageSender):
         self.worker = worker
 
     def send(self, text):
-        self.worker.post(Work(lambda: self.sender.send(text), "asynchronous_message_sender:send"))
+        self.worker.post(Work(lambda: self.sender.send(text), "asynchronous_message_sender:send", WORK_PRIORITY_LOW))
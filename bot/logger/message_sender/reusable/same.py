@@ -1,5 +1,6 @@
 from bot.api.api import Api
 from bot.api.domain import Message
+from bot.api.ratelimit import PRIORITY_LOW
 from bot.logger.message_sender import MessageSender
 
 
@@ -11,6 +12,8 @@ class SameMessageSender(MessageSender):
 
     def send(self, message: Message):
         message.to_chat(chat_id=self.chat_id)
+        # log messages can wait for the ones sent to users
+        message.with_priority(PRIORITY_LOW)
         send_func = self._send if self._should_send_new_message() else self._edit
         try:
             send_func(message)
@@ -3,9 +3,12 @@ import threading
 from typing import Union
 
 from bot.multithreading.worker import Worker
+from bot.multithreading.worker.event_loop import EventLoopWorker
 from bot.multithreading.worker.immediate import ImmediateWorker
+from bot.multithreading.worker.process_pool import ProcessPoolWorker, ProcessWork
 from bot.multithreading.worker.queue import QueueWorker
 from bot.multithreading.work import Work
+from bot.multithreading.worker.pool.priority_queue import WorkPriorityQueue
 from bot.multithreading.worker.pool.workers.main import QueueWorkerPool
 
 
@@ -23,7 +26,11 @@ WORKER_POOL_KEEP_WORKERS_FOREVER = None
 
 
 class SchedulerApi:
-    def __init__(self, max_network_workers: int, worker_error_handler: callable, worker_start_callback: callable, worker_end_callback: callable):
+    def __init__(self, max_network_workers: int, worker_error_handler: callable, worker_start_callback: callable, worker_end_callback: callable,
+                 max_cpu_workers: int = 0):
+        """
+        :param max_cpu_workers: Number of processes of the cpu pool. If 0, cpu works are run on the calling thread.
+        """
         self.worker_error_handler = worker_error_handler
 
         # Defining here to avoid IDE from complaining about defining variables outside __init__
@@ -55,6 +62,13 @@ class SchedulerApi:
         self._background_worker = self._new_worker_pool(
             "background", min_workers=0, max_workers=1, max_seconds_idle=DEFAULT_WORKER_POOL_MAX_SECONDS_IDLE
         )
+        self._cpu_worker = None
+        if max_cpu_workers > 0:
+            # results are usually sent as messages, so callbacks are run on the network pool
+            self._cpu_worker = ProcessPoolWorker(
+                "cpu", worker_error_handler, max_cpu_workers, DEFAULT_WORKER_POOL_MAX_SECONDS_IDLE,
+                self._network_worker, self._start_worker
+            )
 
     def set_callbacks(self, worker_start_callback: callable, worker_end_callback: callable, are_async: bool = False):
         """
@@ -83,7 +97,7 @@ class SchedulerApi:
         return QueueWorker(name, queue.Queue(), self.worker_error_handler)
 
     def _new_worker_pool(self, name: str, min_workers: int, max_workers: int, max_seconds_idle: Union[int, None]):
-        return QueueWorkerPool(name, queue.Queue(), self.worker_error_handler, self._start_worker,
+        return QueueWorkerPool(name, WorkPriorityQueue(), self.worker_error_handler, self._start_worker,
                                min_workers, max_workers, max_seconds_idle)
 
     def setup(self):
@@ -128,6 +142,14 @@ class SchedulerApi:
     def immediate(self, work: Work):
         self.immediate_worker.post(work)
 
+    def cpu(self, work: ProcessWork):
+        """
+        Runs a cpu-bound work on another process, see ProcessWork for the requirements it must meet.
+        Its callback is run on a network worker.
+        If the cpu pool is disabled or the scheduler is not running, both are run on the calling thread.
+        """
+        self.cpu_worker.post(work)
+
     @property
     def network_worker(self):
         return self._get_worker(self._network_worker)
@@ -140,11 +162,19 @@ class SchedulerApi:
     def background_worker(self):
         return self._get_worker(self._background_worker)
 
+    @property
+    def cpu_worker(self):
+        return self._get_worker(self._cpu_worker)
+
     def _get_worker(self, worker: Worker):
-        if not self.running:
+        if not self.running or worker is None:
             return self.immediate_worker
         return worker
 
+    def start_worker(self, worker: Worker):
+        """Starts a new Thread running the given Worker, that must not be already running."""
+        self._start_worker(worker)
+
     def new_worker(self, name: str):
         """Creates a new Worker and start a new Thread with it. Returns the Worker."""
         if not self.running:
@@ -153,6 +183,18 @@ class SchedulerApi:
         self._start_worker(worker)
         return worker
 
+    def new_event_loop_worker(self, name: str):
+        """
+        Creates a new EventLoopWorker and starts a new Thread running its loop. Returns the Worker.
+        Blocking works it needs to run off the loop are posted to the network worker.
+        Returns None if the scheduler is not running, as there is no immediate alternative for it.
+        """
+        if not self.running:
+            return None
+        worker = EventLoopWorker(name, self.worker_error_handler, self._network_worker)
+        self._start_worker(worker)
+        return worker
+
     def new_worker_pool(self, name: str, min_workers: int = 0, max_workers: int = 1,
                         max_seconds_idle: int = DEFAULT_WORKER_POOL_MAX_SECONDS_IDLE):
         """
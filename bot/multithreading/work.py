@@ -1,7 +1,22 @@
+# Work priorities, works with higher priority are run first by workers supporting it
+WORK_PRIORITY_HIGH = 0
+WORK_PRIORITY_NORMAL = 1
+WORK_PRIORITY_LOW = 2
+
+WORK_PRIORITY_NAMES = {
+    WORK_PRIORITY_HIGH: "high",
+    WORK_PRIORITY_NORMAL: "normal",
+    WORK_PRIORITY_LOW: "low"
+}
+
+
 class Work:
-    def __init__(self, func: callable, name: str):
+    def __init__(self, func: callable, name: str, priority: int = WORK_PRIORITY_NORMAL):
         self.func = func
         self.name = name
+        self.priority = priority
+        # set by queued workers when the work is posted to them, to know how much time it waited to be run
+        self.post_time = None
 
     def do_work(self):
         self.func()
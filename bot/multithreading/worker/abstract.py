@@ -1,17 +1,29 @@
+import time
+
 from bot.multithreading.work import Work
 from bot.multithreading.worker import Worker
+from bot.multithreading.worker.stats import WorkerStats
 
 
 class AbstractWorker(Worker):
-    def __init__(self, name: str, error_handler: callable):
+    def __init__(self, name: str, error_handler: callable, stats: WorkerStats = None):
+        """
+        :param stats: To share them with other workers (eg. the ones of a pool). If None, new ones are created.
+        """
         super().__init__(name)
         self.error_handler = error_handler
+        self.stats = stats if stats is not None else WorkerStats()
 
     def _work(self, work: Work):
+        start_time = time.perf_counter()
         try:
             self._do_work(work)
         except BaseException as e:
+            # do not count the error handling time
+            self.stats.record(work, start_time, time.perf_counter())
             self._error(e, work)
+        else:
+            self.stats.record(work, start_time, time.perf_counter())
 
     def _do_work(self, work: Work):
         work.do_work()
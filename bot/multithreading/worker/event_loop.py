@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+
+from bot.multithreading.work import Work
+from bot.multithreading.worker import Worker
+from bot.multithreading.worker.abstract import AbstractWorker
+
+
+class EventLoopWorker(AbstractWorker):
+    """
+    Worker that runs an asyncio event loop on its thread.
+    Coroutines can be scheduled on it from any thread, and they run concurrently on the loop,
+    so they must not perform blocking operations. Use `run_off_loop` for them.
+    """
+
+    def __init__(self, name: str, error_handler: callable, off_loop_worker: Worker):
+        """
+        :param off_loop_worker: Worker where blocking works are run (eg. error callbacks or error handling).
+        """
+        super().__init__(name, error_handler)
+        self.off_loop_worker = off_loop_worker
+        self.loop = asyncio.new_event_loop()
+        # number of works and coroutines posted and still not finished
+        self.pending = 0
+        self.idle = threading.Condition()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def post(self, work: Work):
+        work.post_time = time.perf_counter()
+        self.__started()
+        self.loop.call_soon_threadsafe(self.__run_work, work)
+
+    def __run_work(self, work: Work):
+        try:
+            self._work(work)
+        finally:
+            self.__finished()
+
+    def run_coroutine(self, coroutine_func: callable, name: str, done_callback: callable = None):
+        """
+        Schedules the coroutine returned by coroutine_func to be run on the loop.
+        :param done_callback: If present, it is called on the loop with the finished task, and it is in charge of
+            getting its result. Otherwise, if the coroutine raises an exception, it is handled off loop by the
+            error handler. Exceptions raised by done_callback are also handled by the error handler.
+        """
+        self.__started()
+        self.loop.call_soon_threadsafe(self.__create_task, coroutine_func, name, done_callback)
+
+    def __create_task(self, coroutine_func: callable, name: str, done_callback: callable):
+        try:
+            task = self.loop.create_task(coroutine_func())
+        except BaseException as e:
+            self.__finished()
+            self.__handle_error_off_loop(e, name)
+        else:
+            task.add_done_callback(lambda finished_task: self.__task_done(finished_task, name, done_callback))
+
+    def __task_done(self, task: asyncio.Task, name: str, done_callback: callable):
+        try:
+            if done_callback is not None:
+                done_callback(task)
+            elif not task.cancelled() and task.exception() is not None:
+                self.__handle_error_off_loop(task.exception(), name)
+        except BaseException as e:
+            self.__handle_error_off_loop(e, name)
+        finally:
+            self.__finished()
+
+    def __handle_error_off_loop(self, error: BaseException, name: str):
+        # error handlers usually send messages, so they must not run on the loop
+        # the error is re-raised there so that handlers get its traceback as the current exception
+        self.run_off_loop(Work(lambda: self.__raise(error), name))
+
+    @staticmethod
+    def __raise(error: BaseException):
+        raise error
+
+    def run_off_loop(self, work: Work):
+        self.off_loop_worker.post(work)
+
+    def __started(self):
+        with self.idle:
+            self.pending += 1
+
+    def __finished(self):
+        with self.idle:
+            self.pending -= 1
+            if self.pending == 0:
+                self.idle.notify_all()
+
+    def shutdown(self):
+        # the loop is kept running, as QueueWorkers do, shutdown only waits for it to be idle
+        with self.idle:
+            while self.pending > 0:
+                self.idle.wait()
@@ -0,0 +1,79 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+
+from bot.multithreading.work import Work, WORK_PRIORITY_HIGH, WORK_PRIORITY_NORMAL, WORK_PRIORITY_LOW
+
+
+# Seconds a work is delayed in the queue order by its priority.
+# A work is run before any other work with higher priority posted more than
+# this number of seconds after it, so that low priority works are not starved.
+WORK_PRIORITY_AGING_SECONDS = {
+    WORK_PRIORITY_HIGH: 0,
+    WORK_PRIORITY_NORMAL: 1,
+    WORK_PRIORITY_LOW: 10
+}
+
+
+class WorkPriorityQueue(queue.Queue):
+    """
+    Queue of works that returns them by priority, aging them to avoid starvation.
+    It also keeps the time works wait on the queue by priority.
+    """
+
+    def _init(self, maxsize):
+        self.queue = []
+        self.sequence = itertools.count()
+        self.stats = WorkQueueStats()
+
+    def _qsize(self):
+        return len(self.queue)
+
+    def _put(self, work: Work):
+        now = time.monotonic()
+        priority_time = now + WORK_PRIORITY_AGING_SECONDS.get(work.priority, 0)
+        # the sequence keeps works with the same priority time in order, and avoids comparing works
+        heapq.heappush(self.queue, (priority_time, next(self.sequence), now, work))
+
+    def _get(self):
+        _, _, put_time, work = heapq.heappop(self.queue)
+        self.stats.waited(work.priority, time.monotonic() - put_time)
+        return work
+
+
+class WorkQueueStats:
+    def __init__(self):
+        self.by_priority = {}
+        self.lock = threading.Lock()
+
+    def waited(self, priority: int, seconds: float):
+        with self.lock:
+            stats = self.by_priority.get(priority)
+            if stats is None:
+                stats = self.by_priority[priority] = WaitStats()
+            stats.add(seconds)
+
+    def get(self):
+        """Returns a list of (priority, WaitStats) sorted by priority."""
+        with self.lock:
+            return sorted(self.by_priority.items())
+
+
+class WaitStats:
+    def __init__(self):
+        self.works = 0
+        self.total_seconds = 0
+        self.max_seconds = 0
+
+    def add(self, seconds: float):
+        self.works += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    @property
+    def average_seconds(self):
+        if self.works == 0:
+            return 0
+        return self.total_seconds / self.works
@@ -5,11 +5,16 @@ from bot.multithreading.worker import Worker
 from bot.multithreading.worker.queue import QueueWorker
 from bot.multithreading.worker.pool.name_generator import WorkerPoolNameGenerator
 from bot.multithreading.worker.pool.workers.limited_lifespan import LimitedLifespanQueueWorker
+from bot.multithreading.worker.stats import WorkerStats
 
 
 class WorkerSpawner:
     def __init__(self, name_generator: WorkerPoolNameGenerator, work_queue: queue.Queue, error_handler: callable,
-                 worker_starter: callable, min_workers: int, max_workers: int, max_seconds_idle: int):
+                 worker_starter: callable, min_workers: int, max_workers: int, max_seconds_idle: int,
+                 stats: WorkerStats):
+        """
+        :param stats: Shared by all spawned workers.
+        """
         self.name_generator = name_generator
         self.queue = work_queue
         self.error_handler = error_handler
@@ -17,6 +22,7 @@ class WorkerSpawner:
         self.min_workers = min_workers
         self.max_workers = max_workers
         self.max_seconds_idle = max_seconds_idle
+        self.stats = stats
         # children workers will update this value when they end,
         # so all modifications to this value must be protected by the lock
         self.number_of_running_workers = 0
@@ -98,7 +104,8 @@ class WorkerSpawner:
         return QueueWorker(
             self._get_worker_name(),
             self.queue,
-            self.error_handler
+            self.error_handler,
+            self.stats
         )
 
     def _new_temporal_worker(self):
@@ -107,7 +114,8 @@ class WorkerSpawner:
             self.queue,
             self.error_handler,
             self.max_seconds_idle,
-            self.worker_ended
+            self.worker_ended,
+            self.stats
         )
 
     def _start_worker(self, worker: Worker):
@@ -1,16 +1,17 @@
 import queue
 
 from bot.multithreading.worker.queue import QueueWorker
+from bot.multithreading.worker.stats import WorkerStats
 
 
 class LimitedLifespanQueueWorker(QueueWorker):
     def __init__(self, name: str, work_queue: queue.Queue, error_handler: callable, max_seconds_idle: int,
-                 end_notify: callable):
+                 end_notify: callable, stats: WorkerStats = None):
         """
         :param max_seconds_idle: Max seconds to wait for a new work to appear before ending the execution.
             If it is None, it behaves as a QueueWorker, waiting forever.
         """
-        super().__init__(name, work_queue, error_handler)
+        super().__init__(name, work_queue, error_handler, stats)
         self.max_seconds_idle = max_seconds_idle
         self.end_notify = end_notify
 
@@ -19,7 +19,7 @@ class QueueWorkerPool(QueueWorker):
         name_generator = WorkerPoolNameGenerator(base_name, max_workers, max_seconds_idle)
         self.spawner = WorkerSpawner(
             name_generator, self.queue, error_handler, worker_starter,
-            min_workers, max_workers, max_seconds_idle
+            min_workers, max_workers, max_seconds_idle, self.stats
         )
 
     def start(self):
@@ -0,0 +1,127 @@
+import concurrent.futures
+import threading
+import time
+
+from bot.multithreading.work import Work, WORK_PRIORITY_NORMAL
+from bot.multithreading.worker import Worker
+from bot.multithreading.worker.abstract import AbstractWorker
+
+
+class ProcessWork(Work):
+    """
+    Work whose function is run on another process when posted to a ProcessPoolWorker.
+
+    The function must be picklable (ie. defined at module level, not a lambda nor a method), and so must be
+    its args and its return value. It is run on a forked copy of the bot, so it must be a pure computation
+    over its args: data is read from storage before posting the work, and results are saved or sent by the
+    callback, that runs back on the bot process.
+
+    Posted to any other worker, it is run on that worker as a regular work.
+    """
+
+    def __init__(self, func: callable, args: tuple, name: str, callback: callable = None,
+                 priority: int = WORK_PRIORITY_NORMAL):
+        """
+        :param callback: Receives the value returned by func. It can perform blocking operations.
+        """
+        super().__init__(func, name, priority)
+        self.args = args
+        self.callback = callback
+
+    def do_work(self):
+        result = self.func(*self.args)
+        self.deliver(result)
+
+    def deliver(self, result):
+        if self.callback is not None:
+            self.callback(result)
+
+
+def _run_timed(func: callable, args: tuple):
+    # run on the pool processes, perf_counter is system-wide so times can be compared with the ones of the bot
+    start_time = time.perf_counter()
+    result = func(*args)
+    return start_time, time.perf_counter(), result
+
+
+class ProcessPoolWorker(AbstractWorker):
+    """
+    Runs ProcessWorks on a pool of processes, so that cpu-bound works do not hold the GIL
+    while network and chat threads need it.
+
+    Processes are started when a work is posted, and stopped once the worker has been idle
+    for max_seconds_idle, to not keep copies of the bot in memory when they are not needed.
+    While they are alive, a thread runs this worker, so that its start and stop are reported
+    as the ones of any other worker.
+    """
+
+    def __init__(self, name: str, error_handler: callable, max_processes: int, max_seconds_idle: int,
+                 callback_worker: Worker, worker_starter: callable):
+        """
+        :param max_seconds_idle: If None, processes are kept alive forever once started.
+        :param callback_worker: Worker where work callbacks and errors are run.
+        :param worker_starter: Called to start a new thread running this worker when processes are started.
+        """
+        super().__init__(name, error_handler)
+        self.max_processes = max_processes
+        self.max_seconds_idle = max_seconds_idle
+        self.callback_worker = callback_worker
+        self.worker_starter = worker_starter
+        self.executor = None
+        # number of works posted and still not delivered
+        self.pending = 0
+        self.condition = threading.Condition()
+
+    def run(self):
+        with self.condition:
+            while True:
+                self.condition.wait_for(lambda: self.pending == 0)
+                if not self.condition.wait_for(lambda: self.pending > 0, self.max_seconds_idle):
+                    break
+            executor = self.executor
+            # works posted from now on start a new executor (and thread)
+            self.executor = None
+        executor.shutdown(wait=True)
+
+    def post(self, work: ProcessWork):
+        work.post_time = time.perf_counter()
+        with self.condition:
+            start = self.executor is None
+            if start:
+                self.executor = concurrent.futures.ProcessPoolExecutor(self.max_processes)
+            self.pending += 1
+            future = self.executor.submit(_run_timed, work.func, work.args)
+            # restarts the idle time count
+            self.condition.notify_all()
+        if start:
+            self.worker_starter(self)
+        future.add_done_callback(lambda finished_future: self.__done(work, finished_future))
+
+    def __done(self, work: ProcessWork, future: concurrent.futures.Future):
+        # run on the executor management thread, it must be quick
+        try:
+            if future.exception() is None:
+                start_time, end_time, _ = future.result()
+                self.stats.record(work, start_time, end_time)
+            self.callback_worker.post(Work(lambda: self.__deliver(work, future), work.name, work.priority))
+        finally:
+            self.__finished()
+
+    def __deliver(self, work: ProcessWork, future: concurrent.futures.Future):
+        try:
+            _, _, result = future.result()
+        except BaseException as e:
+            self._error(e, work)
+        else:
+            work.deliver(result)
+
+    def __finished(self):
+        with self.condition:
+            self.pending -= 1
+            if self.pending == 0:
+                self.condition.notify_all()
+
+    def shutdown(self):
+        # as the other workers, it only waits for the pending works, processes are stopped when idle
+        with self.condition:
+            self.condition.wait_for(lambda: self.pending == 0)
@@ -1,7 +1,9 @@
 import queue
+import time
 
 from bot.multithreading.work import Work
 from bot.multithreading.worker.abstract import AbstractWorker
+from bot.multithreading.worker.stats import WorkerStats
 
 
 class QueueWorker(AbstractWorker):
@@ -10,8 +12,8 @@ class QueueWorker(AbstractWorker):
     The only limitation is that in error handling you will not be able to distinguish between them.
     """
 
-    def __init__(self, name: str, work_queue: queue.Queue, error_handler: callable):
-        super().__init__(name, error_handler)
+    def __init__(self, name: str, work_queue: queue.Queue, error_handler: callable, stats: WorkerStats = None):
+        super().__init__(name, error_handler, stats)
         self.queue = work_queue
 
     def run(self):
@@ -21,6 +23,7 @@ class QueueWorker(AbstractWorker):
             self.queue.task_done()
 
     def post(self, work: Work):
+        work.post_time = time.perf_counter()
         self.queue.put(work)
 
     def shutdown(self):
@@ -0,0 +1,111 @@
+import collections
+import time
+
+from bot.multithreading.work import Work
+
+
+# Number of most recent works whose times are kept
+MAX_SAMPLES = 10000
+
+
+class WorkerStats:
+    """
+    Times works wait to be run and take to run on a worker.
+
+    To keep the overhead per work low, recording a work just appends its raw times to a bounded deque,
+    which is thread-safe without locking, as workers of a pool share it.
+    Histograms are computed from the most recent samples only when they are requested.
+    """
+
+    def __init__(self):
+        self.start_time = time.monotonic()
+        self.samples = collections.deque(maxlen=MAX_SAMPLES)
+        # not locked, concurrent updates could rarely lose a work, which is acceptable for statistics
+        self.works = 0
+
+    def record(self, work: Work, start_time: float, end_time: float):
+        """Times must come from time.perf_counter"""
+        post_time = work.post_time
+        self.samples.append((work.name, start_time - post_time if post_time is not None else None,
+                             end_time - start_time))
+        self.works += 1
+
+    def get_throughput(self):
+        """Works run per second since the stats were created."""
+        elapsed_seconds = time.monotonic() - self.start_time
+        if elapsed_seconds <= 0:
+            return 0
+        return self.works / elapsed_seconds
+
+    def get_work_stats(self):
+        """
+        Returns a tuple with the WorkStats of all recent works,
+        and a dict with them by work name prefix (the part of the name before the first colon).
+        """
+        total = WorkStats()
+        by_name = {}
+        for name, wait_seconds, run_seconds in list(self.samples):
+            name = name.split(":", 1)[0]
+            stats = by_name.get(name)
+            if stats is None:
+                stats = by_name[name] = WorkStats()
+            stats.add(wait_seconds, run_seconds)
+            total.add(wait_seconds, run_seconds)
+        return total, by_name
+
+
+class WorkStats:
+    def __init__(self):
+        self.works = 0
+        self.wait = Histogram()
+        self.run = Histogram()
+
+    def add(self, wait_seconds, run_seconds: float):
+        self.works += 1
+        if wait_seconds is not None:
+            # works run without being queued (eg. immediately) have no wait time
+            self.wait.add(wait_seconds)
+        self.run.add(run_seconds)
+
+
+class Histogram:
+    """
+    Histogram of durations with logarithmic buckets: four per power of two microseconds,
+    so percentiles have a maximum error of 25%.
+    """
+
+    BUCKETS = 160  # enough for several days
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+
+    def add(self, seconds: float):
+        microseconds = max(int(seconds * 1000000), 0)
+        shift = max(microseconds.bit_length() - 3, 0)
+        index = min((shift << 2) + (microseconds >> shift), self.BUCKETS - 1)
+        self.counts[index] += 1
+        self.count += 1
+
+    def percentile(self, percentile: float):
+        """
+        :param percentile: Between 0 and 100.
+        :return: Upper bound in seconds of the bucket the percentile falls in, or None if there are no values.
+        """
+        if self.count == 0:
+            return None
+        threshold = self.count * percentile / 100
+        accumulated = 0
+        for index, count in enumerate(self.counts):
+            accumulated += count
+            if accumulated >= threshold and accumulated > 0:
+                return self.__get_upper_bound(index) / 1000000
+        return self.__get_upper_bound(self.BUCKETS - 1) / 1000000
+
+    @staticmethod
+    def __get_upper_bound(index: int):
+        if index < 8:
+            return index + 1
+        shift = (index >> 2) - 1
+        mantissa = (index & 3) + 4
+        return (mantissa + 1) << shift
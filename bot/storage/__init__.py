@@ -1,25 +1,45 @@
 import os
 import shutil
+from stat import S_ISREG
 
+from bot.storage.nodecache import NodeCache
 from bot.utils.attributeobject import DictionaryObject, AttributeObject
 
 
 class Storage(AttributeObject):
-    def __init__(self, base_dir):
-        super().__init__("_base_dir", "_cache")
+    def __init__(self, base_dir, *excluded_keys):
+        super().__init__("_base_dir", "_cache", *excluded_keys)
         self._base_dir = base_dir
-        self._cache = {}
+        self._cache = NodeCache()
 
     def get_for_chat_id(self, chat_id):
         chat_path = os.path.join("chat", str(chat_id))
         return self.get_for(chat_path)
 
-    def get_for(self, key):
-        if key not in self._cache:
-            instance = self.__class__.__new__(self.__class__)
-            instance.__init__(os.path.join(self._base_dir, key))
-            self._cache[key] = instance
-        return self._cache[key]
+    def get_for(self, key, pin: bool = False):
+        """:param pin: To never evict the returned node from memory (eg. for the ones used on every update)."""
+        return self._cache.get(key, lambda: self.__new_child_for(key), pin)
+
+    def __new_child_for(self, key):
+        child = self._new_child(os.path.join(self._base_dir, key))
+        child._cache = self._cache.new_child_cache()
+        return child
+
+    def set_max_cached_children(self, max_cached_children: int):
+        """
+        Limits the number of children nodes (returned by `get_for`) kept in memory by each node of the tree.
+        It must be called on the root node before getting any children from it.
+        """
+        self._cache = NodeCache(max_cached_children)
+
+    def get_cached_children_stats(self):
+        """Returns the NodeCacheStats of the tree."""
+        return self._cache.stats
+
+    def _new_child(self, base_dir):
+        instance = self.__class__.__new__(self.__class__)
+        instance.__init__(base_dir)
+        return instance
 
     def _getattr(self, key):
         return self.get_value(key)
@@ -56,6 +76,18 @@ class Storage(AttributeObject):
     def setup(self):
         self.__create_dirs_if_needed()
 
+    def checkpoint(self):
+        """
+        Called before the updates processed so far are acknowledged to Telegram.
+        Storages that do not write values immediately must persist here the ones needed to resume
+        processing updates without losing any of them.
+        """
+        pass
+
+    def flush(self):
+        """Write to disk any value that has not been persisted yet."""
+        pass
+
     def __get_value_path(self, key):
         return os.path.join(self._base_dir, key)
 
@@ -77,17 +109,48 @@ class Config(Storage):
         "send_error_tracebacks": "false",
         "async": "true",
         "reuse_connections": "true",
+        "max_network_connections": "10",
+        "rate_limit": "false",
+        "asyncio_api": "false",
+        "asyncio_api_max_connections": "100",
         "scheduler_events_on_log_chat": "true",
         "sleep_seconds_on_get_updates_error": "60",
         "max_error_seconds_allowed_in_normal_mode": "3600",
         "max_network_workers": "4",
-        "instance_name": ""
+        "max_cpu_workers": "0",
+        "instance_name": "",
+        "updates_mode": "polling",
+        "webhook_url": "",
+        "webhook_listen_host": "127.0.0.1",
+        "webhook_listen_port": "8443",
+        "webhook_secret_token": "",
+        "webhook_queue_size": "100",
+        "prefetch_updates": "0",
+        "chat_workers": "0",
+        "max_updates_in_flight": "100",
+        "compile_actions": "false",
+        "config_reload_seconds": "0",
+        "max_cached_nodes": "10000",
+        "state_storage": "files",
+        "state_write_back": "false",
+        "state_flush_seconds": "10",
+        "state_durability": "offset",
+        "state_max_cached_values": "10000"
     }
 
     TRUE_VALUES = ("true", "yes", "on", "1")
 
     def __init__(self, config_dir):
-        super().__init__(config_dir)
+        """
+        Values are read once, when the config is created, and kept in memory.
+        They are only read again from disk when calling `reload`.
+        """
+        super().__init__(config_dir, "_values", "_signature")
+        # key -> value, replaced as a whole when reloaded, so that readers never see a partial reload
+        self._values = {}
+        # name, modification time and size of the value files when they were read
+        self._signature = None
+        self.reload()
 
     def debug(self):
         return self.__is_true("debug")
@@ -108,9 +171,21 @@ class Config(Storage):
     def reuse_connections(self):
         return self.__is_true("reuse_connections")
 
+    def rate_limit(self):
+        return self.__is_true("rate_limit")
+
+    def asyncio_api(self):
+        return self.__is_true("asyncio_api")
+
     def scheduler_events_on_log_chat(self):
         return self.__is_true("scheduler_events_on_log_chat")
 
+    def compile_actions(self):
+        return self.__is_true("compile_actions")
+
+    def state_write_back(self):
+        return self.__is_true("state_write_back")
+
     def __is_true(self, key):
         value = self._getattr(key)
         return value.lower() in self.TRUE_VALUES
@@ -122,24 +197,85 @@ class Config(Storage):
         return self.DEFAULT_VALUES.get(key, default_value)
 
     def get_value(self, key, default_value=None):
-        value = super().get_value(key, default_value)
-        if value is not None:
-            value = value.strip()
-        return value
+        return self._values.get(key, default_value)
+
+    def exists_value(self, key):
+        return key in self._values
 
     def set_value(self, key, value, append=False):
         # do not allow to modify config values
         raise Exception("config values cannot be modified")
 
+    def reload(self):
+        """
+        Reads again the values if any of their files has been added, modified or removed since
+        they were read, and does the same for the configs returned by `get_for` (eg. the ones of chats).
+        """
+        signature = self.__get_signature()
+        if signature != self._signature:
+            self._values = self.__read_values(signature)
+            self._signature = signature
+        for child in list(self._cache.values()):
+            child.reload()
+
+    def __get_signature(self):
+        try:
+            # listdir and stat instead of scandir, that is not available before python 3.5
+            names = os.listdir(self._base_dir)
+        except FileNotFoundError:
+            return ()
+        signature = []
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(self._base_dir, name))
+            except FileNotFoundError:
+                # removed after being listed
+                continue
+            if S_ISREG(stat.st_mode):
+                signature.append((name, stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(signature))
+
+    def __read_values(self, signature: tuple):
+        values = {}
+        for key, _, _ in signature:
+            try:
+                with open(os.path.join(self._base_dir, key)) as f:
+                    values[key] = f.read().strip()
+            except FileNotFoundError:
+                # removed after getting the signature, the next reload will see the changed signature
+                pass
+        return values
+
 
 class State(Storage):
-    def __init__(self, state_dir):
-        super().__init__(state_dir)
+    def __init__(self, state_dir, *excluded_keys):
+        super().__init__(state_dir, *excluded_keys)
 
 
 class Cache(DictionaryObject):
+    def __init__(self):
+        super().__init__({}, "_children")
+        self._children = NodeCache()
+
     def get_for_chat_id(self, chat_id):
         return self.get_for("chat" + str(chat_id))
 
-    def get_for(self, key):
-        return self._dictionary.setdefault(key, Cache())
+    def get_for(self, key, pin: bool = False):
+        """:param pin: To never evict the returned node, and so its values, from memory."""
+        return self._children.get(key, self.__new_child, pin)
+
+    def __new_child(self):
+        child = Cache()
+        child._children = self._children.new_child_cache()
+        return child
+
+    def set_max_cached_children(self, max_cached_children: int):
+        """
+        Limits the number of children nodes (returned by `get_for`) kept in memory by each node of the tree.
+        It must be called on the root node before getting any children from it.
+        """
+        self._children = NodeCache(max_cached_children)
+
+    def get_cached_children_stats(self):
+        """Returns the NodeCacheStats of the tree."""
+        return self._children.stats
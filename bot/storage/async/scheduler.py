@@ -8,6 +8,10 @@ class StorageScheduler:
         self.worker = worker
         self.context_manager = context_manager
 
+    def set_worker(self, worker: Worker):
+        """Operations scheduled from now on will be run on the new worker"""
+        self.worker = worker
+
     def schedule_no_result(self, func: callable, name: str):
         return self._schedule(func, name, ignore_result=True)
 
@@ -0,0 +1,86 @@
+import collections
+import threading
+
+
+class NodeCache:
+    """
+    Children nodes of a storage or cache tree, kept by key so that they are not created on every access.
+
+    When there are more than `capacity` of them, the least recently used one is evicted (along with
+    all its subtree), so that memory does not grow with every user or chat ever seen.
+    Pinned nodes (eg. the ones accessed on every update) are never evicted, nor counted for the capacity.
+
+    Evicted storage nodes are just created again when needed, as their values are on the storage.
+    Evicted cache nodes lose their values, so they must only hold values that can be computed again.
+    """
+
+    def __init__(self, capacity: int = 0, stats: "NodeCacheStats" = None):
+        """
+        :param capacity: Maximum number of not pinned nodes, or 0 for no limit.
+        :param stats: To share them with the node caches of the rest of the tree. If None, new ones are created.
+        """
+        self.capacity = capacity
+        self.stats = stats if stats is not None else NodeCacheStats()
+        # from the least to the most recently used
+        self.nodes = collections.OrderedDict()
+        self.pinned_nodes = {}
+        self.lock = threading.Lock()
+
+    def new_child_cache(self):
+        """Returns a new empty NodeCache with the same capacity and stats, for a child node."""
+        return NodeCache(self.capacity, self.stats)
+
+    def get(self, key, factory: callable, pin: bool = False):
+        """
+        Returns the node with the given key, calling factory to create it if it is not cached.
+        :param pin: Whether the node must be kept cached forever. Once pinned, it is pinned for all accesses.
+        """
+        with self.lock:
+            node = self.pinned_nodes.get(key)
+            if node is not None:
+                self.stats.hits += 1
+                return node
+            node = self.nodes.get(key)
+            if node is not None:
+                self.stats.hits += 1
+                if pin:
+                    del self.nodes[key]
+                    self.pinned_nodes[key] = node
+                else:
+                    self.nodes.move_to_end(key)
+                return node
+            self.stats.misses += 1
+            node = factory()
+            if pin:
+                self.pinned_nodes[key] = node
+            else:
+                self.nodes[key] = node
+                self.__evict_if_full()
+            return node
+
+    def set(self, key, node):
+        """Replaces the cached node with the given key, or caches it if it was not."""
+        with self.lock:
+            if key in self.pinned_nodes:
+                self.pinned_nodes[key] = node
+                return
+            self.nodes[key] = node
+            self.nodes.move_to_end(key)
+            self.__evict_if_full()
+
+    def __evict_if_full(self):
+        if 0 < self.capacity < len(self.nodes):
+            self.nodes.popitem(last=False)
+            self.stats.evictions += 1
+
+    def values(self):
+        with self.lock:
+            return list(self.pinned_nodes.values()) + list(self.nodes.values())
+
+
+class NodeCacheStats:
+    def __init__(self):
+        # not locked, as node caches of a tree have their own locks, rarely a count could be lost
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
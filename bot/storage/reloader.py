@@ -0,0 +1,29 @@
+import time
+
+from bot.multithreading.work import Work
+from bot.multithreading.worker.abstract import AbstractWorker
+from bot.storage import Config
+
+
+class ConfigReloader(AbstractWorker):
+    """
+    Polls the config files every reload_seconds, reloading the values that changed,
+    so that they are applied without restarting the bot and without reading them on every access.
+
+    Only changed files are read: unchanged ones just have their modification time and size checked.
+    Values read once at startup (eg. the number of workers) still need a restart to be applied.
+    """
+
+    def __init__(self, name: str, error_handler: callable, config: Config, reload_seconds: int):
+        super().__init__(name, error_handler)
+        self.config = config
+        self.reload_seconds = reload_seconds
+
+    def run(self):
+        while True:
+            time.sleep(self.reload_seconds)
+            self._work(Work(self.config.reload, "config_reload"))
+
+    def shutdown(self):
+        # nothing is queued, reloads in progress are quick and harmless to interrupt
+        pass
@@ -0,0 +1,100 @@
+from bot.multithreading.worker import Worker
+from bot.storage.api import StorageApi
+from bot.storage.async.scheduler import StorageScheduler
+from bot.storage.factory import StorageApiFactory
+from bot.storage.sqlite_state.data_source import SqliteStateDataSource
+
+
+KEY_SEPARATOR = "/"
+# character following the separator, used to select all children of a key with a range
+# that can be resolved using the primary key index
+KEY_SEPARATOR_NEXT = chr(ord(KEY_SEPARATOR) + 1)
+
+
+class SqliteStateApi(StorageApi):
+    def __init__(self, data_source: SqliteStateDataSource, scheduler: StorageScheduler):
+        super().__init__(data_source, scheduler)
+        # defining here to let IDE know about its type
+        self.data_source = data_source
+
+    def set_worker(self, worker: Worker):
+        self.scheduler.set_worker(worker)
+
+    def close(self):
+        self._with_result(self.data_source.close, "close")
+
+    def get_value(self, key: str):
+        return self._with_result(lambda: self.__get_value(key), "get_value")
+
+    def __get_value(self, key: str):
+        row = self.__execute("SELECT value FROM state WHERE key = ?", key).fetchone()
+        return row[0] if row is not None else None
+
+    def set_value(self, key: str, value: str):
+        self._with_result(lambda: self.__set_value(key, value), "set_value")
+
+    def __set_value(self, key: str, value: str):
+        self.__execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", key, value)
+
+    def append_value(self, key: str, value: str):
+        self._with_result(lambda: self.__append_value(key, value), "append_value")
+
+    def __append_value(self, key: str, value: str):
+        cursor = self.__execute("UPDATE state SET value = value || ? WHERE key = ?", value, key)
+        if cursor.rowcount == 0:
+            self.__set_value(key, value)
+
+    def delete(self, key: str):
+        """Deletes the value or node with that key, along with all its children"""
+        self._with_result(lambda: self.__delete(key), "delete")
+
+    def __delete(self, key: str):
+        self.__execute("DELETE FROM state WHERE key = ? OR (key >= ? AND key < ?)", key, *self.__children_range(key))
+
+    def exists(self, key: str):
+        return self._with_result(lambda: self.__exists(key), "exists")
+
+    def __exists(self, key: str):
+        row = self.__execute(
+            "SELECT 1 FROM state WHERE key = ? OR (key >= ? AND key < ?) LIMIT 1", key, *self.__children_range(key)
+        ).fetchone()
+        return row is not None
+
+    def list_keys(self, key: str):
+        """Returns the name of the direct children of the node with that key"""
+        return self._with_result(lambda: self.__list_keys(key), "list_keys")
+
+    def __list_keys(self, key: str):
+        if key:
+            start, end = self.__children_range(key)
+            cursor = self.__execute("SELECT key FROM state WHERE key >= ? AND key < ?", start, end)
+            prefix_length = len(start)
+        else:
+            cursor = self.__execute("SELECT key FROM state")
+            prefix_length = 0
+        children = set()
+        for row in cursor:
+            children.add(row[0][prefix_length:].split(KEY_SEPARATOR, 1)[0])
+        return list(children)
+
+    def import_values(self, values: list):
+        """:param values: list of (key, value) tuples to insert in a single transaction"""
+        self._with_result(lambda: self.__import_values(values), "import_values")
+
+    def __import_values(self, values: list):
+        self.data_source.connection.executemany("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", values)
+
+    def __execute(self, sql: str, *params):
+        return self.data_source.connection.execute(sql, params)
+
+    @staticmethod
+    def __children_range(key: str):
+        return key + KEY_SEPARATOR, key + KEY_SEPARATOR_NEXT
+
+
+class SqliteStateApiFactory(StorageApiFactory):
+    @classmethod
+    def get(cls, database_file: str, worker: Worker):
+        data_source = SqliteStateDataSource(database_file)
+        scheduler = cls._get_scheduler_for(worker, data_source)
+        return SqliteStateApi(data_source, scheduler)
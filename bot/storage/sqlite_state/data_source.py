@@ -0,0 +1,53 @@
+import sqlite3
+
+from bot.storage.data_source.data_source import StorageDataSource
+
+
+class SqliteStateDataSource(StorageDataSource):
+    def __init__(self, database_file: str):
+        super().__init__()
+        self.database_file = database_file
+        self.connection = None
+
+    def init(self):
+        # connection is created on the storage worker thread, but it may not be the
+        # same one that uses it later (eg. before the scheduler is started)
+        self.connection = sqlite3.connect(self.database_file, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # safe on WAL mode, a power loss may only rollback the last transactions
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                "key TEXT PRIMARY KEY NOT NULL, "
+                "value TEXT NOT NULL"
+                ")"
+            )
+
+    def close(self):
+        self.connection.close()
+        self.connection = None
+
+    def context_manager(self):
+        return TransactionContextManager(self)
+
+
+class TransactionContextManager:
+    """
+    Runs every storage operation in a transaction.
+    sqlite3 connections commit on success and rollback on error when used as context managers,
+    but the connection is not available until the data source is initialized.
+    """
+
+    def __init__(self, data_source: SqliteStateDataSource):
+        self.data_source = data_source
+
+    def __enter__(self):
+        connection = self.data_source.connection
+        if connection is not None:
+            connection.__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        connection = self.data_source.connection
+        if connection is not None:
+            return connection.__exit__(exc_type, exc_val, exc_tb)
@@ -0,0 +1,42 @@
+import os
+
+from bot.storage.sqlite_state.api import SqliteStateApi, KEY_SEPARATOR
+
+
+class DirectoryStateMigrator:
+    """
+    One-shot migration of a directory based state to a SQLite one.
+    Values already present on the database with the same key are overwritten.
+    Empty nodes (ie. directories without files) are not migrated.
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(self, state_dir: str, api: SqliteStateApi):
+        self.state_dir = state_dir
+        self.api = api
+
+    def migrate(self):
+        """:return: The number of values migrated"""
+        migrated_values = 0
+        batch = []
+        for key, value in self.__get_values():
+            batch.append((key, value))
+            if len(batch) >= self.BATCH_SIZE:
+                migrated_values += self.__import(batch)
+                batch = []
+        if batch:
+            migrated_values += self.__import(batch)
+        return migrated_values
+
+    def __get_values(self):
+        for dir_path, _, file_names in os.walk(self.state_dir):
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                key = os.path.relpath(path, self.state_dir).replace(os.sep, KEY_SEPARATOR)
+                with open(path) as f:
+                    yield key, f.read()
+
+    def __import(self, batch: list):
+        self.api.import_values(batch)
+        return len(batch)
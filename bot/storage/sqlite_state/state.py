@@ -0,0 +1,53 @@
+import os
+
+from bot.multithreading.worker import Worker
+from bot.storage import State
+from bot.storage.sqlite_state.api import SqliteStateApi, KEY_SEPARATOR
+
+
+class SqliteState(State):
+    """
+    State stored as hierarchical keys in a single SQLite database.
+
+    Keys of nodes are joined with KEY_SEPARATOR to build the key of their children,
+    so that `state.get_for_chat_id(1).get_for("pole").timezones` is stored as `chat/1/pole/timezones`.
+    """
+
+    def __init__(self, base_key: str, api: SqliteStateApi):
+        super().__init__(base_key, "_api")
+        self._api = api
+
+    def _new_child(self, base_dir):
+        return SqliteState(base_dir.replace(os.sep, KEY_SEPARATOR), self._api)
+
+    def set_worker(self, worker: Worker):
+        """Database operations of all the nodes will be run on the given worker from now on"""
+        self._api.set_worker(worker)
+
+    def exists_value(self, key):
+        return self._api.exists(self.__key(key))
+
+    def get_value(self, key, default_value=None):
+        value = self._api.get_value(self.__key(key))
+        return value if value is not None else default_value
+
+    def set_value(self, key, value, append=False):
+        key = self.__key(key)
+        if value is None:
+            self._api.delete(key)
+        elif append:
+            self._api.append_value(key, value)
+        else:
+            self._api.set_value(key, value)
+
+    def list_keys(self):
+        return self._api.list_keys(self._base_dir)
+
+    def setup(self):
+        # nothing to create, the database is initialized by the api
+        pass
+
+    def __key(self, key):
+        if not self._base_dir:
+            return key
+        return self._base_dir + KEY_SEPARATOR + key
@@ -0,0 +1,226 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from bot.storage import State
+
+
+# Durability levels, they indicate what is written to disk before updates are acknowledged
+DURABILITY_NONE = "none"  # nothing, values are only written when flush_seconds expire
+DURABILITY_OFFSET = "offset"  # the updates offset, so that no update is lost on a crash
+DURABILITY_ALL = "all"  # every pending value
+
+DURABILITY_LEVELS = (DURABILITY_NONE, DURABILITY_OFFSET, DURABILITY_ALL)
+
+UPDATES_OFFSET_KEY = "next_update_id"
+
+
+class WriteBackState(State):
+    """
+    State that serves values from memory and writes the modified ones to disk in batches.
+
+    All the nodes of a state tree share the same :class:`WriteBackBuffer`, that is thread-safe.
+    """
+
+    def __init__(self, state_dir, buffer: "WriteBackBuffer"):
+        super().__init__(state_dir, "_buffer")
+        self._buffer = buffer
+
+    def _new_child(self, base_dir):
+        return WriteBackState(base_dir, self._buffer)
+
+    def exists_value(self, key):
+        return self._buffer.exists(self, key)
+
+    def get_value(self, key, default_value=None):
+        value = self._buffer.get(self, key)
+        return value if value is not None else default_value
+
+    def set_value(self, key, value, append=False):
+        if value is None:
+            self._buffer.remove(self, key)
+        else:
+            self._buffer.set(self, key, value, append)
+
+    def list_keys(self):
+        return self._buffer.list_keys(self)
+
+    def checkpoint(self):
+        self._buffer.checkpoint(self)
+
+    def flush(self):
+        self._buffer.flush()
+
+    # Disk access, only to be used by the buffer
+
+    def _path(self, key):
+        return os.path.join(self._base_dir, key)
+
+    def _read(self, key):
+        return super().get_value(key)
+
+    def _write(self, key, value, append=False):
+        super().set_value(key, value, append)
+
+    def _exists(self, key):
+        return super().exists_value(key)
+
+    def _list_keys(self):
+        return super().list_keys()
+
+
+class WriteBackBuffer:
+    def __init__(self, flush_seconds: int, durability: str, max_cached_values: int):
+        """
+        :param flush_seconds: Maximum number of seconds a modified value can remain not written to disk.
+            It is checked when values are set and on checkpoints, so a value may remain longer if the bot is idle.
+        :param durability: One of DURABILITY_LEVELS, indicates what to write on checkpoints.
+        :param max_cached_values: Maximum number of already persisted values to keep in memory.
+            Values pending to be written are always kept until they are written.
+        """
+        if durability not in DURABILITY_LEVELS:
+            raise Exception("unknown durability level: " + durability)
+        self.flush_seconds = flush_seconds
+        self.durability = durability
+        self.max_cached_values = max_cached_values
+        # values set and still not written to disk, by path
+        self.pending = {}
+        self.oldest_pending_time = None
+        # values read from disk (None if they do not exist), in least recently used order
+        self.cached = OrderedDict()
+        # re-entrant as flushing can be triggered while performing other operations
+        self.lock = threading.RLock()
+
+    def get(self, storage: WriteBackState, key):
+        path = storage._path(key)
+        with self.lock:
+            pending = self.pending.get(path)
+            if pending is not None:
+                if pending.append:
+                    pending.prepend(storage._read(key))
+                return pending.value
+            if path in self.cached:
+                self.cached.move_to_end(path)
+                return self.cached[path]
+            value = storage._read(key)
+            self._cache(path, value)
+            return value
+
+    def set(self, storage: WriteBackState, key, value, append: bool):
+        path = storage._path(key)
+        with self.lock:
+            pending = self.pending.get(path)
+            if pending is not None:
+                pending.update(value, append)
+            else:
+                if append and path in self.cached:
+                    current_value = self.cached[path]
+                    if current_value is not None:
+                        value = current_value + value
+                    append = False
+                self.cached.pop(path, None)
+                self.pending[path] = PendingWrite(storage, key, value, append)
+                if self.oldest_pending_time is None:
+                    self.oldest_pending_time = time.time()
+            self._flush_if_expired()
+
+    def remove(self, storage: WriteBackState, key):
+        path = storage._path(key)
+        with self.lock:
+            is_value = self.pending.get(path) is not None or self.cached.get(path) is not None
+            self.pending.pop(path, None)
+            self.cached.pop(path, None)
+            if not is_value:
+                # it may be a node, forget about all its children
+                self._forget_children(path)
+            # removals are not frequent, so do not bother delaying them
+            storage._write(key, None)
+
+    def exists(self, storage: WriteBackState, key):
+        path = storage._path(key)
+        with self.lock:
+            if path in self.pending or self.cached.get(path) is not None:
+                return True
+            if any(self._pending_children(path)):
+                return True
+            return storage._exists(key)
+
+    def list_keys(self, storage: WriteBackState):
+        with self.lock:
+            keys = set(storage._list_keys())
+            prefix = storage._base_dir + os.sep
+            for path in self._pending_children(storage._base_dir):
+                keys.add(path[len(prefix):].split(os.sep, 1)[0])
+            return list(keys)
+
+    def checkpoint(self, storage: WriteBackState):
+        with self.lock:
+            if self.durability == DURABILITY_ALL:
+                self.flush()
+            else:
+                if self.durability == DURABILITY_OFFSET:
+                    self._flush_path(storage._path(UPDATES_OFFSET_KEY))
+                self._flush_if_expired()
+
+    def flush(self):
+        with self.lock:
+            while self.pending:
+                self._flush_path(next(iter(self.pending)))
+
+    def _flush_if_expired(self):
+        if self.oldest_pending_time is not None and time.time() - self.oldest_pending_time >= self.flush_seconds:
+            self.flush()
+
+    def _flush_path(self, path):
+        pending = self.pending.get(path)
+        if pending is not None:
+            pending.write()
+            # only remove it once written, so that it is retried on next flush if it fails
+            del self.pending[path]
+            if not pending.append:
+                self._cache(path, pending.value)
+        if not self.pending:
+            self.oldest_pending_time = None
+
+    def _cache(self, path, value):
+        self.cached[path] = value
+        self.cached.move_to_end(path)
+        while len(self.cached) > self.max_cached_values:
+            self.cached.popitem(last=False)
+
+    def _pending_children(self, path):
+        prefix = path + os.sep
+        return (pending_path for pending_path in self.pending if pending_path.startswith(prefix))
+
+    def _forget_children(self, path):
+        prefix = path + os.sep
+        for values in (self.pending, self.cached):
+            for child_path in [child_path for child_path in values if child_path.startswith(prefix)]:
+                del values[child_path]
+
+
+class PendingWrite:
+    def __init__(self, storage: WriteBackState, key, value, append: bool):
+        """
+        :param append: If True, value must be appended to the one on disk, that has still not been read.
+        """
+        self.storage = storage
+        self.key = key
+        self.value = value
+        self.append = append
+
+    def update(self, value, append: bool):
+        if append:
+            self.value += value
+        else:
+            self.value = value
+            self.append = False
+
+    def prepend(self, current_value):
+        if current_value is not None:
+            self.value = current_value + self.value
+        self.append = False
+
+    def write(self):
+        self.storage._write(self.key, self.value, self.append)
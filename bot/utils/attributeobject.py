@@ -19,15 +19,61 @@ class AttributeObject:
 
 
 class DictionaryObject(AttributeObject):
-    def __init__(self, initial_items={}):
-        super().__init__("_dictionary")
+    """
+    Copies are layered over the original instead of copying all its items:
+    a copy only stores the items set on it, and looks up the rest on the layers of the original.
+
+    To keep copies isolated from later changes to the original (and vice versa), once an instance
+    has been copied its own layer is frozen, and it is copied before being modified (copy-on-write).
+    """
+
+    # chains of layers longer than this are flattened when copied, to bound the lookup time
+    MAX_LAYERS = 8
+
+    def __init__(self, initial_items={}, *excluded_keys):
+        super().__init__("_dictionary", "_layers", "_frozen", *excluded_keys)
         self._dictionary = dict(initial_items)
+        # read-only dicts, from the most recent to the oldest one
+        self._layers = ()
+        self._frozen = False
 
     def _getattr(self, item):
-        return self._dictionary.get(item)
+        dictionary = self._dictionary
+        if item in dictionary:
+            return dictionary[item]
+        for layer in self._layers:
+            if item in layer:
+                return layer[item]
+        return None
+
+    # it is called a lot, avoid the indirection of AttributeObject.__getattr__
+    __getattr__ = _getattr
 
     def _setattr(self, key, value):
+        if self._frozen:
+            # copies may still be reading it
+            self._dictionary = dict(self._dictionary)
+            self._frozen = False
         self._dictionary[key] = value
 
     def _copy(self):
-        return DictionaryObject(self._dictionary)
+        layers = self._layers
+        dictionary = self._dictionary
+        if dictionary:
+            if len(layers) >= self.MAX_LAYERS:
+                layers = (self._items(),)
+            else:
+                # set directly, as it is called a lot and __setattr__ is slow
+                self.__dict__["_frozen"] = True
+                layers = (dictionary,) + layers
+        copy = DictionaryObject.__new__(DictionaryObject)
+        copy.__dict__.update(_excluded_keys=self._excluded_keys, _dictionary={}, _layers=layers, _frozen=False)
+        return copy
+
+    def _items(self):
+        """Returns a new dict with all the items, including the ones of the layers."""
+        items = {}
+        for layer in reversed(self._layers):
+            items.update(layer)
+        items.update(self._dictionary)
+        return items
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import threading
+import unittest
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from bot.api.call.call import ApiCall
+from bot.api.call.params import ApiCallParams
+from bot.api.domain import OutApiObject
+from bot.api.telegram import TelegramBotApiException
+from bot.api.telegram_asyncio import AsyncTelegramBotApi
+from bot.multithreading.worker.event_loop import EventLoopWorker
+from bot.multithreading.worker.immediate import ImmediateWorker
+
+
+AUTH_TOKEN = "123:token"
+
+
+class FakeBotApiServer(ThreadingMixIn, HTTPServer):
+    """Local server answering like the Telegram bot API does, recording the calls received."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeBotApiRequestHandler)
+        self.calls = []
+        self.connections = set()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return "http://{host}:{port}/".format(host=self.server_address[0], port=self.server_address[1])
+
+
+class FakeBotApiRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        method = self.path.rsplit("/", 1)[-1]
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+        if self.headers["Content-Type"] == "application/json":
+            params = json.loads(body)
+        else:
+            params = dict(urllib.parse.parse_qsl(body))
+        with self.server.lock:
+            self.server.calls.append((self.path, params))
+            self.server.connections.add(self.client_address)
+        if method == "sendMessage":
+            self.__respond(200, {"ok": True, "result": {"message_id": 1, "text": params["text"]}}, params.get("chunked"))
+        else:
+            self.__respond(400, {"ok": False, "error_code": 400, "description": "Bad Request: unknown method"})
+
+    def __respond(self, status: int, response: dict, chunked: bool = False):
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            middle = len(body) // 2
+            for chunk in (body[:middle], body[middle:], b""):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        else:
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def assert_call(test: unittest.TestCase, call: tuple, method: str, **params):
+    path, called_params = call
+    test.assertEqual("/bot" + AUTH_TOKEN + "/" + method, path)
+    # compared as strings, as they are received as such if the params are not sent as json
+    test.assertEqual({key: str(value) for key, value in params.items()},
+                     {key: str(value) for key, value in called_params.items()})
+
+
+class AsyncTelegramBotApiTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeBotApiServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.api = AsyncTelegramBotApi(AUTH_TOKEN, 2, False, self.server.url)
+
+    def tearDown(self):
+        self.api.close()
+        # let the closed connections finish closing
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_call_returns_result(self):
+        result = self.loop.run_until_complete(self.api.sendMessage(chat_id=1, text="hello"))
+        self.assertEqual({"message_id": 1, "text": "hello"}, result)
+        self.assertEqual(1, len(self.server.calls))
+        assert_call(self, self.server.calls[0], "sendMessage", chat_id=1, text="hello")
+
+    def test_chunked_response(self):
+        result = self.loop.run_until_complete(self.api.sendMessage(chat_id=1, text="hello", chunked=True))
+        self.assertEqual("hello", result["text"])
+
+    def test_error_response_raises(self):
+        with self.assertRaises(TelegramBotApiException) as context:
+            self.loop.run_until_complete(self.api.unknownMethod(chat_id=1))
+        self.assertEqual(400, context.exception.error_code)
+
+    def test_concurrent_calls_are_limited_to_max_connections_and_reuse_them(self):
+        calls = [self.api.sendMessage(chat_id=1, text=str(i)) for i in range(20)]
+        results = self.loop.run_until_complete(asyncio.gather(*calls))
+        self.assertEqual([str(i) for i in range(20)], [result["text"] for result in results])
+        self.assertEqual(20, len(self.server.calls))
+        self.assertLessEqual(len(self.server.connections), 2)
+
+
+class ApiCallOnEventLoopTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeBotApiServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.errors = []
+        off_loop_worker = ImmediateWorker(lambda *args: self.errors.append(args))
+        self.event_loop = EventLoopWorker("asyncio_api", lambda *args: self.errors.append(args), off_loop_worker)
+        threading.Thread(target=self.event_loop.run, daemon=True).start()
+        self.api = AsyncTelegramBotApi(AUTH_TOKEN, 2, False, self.server.url)
+
+    def tearDown(self):
+        self.event_loop.shutdown()
+        self.event_loop.loop.call_soon_threadsafe(self.api.close)
+        self.event_loop.loop.call_soon_threadsafe(self.event_loop.loop.stop)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_call_is_performed_on_the_loop(self):
+        self.__call("sendMessage", chat_id=1, text="hello")
+        # it waits for the call to finish
+        self.event_loop.shutdown()
+        self.assertEqual(1, len(self.server.calls))
+        assert_call(self, self.server.calls[0], "sendMessage", chat_id=1, text="hello")
+        self.assertEqual([], self.errors)
+
+    def test_error_is_passed_to_error_callback(self):
+        errors = []
+        self.__call("unknownMethod", chat_id=1, **{OutApiObject.LOCAL_PARAM_ERROR_CALLBACK: errors.append})
+        self.event_loop.shutdown()
+        self.assertEqual(1, len(errors))
+        self.assertEqual(400, errors[0].error_code)
+        self.assertEqual([], self.errors)
+
+    def __call(self, method: str, **params):
+        call = ApiCall(None, method, getattr(self.api, method))
+        params[OutApiObject.LOCAL_PARAM_SCHEDULER] = lambda work: self.fail("must not be scheduled on a worker")
+        params[OutApiObject.LOCAL_PARAM_EVENT_LOOP] = self.event_loop
+        call.call(ApiCallParams(params))
+
+
+if __name__ == "__main__":
+    unittest.main()